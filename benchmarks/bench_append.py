@@ -0,0 +1,79 @@
+"""
+Latency of AppendSession.append (ndx_tempo.append) compared with the time a block of samples
+takes to record, for typical lock-in block sizes.
+
+Run with asv, or directly with ``python benchmarks/bench_append.py``.
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from ndx_tempo import TempoSeries
+from ndx_tempo.append import AppendSession, appendable_data
+from ndx_tempo.testing import mock_nwbfile, mock_tempo
+
+RATE = 20000.0
+NUM_BLOCKS = 200
+
+
+class AppendSuite:
+    params = ([64, 1024], [8, 64], [0.1, None])
+    param_names = ['block_rows', 'num_channels', 'flush_interval']
+
+    def setup(self, block_rows, num_channels, flush_interval):
+        self.directory = tempfile.mkdtemp()
+        nwbfile = mock_nwbfile()
+        tempo = mock_tempo(num_channels=num_channels)
+        nwbfile.add_device(tempo)
+        nwbfile.add_acquisition(TempoSeries(name='signals', rate=RATE, data=appendable_data(num_channels),
+                                            channels=tempo.lockinamp_devices.children[0].create_channel_region()))
+        self.session = AppendSession.create(os.path.join(self.directory, 'append.nwb'), nwbfile,
+                                            flush_interval=flush_interval)
+        self.block = np.random.RandomState(0).normal(size=(block_rows, num_channels))
+
+    def teardown(self, block_rows, num_channels, flush_interval):
+        self.session.close()
+        shutil.rmtree(self.directory)
+
+    def time_append(self, block_rows, num_channels, flush_interval):
+        self.session.append('signals', self.block)
+
+    def track_p99_latency_fraction(self, block_rows, num_channels, flush_interval):
+        """99th percentile append latency as a fraction of the block's recording time; must stay below 1."""
+        return _latencies(self.session, self.block, NUM_BLOCKS)[int(0.99 * NUM_BLOCKS)] / (block_rows / RATE)
+
+    track_p99_latency_fraction.unit = 'fraction'
+
+
+def _latencies(session, block, num_blocks):
+    latencies = []
+    for _ in range(num_blocks):
+        start = time.perf_counter()
+        session.append('signals', block)
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+def main():
+    suite = AppendSuite()
+    print('%10s %9s %9s %14s %14s %10s'
+          % ('block rows', 'channels', 'flush [s]', 'median [ms]', 'p99 [ms]', 'p99/block'))
+    for block_rows in AppendSuite.params[0]:
+        for num_channels in AppendSuite.params[1]:
+            for flush_interval in AppendSuite.params[2]:
+                suite.setup(block_rows, num_channels, flush_interval)
+                try:
+                    latencies = _latencies(suite.session, suite.block, NUM_BLOCKS)
+                finally:
+                    suite.teardown(block_rows, num_channels, flush_interval)
+                p99 = latencies[int(0.99 * NUM_BLOCKS)]
+                print('%10d %9d %9s %14.3f %14.3f %10.3f' % (block_rows, num_channels, flush_interval,
+                                                             latencies[NUM_BLOCKS // 2] * 1e3, p99 * 1e3,
+                                                             p99 / (block_rows / RATE)))
+
+
+if __name__ == '__main__':
+    main()
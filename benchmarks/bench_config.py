@@ -0,0 +1,85 @@
+"""
+Building a TEMPO device tree one object at a time versus TEMPO.from_config.
+
+Run with asv, or directly with ``python benchmarks/bench_config.py``.
+"""
+import timeit
+
+from hdmf.common.table import VectorData
+
+import ndx_tempo
+from ndx_tempo import (Measurement, PhotoDetector, LockInAmplifier, LaserLineDevices,
+                       PhotoDetectorDevices, LockInAmplifierDevices)
+
+
+def make_config(num_lines, num_channels):
+    return {
+        'name': 'tempo',
+        'laserlines': [{'name': 'laserline%d' % i, 'analog_modulation_frequency': 1000.0 * (i + 1), 'power': 1e-3}
+                       for i in range(num_lines)],
+        'photodetectors': [{'name': 'photodetector%d' % i, 'gain': 1.0, 'bandwidth': 1e5}
+                           for i in range(num_channels)],
+        'lockinamps': [{'name': 'lockinamp', 'demodulation_filter_order': 4, 'demod_bandwidth': 50.0,
+                        'channels': {'channel_name': ['channel%d' % i for i in range(num_channels)],
+                                     'offset': [0.0] * num_channels, 'gain': [1.0] * num_channels}}],
+    }
+
+
+def build_per_object(config):
+    laserlines = LaserLineDevices()
+    for entry in config['laserlines']:
+        laserlines.create_laserline(
+            name=entry['name'],
+            analog_modulation_frequency=Measurement(name='analog_modulation_frequency', description='',
+                                                    unit='Hz', data=[str(entry['analog_modulation_frequency'])]),
+            power=Measurement(name='power', description='', unit='watts', data=[entry['power']]))
+    photodetectors = PhotoDetectorDevices()
+    for entry in config['photodetectors']:
+        photodetectors.add_photodetector(PhotoDetector(
+            name=entry['name'],
+            gain=Measurement(name='gain', description='', unit='', data=[entry['gain']]),
+            bandwidth=Measurement(name='bandwidth', description='', unit='Hz', data=[entry['bandwidth']])))
+    lockinamps = LockInAmplifierDevices()
+    for entry in config['lockinamps']:
+        lockinamp = LockInAmplifier(name=entry['name'], demodulation_filter_order=4.0,
+                                    demod_bandwidth=Measurement(name='demod_bandwidth', description='',
+                                                                unit='Hz', data=[entry['demod_bandwidth']]),
+                                    columns=[VectorData(name='channel_name', description='', data=[]),
+                                             Measurement(name='offset', description='', unit='volts', data=[]),
+                                             VectorData(name='gain', description='', data=[])])
+        channels = entry['channels']
+        for channel_name, offset, gain in zip(channels['channel_name'], channels['offset'], channels['gain']):
+            lockinamp.add_row(channel_name=channel_name, offset=offset, gain=gain)
+        lockinamps.add_lockinamp(lockinamp)
+    return ndx_tempo.TEMPO(name=config['name'], laserline_devices=laserlines, photodetector_devices=photodetectors,
+                           lockinamp_devices=lockinamps)
+
+
+class ConstructionSuite:
+    params = ([8, 64], [64, 512])
+    param_names = ['num_lines', 'num_channels']
+
+    def setup(self, num_lines, num_channels):
+        self.config = make_config(num_lines, num_channels)
+        ndx_tempo.materialize('TEMPO')
+
+    def time_per_object(self, num_lines, num_channels):
+        build_per_object(self.config)
+
+    def time_from_config(self, num_lines, num_channels):
+        ndx_tempo.TEMPO.from_config(self.config)
+
+
+def main():
+    suite = ConstructionSuite()
+    print('%6s %9s %16s %16s' % ('lines', 'channels', 'per-object [ms]', 'from_config [ms]'))
+    for num_lines in ConstructionSuite.params[0]:
+        for num_channels in ConstructionSuite.params[1]:
+            suite.setup(num_lines, num_channels)
+            per_object = min(timeit.repeat(lambda: suite.time_per_object(num_lines, num_channels), number=1, repeat=3))
+            bulk = min(timeit.repeat(lambda: suite.time_from_config(num_lines, num_channels), number=1, repeat=3))
+            print('%6d %9d %16.1f %16.1f' % (num_lines, num_channels, per_object * 1e3, bulk * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Throughput of the software lock-in (ndx_tempo.demodulation), on a single core and on a
+process pool.
+
+Run with asv, or directly with ``python benchmarks/bench_demodulation.py``.
+"""
+import time
+
+import numpy as np
+
+from ndx_tempo.demodulation import LockInDemodulator, ParallelDemodulator
+
+RATE = 100000.0
+BLOCK_ROWS = 1 << 14
+
+
+class DemodulationSuite:
+    params = ([8, 64], [1, 8], [1, 4])
+    param_names = ['num_channels', 'num_lines', 'filter_order']
+
+    def setup(self, num_channels, num_lines, filter_order):
+        rng = np.random.RandomState(0)
+        self.block = rng.normal(size=(BLOCK_ROWS, num_channels))
+        self.demodulator = LockInDemodulator(RATE, 1000.0 * (1 + np.arange(num_lines)), bandwidth=100.0,
+                                             filter_order=filter_order)
+
+    def time_process_block(self, num_channels, num_lines, filter_order):
+        self.demodulator.process(self.block)
+
+    def track_samples_per_second(self, num_channels, num_lines, filter_order):
+        """Raw samples (per channel) demodulated per second."""
+        return _samples_per_second(self.demodulator, self.block)
+
+    track_samples_per_second.unit = 'samples/s'
+
+
+class ParallelDemodulationSuite:
+    params = ([1, 2, 4, 8],)
+    param_names = ['workers']
+    timeout = 300
+
+    def setup(self, workers):
+        rng = np.random.RandomState(0)
+        self.raw = rng.normal(size=(1 << 18, 64))
+        demodulator = LockInDemodulator(RATE, 1000.0 * (1 + np.arange(8)), bandwidth=100.0, filter_order=4)
+        self.runner = ParallelDemodulator(demodulator, workers=workers, block_rows=BLOCK_ROWS)
+
+    def track_samples_per_second(self, workers):
+        """Raw samples (per channel) demodulated per second, 64 channels x 8 laser lines."""
+        start = time.perf_counter()
+        for _ in self.runner.iter_process(self.raw):
+            pass
+        return len(self.raw) / (time.perf_counter() - start)
+
+    track_samples_per_second.unit = 'samples/s'
+
+
+def _samples_per_second(demodulator, block, repeats=5):
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        demodulator.process(block)
+        best = min(best, time.perf_counter() - start)
+    return len(block) / best
+
+
+def main():
+    suite = DemodulationSuite()
+    print('%8s %6s %6s %16s %22s' % ('channels', 'lines', 'order', 'samples/s', 'channel-samples/s'))
+    for num_channels in DemodulationSuite.params[0]:
+        for num_lines in DemodulationSuite.params[1]:
+            for order in DemodulationSuite.params[2]:
+                suite.setup(num_channels, num_lines, order)
+                rate = suite.track_samples_per_second(num_channels, num_lines, order)
+                print('%8d %6d %6d %16.3g %22.3g' % (num_channels, num_lines, order, rate, rate * num_channels))
+
+    parallel = ParallelDemodulationSuite()
+    print('\n%8s %16s' % ('workers', 'samples/s'))
+    for workers in ParallelDemodulationSuite.params[0]:
+        parallel.setup(workers)
+        print('%8d %16.3g' % (workers, parallel.track_samples_per_second(workers)))
+
+
+if __name__ == '__main__':
+    main()
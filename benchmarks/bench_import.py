@@ -0,0 +1,82 @@
+"""
+Start-up cost of ``import ndx_tempo`` in a fresh interpreter.
+
+``cold`` starts from an empty namespace cache (parse the YAML and write the cache),
+``warm`` reuses a populated cache and ``uncached`` bypasses the cache altogether.
+
+Run with asv, or directly with ``python benchmarks/bench_import.py [repeats]``.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+_COLD_SETUP = """
+import os, tempfile
+os.environ['NDX_TEMPO_CACHE_DIR'] = tempfile.mkdtemp()
+"""
+
+_WARM_SETUP = """
+import os
+os.environ['NDX_TEMPO_CACHE_DIR'] = {cache_dir!r}
+"""
+
+_UNCACHED_SETUP = """
+import os
+os.environ['NDX_TEMPO_NO_CACHE'] = '1'
+"""
+
+
+def _populate(cache_dir):
+    env = dict(os.environ, NDX_TEMPO_CACHE_DIR=cache_dir)
+    subprocess.check_call([sys.executable, '-c', 'import ndx_tempo'], env=env)
+
+
+class ImportSuite:
+    timeout = 120
+
+    def setup(self):
+        self.cache_dir = tempfile.mkdtemp()
+        _populate(self.cache_dir)
+
+    def teardown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def timeraw_import_cold(self):
+        return 'import ndx_tempo', _COLD_SETUP
+
+    def timeraw_import_warm(self):
+        return 'import ndx_tempo', _WARM_SETUP.format(cache_dir=self.cache_dir)
+
+    def timeraw_import_uncached(self):
+        return 'import ndx_tempo', _UNCACHED_SETUP
+
+
+def _time_import(setup, repeats):
+    code = ('import time\n{setup}\nstart = time.perf_counter()\nimport ndx_tempo\n'
+            'print(time.perf_counter() - start)').format(setup=setup)
+    timings = []
+    for _ in range(repeats):
+        out = subprocess.check_output([sys.executable, '-c', code])
+        timings.append(float(out.decode().strip().splitlines()[-1]))
+    return min(timings), sum(timings) / len(timings)
+
+
+def main(repeats=5):
+    cache_dir = tempfile.mkdtemp()
+    try:
+        _populate(cache_dir)
+        cases = [('uncached', _UNCACHED_SETUP),
+                 ('cold', _COLD_SETUP),
+                 ('warm', _WARM_SETUP.format(cache_dir=cache_dir))]
+        print('%-10s %10s %10s' % ('case', 'best [ms]', 'mean [ms]'))
+        for case, setup in cases:
+            best, mean = _time_import(setup, repeats)
+            print('%-10s %10.1f %10.1f' % (case, best * 1e3, mean * 1e3))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,89 @@
+"""
+Compression ratio against encode/decode throughput of the write presets (ndx_tempo.presets)
+on synthetic demodulated traces (float64) and raw ADC counts (int16).
+
+Run with asv, or directly with ``python benchmarks/bench_presets.py``.
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+from ndx_tempo.presets import PRESETS, get_preset
+from ndx_tempo.testing import synthetic_signals
+
+RATE = 2000.0
+NUM_SAMPLES = 1 << 18
+NUM_CHANNELS = 64
+
+
+def make_signal(kind):
+    signals = synthetic_signals(NUM_SAMPLES, NUM_CHANNELS, rate=RATE)
+    if kind == 'counts':
+        # 16-bit ADC counts of the same traces, as written by the integer storage mode
+        return np.round((signals - 1.0) * 2e4).astype(np.int16)
+    return signals
+
+
+def write(path, data, preset):
+    with h5py.File(path, 'w') as f:
+        f.create_dataset('data', data=data, **get_preset(preset).dataset_options(data.shape, data.dtype, RATE))
+
+
+def read(path):
+    with h5py.File(path, 'r') as f:
+        return f['data'][()]
+
+
+class PresetSuite:
+    params = (sorted(PRESETS), ['float64', 'counts'])
+    param_names = ['preset', 'signal']
+    number = 1
+    repeat = 5
+
+    def setup(self, preset, signal):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'preset.h5')
+        self.data = make_signal(signal)
+        write(self.path, self.data, preset)
+
+    def teardown(self, preset, signal):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def time_encode(self, preset, signal):
+        write(self.path, self.data, preset)
+
+    def time_decode(self, preset, signal):
+        read(self.path)
+
+    def track_compression_ratio(self, preset, signal):
+        return self.data.nbytes / os.path.getsize(self.path)
+
+    track_compression_ratio.unit = 'ratio'
+
+
+def main():
+    suite = PresetSuite()
+    print('%10s %8s %8s %16s %16s' % ('preset', 'signal', 'ratio', 'encode [MB/s]', 'decode [MB/s]'))
+    for signal in PresetSuite.params[1]:
+        for preset in PresetSuite.params[0]:
+            suite.setup(preset, signal)
+            try:
+                start = time.perf_counter()
+                suite.time_encode(preset, signal)
+                encode = time.perf_counter() - start
+                start = time.perf_counter()
+                suite.time_decode(preset, signal)
+                decode = time.perf_counter() - start
+                megabytes = suite.data.nbytes / 1e6
+                print('%10s %8s %8.2f %16.1f %16.1f' % (preset, signal, suite.track_compression_ratio(preset, signal),
+                                                        megabytes / encode, megabytes / decode))
+            finally:
+                suite.teardown(preset, signal)
+
+
+if __name__ == '__main__':
+    main()
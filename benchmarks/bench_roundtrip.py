@@ -0,0 +1,182 @@
+"""
+Write/read round trips of synthetic TEMPO files at realistic sizes: up to 64 lock-in channels,
+8 laser lines and long recordings, and archives of many sessions.
+
+For every size the suites measure building the NWBFile, writing it, reading it back (metadata
+and all signal data), a metadata-only open (ndx_tempo.metadata) and peak memory. asv stores the
+results per commit, so ``asv continuous master HEAD`` or ``asv compare`` shows regressions.
+
+Recording lengths are scaled by ``NDX_TEMPO_BENCH_SCALE`` (default 1, i.e. 10 s and 5 min at
+2 kHz); set it to 12 to benchmark hour-long recordings.
+
+Run with asv, or directly with ``python benchmarks/bench_roundtrip.py``.
+"""
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from pynwb import NWBHDF5IO
+
+from ndx_tempo import TempoSeries
+from ndx_tempo.metadata import read_metadata
+from ndx_tempo.streaming import stream_data
+from ndx_tempo.testing import mock_nwbfile, mock_tempo
+
+RATE = 2000.0
+BLOCK_ROWS = 1 << 15
+SCALE = float(os.environ.get('NDX_TEMPO_BENCH_SCALE', 1))
+
+
+def num_samples(seconds):
+    return int(seconds * SCALE * RATE)
+
+
+def signal_blocks(num_samples, num_channels, seed=0):
+    """Synthetic signal in blocks, so a long recording is never held in memory at once."""
+    rng = np.random.RandomState(seed)
+    for start in range(0, num_samples, BLOCK_ROWS):
+        rows = min(BLOCK_ROWS, num_samples - start)
+        yield 1.0 + 0.01 * rng.standard_normal((rows, num_channels))
+
+
+def make_nwbfile(num_channels, num_lines, samples, seed=0):
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=num_channels, num_lines=num_lines)
+    nwbfile.add_device(tempo)
+    lockinamp = tempo.lockinamp_devices.children[0]
+    nwbfile.add_acquisition(TempoSeries(name='lockin_signals', rate=RATE, channels=lockinamp.create_channel_region(),
+                                        data=stream_data(signal_blocks(samples, num_channels, seed), rate=RATE)))
+    return nwbfile
+
+
+def write(path, nwbfile):
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+
+def read(path):
+    with NWBHDF5IO(path, 'r') as io:
+        nwbfile = io.read()
+        data = nwbfile.acquisition['lockin_signals'].data
+        total = 0.0
+        for start in range(0, len(data), BLOCK_ROWS):
+            total += float(data[start:start + BLOCK_ROWS].sum())
+        return total
+
+
+def _path(num_channels, num_lines, seconds):
+    return 'roundtrip_%d_%d_%d.nwb' % (num_channels, num_lines, seconds)
+
+
+class RoundTripSuite:
+    params = ([8, 64], [2, 8], [10, 300])
+    param_names = ['num_channels', 'num_lines', 'seconds']
+    number = 1
+    repeat = 3
+    timeout = 1800
+
+    def setup_cache(self):
+        # files for the read benchmarks; asv runs the benchmarks in the directory of setup_cache
+        for num_channels in self.params[0]:
+            for num_lines in self.params[1]:
+                for seconds in self.params[2]:
+                    write(_path(num_channels, num_lines, seconds),
+                          make_nwbfile(num_channels, num_lines, num_samples(seconds)))
+
+    def setup(self, num_channels, num_lines, seconds):
+        self.directory = tempfile.mkdtemp()
+        self.nwbfile = make_nwbfile(num_channels, num_lines, num_samples(seconds))
+        self.path = _path(num_channels, num_lines, seconds)
+
+    def teardown(self, num_channels, num_lines, seconds):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def time_construct(self, num_channels, num_lines, seconds):
+        make_nwbfile(num_channels, num_lines, num_samples(seconds))
+
+    def time_write(self, num_channels, num_lines, seconds):
+        write(os.path.join(self.directory, 'write.nwb'), self.nwbfile)
+
+    def peakmem_write(self, num_channels, num_lines, seconds):
+        write(os.path.join(self.directory, 'write.nwb'), self.nwbfile)
+
+    def time_read(self, num_channels, num_lines, seconds):
+        read(self.path)
+
+    def peakmem_read(self, num_channels, num_lines, seconds):
+        read(self.path)
+
+    def time_read_metadata_only(self, num_channels, num_lines, seconds):
+        read_metadata(self.path)
+
+    def track_file_size(self, num_channels, num_lines, seconds):
+        return os.path.getsize(self.path)
+
+    track_file_size.unit = 'bytes'
+
+
+def _archive_path(index):
+    return os.path.join('archive', 'session%05d.nwb' % index)
+
+
+class ArchiveSuite:
+    """Opening many sessions, as when cataloguing an archive."""
+    params = ([100, 1000],)
+    param_names = ['num_files']
+    number = 1
+    repeat = 3
+    timeout = 3600
+
+    def setup_cache(self):
+        os.makedirs('archive', exist_ok=True)
+        for index in range(max(self.params[0])):
+            write(_archive_path(index), make_nwbfile(64, 8, 2000, seed=index))
+
+    def time_read_metadata_only(self, num_files):
+        for index in range(num_files):
+            read_metadata(_archive_path(index))
+
+    def time_read_devices(self, num_files):
+        for index in range(num_files):
+            with NWBHDF5IO(_archive_path(index), 'r') as io:
+                io.read().devices['tempo']
+
+
+def _measure(function, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        print('%9s %6s %8s %14s %10s %10s %14s %16s %16s' % (
+            'channels', 'lines', 'seconds', 'construct [s]', 'write [s]', 'read [s]', 'metadata [ms]',
+            'write peak [MB]', 'read peak [MB]'))
+        for num_channels in RoundTripSuite.params[0]:
+            for num_lines in RoundTripSuite.params[1]:
+                for seconds in RoundTripSuite.params[2]:
+                    samples = num_samples(seconds)
+                    path = os.path.join(directory, _path(num_channels, num_lines, seconds))
+                    construct, _ = _measure(make_nwbfile, num_channels, num_lines, samples)
+                    write_time, write_peak = _measure(write, path, make_nwbfile(num_channels, num_lines, samples))
+                    read_time, read_peak = _measure(read, path)
+                    metadata_time, _ = _measure(read_metadata, path)
+                    print('%9d %6d %8d %14.3f %10.2f %10.2f %14.2f %16.1f %16.1f' % (
+                        num_channels, num_lines, seconds * SCALE, construct, write_time, read_time,
+                        metadata_time * 1e3, write_peak / 1e6, read_peak / 1e6))
+                    os.remove(path)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Stimulus-triggered averaging of 2000 trials from a chunked, compressed 16-channel recording:
+one read per trial window against the coalesced, chunk-aligned reads of ndx_tempo.triggered.
+
+Run with asv, or directly with ``python benchmarks/bench_triggered.py``.
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from pynwb import H5DataIO, NWBHDF5IO
+
+from ndx_tempo import TempoSeries
+from ndx_tempo.testing import mock_nwbfile, mock_tempo, synthetic_signals
+from ndx_tempo.triggered import sample_indices, triggered_average
+
+RATE = 2000.0
+NUM_TRIALS = 2000
+WINDOW = (-0.05, 0.25)
+
+
+def write(path):
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=16)
+    nwbfile.add_device(tempo)
+    data = synthetic_signals(int(600 * RATE), 16, rate=RATE)
+    nwbfile.add_acquisition(TempoSeries(name='lockin_signals', rate=RATE,
+                                        channels=tempo.lockinamp_devices.children[0].create_channel_region(),
+                                        data=H5DataIO(data, chunks=(4096, 16), compression='gzip')))
+    events = np.sort(np.random.RandomState(0).uniform(1.0, 599.0, NUM_TRIALS))
+    for event in events:
+        nwbfile.add_trial(start_time=event, stop_time=event + 0.25)
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+
+def per_trial(path):
+    with NWBHDF5IO(path, 'r') as io:
+        nwb = io.read()
+        series = nwb.acquisition['lockin_signals']
+        offset = int(round(WINDOW[0] * RATE))
+        length = int(round(WINDOW[1] * RATE)) - offset
+        starts = sample_indices(series, nwb.trials['start_time'].data[:]) + offset
+        windows = [series.data[start:start + length] for start in starts]
+        return np.mean(windows, axis=0)
+
+
+def coalesced(path):
+    with NWBHDF5IO(path, 'r') as io:
+        nwb = io.read()
+        return triggered_average(nwb.acquisition['lockin_signals'], nwb.trials, window=WINDOW).mean
+
+
+class TriggeredSuite:
+    number = 1
+    repeat = 3
+
+    def setup_cache(self):
+        write('triggered.nwb')
+
+    def time_per_trial_reads(self):
+        per_trial('triggered.nwb')
+
+    def time_coalesced_reads(self):
+        coalesced('triggered.nwb')
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'triggered.nwb')
+        write(path)
+        start = time.perf_counter()
+        per_trial(path)
+        loop = time.perf_counter() - start
+        start = time.perf_counter()
+        coalesced(path)
+        fast = time.perf_counter() - start
+        print('per-trial reads %.2f s, coalesced reads %.2f s (with bootstrap)' % (loop, fast))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Per-file cost of pynwb.validate against the metadata-only ndx_tempo.validation fast path, on a
+file with a 64-channel TEMPO device and a five-minute 2 kHz recording.
+
+Run with asv, or directly with ``python benchmarks/bench_validation.py``.
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from pynwb import NWBHDF5IO, validate
+
+from ndx_tempo import TempoSeries
+from ndx_tempo.testing import mock_nwbfile, mock_tempo, synthetic_signals
+from ndx_tempo.validation import compile_rules, validate_file
+
+RATE = 2000.0
+
+
+def write(path):
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=64, num_lines=8)
+    nwbfile.add_device(tempo)
+    lockinamp = tempo.lockinamp_devices.children[0]
+    nwbfile.add_acquisition(TempoSeries(name='lockin_signals', rate=RATE, channels=lockinamp.create_channel_region(),
+                                        data=synthetic_signals(int(300 * RATE), 64, rate=RATE)))
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+
+class ValidationSuite:
+    number = 1
+    repeat = 5
+
+    def setup_cache(self):
+        write('validation.nwb')
+
+    def setup(self):
+        compile_rules()
+
+    def time_pynwb_validate(self):
+        with NWBHDF5IO('validation.nwb', 'r') as io:
+            validate(io, 'ndx-tempo')
+
+    def time_fast_validate(self):
+        validate_file('validation.nwb')
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'validation.nwb')
+        write(path)
+        compile_rules()
+        start = time.perf_counter()
+        with NWBHDF5IO(path, 'r') as io:
+            validate(io, 'ndx-tempo')
+        standard = time.perf_counter() - start
+        start = time.perf_counter()
+        validate_file(path)
+        fast = time.perf_counter() - start
+        print('pynwb.validate %.1f ms, ndx_tempo.validation %.1f ms' % (standard * 1e3, fast * 1e3))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Write throughput of a 64-channel, five-minute 2 kHz recording whose channel groups are produced
+by 1, 4 and 16 worker processes: into HDF5, where the workers send their blocks to the single
+writing process, and into Zarr, where every worker writes its own chunks (ndx_tempo.zarr_backend).
+
+Run with asv, or directly with ``python benchmarks/bench_zarr.py``.
+"""
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import h5py
+from pynwb import H5DataIO, NWBHDF5IO
+
+from ndx_tempo import TempoSeries
+from ndx_tempo.testing import mock_nwbfile, mock_tempo, synthetic_signals
+from ndx_tempo.zarr_backend import EmptyData, allocate, column_groups, parallel_write, write_zarr
+
+RATE = 2000.0
+SHAPE = (int(300 * RATE), 64)
+CHUNKS = (20000, 4)
+WORKERS = (1, 4, 16)
+NAME = 'acquisition/lockin_signals/data'
+
+
+def blocks(task):
+    """The blocks of one channel group, in whole chunks: stands in for demodulating the group."""
+    start, stop = task
+    for row in range(0, SHAPE[0], CHUNKS[0]):
+        rows = min(CHUNKS[0], SHAPE[0] - row)
+        yield row, start, synthetic_signals(rows, stop - start, rate=RATE, seed=row + start, dtype='float32')
+
+
+def _group(task):
+    return task, list(blocks(task))
+
+
+def _nwbfile(data):
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=SHAPE[1])
+    nwbfile.add_device(tempo)
+    nwbfile.add_acquisition(TempoSeries(name='lockin_signals', rate=RATE, data=data,
+                                        channels=tempo.lockinamp_devices.children[0].create_channel_region()))
+    return nwbfile
+
+
+def write_hdf5(path, workers):
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(_nwbfile(H5DataIO(EmptyData(SHAPE, 'float32'), chunks=CHUNKS)))
+    groups = column_groups(SHAPE, CHUNKS, SHAPE[1] // workers)
+    with h5py.File(path, 'a') as f, ProcessPoolExecutor(workers) as pool:
+        dataset = f[NAME]
+        for _, group in pool.map(_group, groups):
+            for row, column, block in group:
+                dataset[row:row + len(block), column:column + block.shape[1]] = block
+
+
+def write_zarr_parallel(path, workers):
+    write_zarr(_nwbfile(allocate(SHAPE, 'float32', CHUNKS)), path)
+    parallel_write(path, NAME, blocks, column_groups(SHAPE, CHUNKS, SHAPE[1] // workers), workers=workers)
+
+
+class WriteSuite:
+    number = 1
+    repeat = 3
+    params = (['hdf5', 'zarr'], list(WORKERS))
+    param_names = ['backend', 'workers']
+
+    def setup(self, backend, workers):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self, backend, workers):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def time_write(self, backend, workers):
+        if backend == 'hdf5':
+            write_hdf5(os.path.join(self.directory, 'session.nwb'), workers)
+        else:
+            write_zarr_parallel(os.path.join(self.directory, 'session.nwb.zarr'), workers)
+
+
+def main():
+    megabytes = SHAPE[0] * SHAPE[1] * 4 / 1e6
+    for workers in WORKERS:
+        for backend, write, filename in (('hdf5', write_hdf5, 'session.nwb'),
+                                         ('zarr', write_zarr_parallel, 'session.nwb.zarr')):
+            directory = tempfile.mkdtemp()
+            try:
+                start = time.perf_counter()
+                write(os.path.join(directory, filename), workers)
+                elapsed = time.perf_counter() - start
+                print('%-4s %2d workers: %6.2f s, %7.1f MB/s' % (backend, workers, elapsed, megabytes / elapsed))
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,14 +14,20 @@ setup_args = {
     'url': '',
     'license': 'BSD 3-Clause',
     'install_requires': [
-        'pynwb>=1.1.2'
+        'pynwb>=1.1.2',
+        'scipy',
     ],
+    'extras_require': {
+        'dask': ['dask[array]', 'xarray'],
+        'zarr': ['hdmf-zarr'],
+    },
     'packages': find_packages('src/pynwb'),
     'package_dir': {'': 'src/pynwb'},
     'package_data': {'ndx_tempo': [
         'spec/ndx-tempo.namespace.yaml',
         'spec/ndx-tempo.extensions.yaml',
     ]},
+    'entry_points': {'console_scripts': ['ndx-tempo-convert=ndx_tempo.convert:main']},
     'classifiers': [
         "Intended Audience :: Developers",
         "Intended Audience :: Science/Research",
@@ -1 +1,16 @@
-from .tempo import *
+from .tempo import (Measurement, LaserLine, PhotoDetector, LockInAmplifier, LaserLineDevices,  # noqa: F401
+                    PhotoDetectorDevices, LockInAmplifierDevices, TempoSeries, materialize, materialized_types,
+                    add_materialize_hook, remove_materialize_hook)
+from .streaming import stream_data, iter_blocks  # noqa: F401
+from .views import data_view  # noqa: F401
+from .metadata import read_metadata  # noqa: F401
+from . import tempo as _tempo
+
+__all__ = list(_tempo.__all__) + list(_tempo._lazy_types) + ['stream_data', 'iter_blocks', 'data_view', 'read_metadata']
+
+
+def __getattr__(attr):
+    # TEMPO, Surgery and SubjectComplete are generated on first access, see tempo.__getattr__
+    if attr in _tempo._lazy_types:
+        return getattr(_tempo, attr)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, attr))
@@ -0,0 +1,142 @@
+"""
+On-disk cache of the parsed ndx-tempo namespace.
+
+Parsing the YAML specification is the dominant cost of ``import ndx_tempo``. The parsed
+namespace and extension documents are pickled under a cache directory, keyed by a hash of
+the spec files and of the installed pynwb/hdmf versions, so a new process only parses the
+YAML again when one of those changes. Stale cache entries are removed when a new one is
+written.
+
+The cache directory defaults to ``$XDG_CACHE_HOME/ndx-tempo`` (``~/.cache/ndx-tempo``) and
+can be moved with ``NDX_TEMPO_CACHE_DIR``. Set ``NDX_TEMPO_NO_CACHE=1`` to bypass it.
+"""
+import copy
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+
+import hdmf
+import pynwb
+from hdmf.spec.namespace import YAMLSpecReader
+
+CACHE_DIR_ENV = 'NDX_TEMPO_CACHE_DIR'
+NO_CACHE_ENV = 'NDX_TEMPO_NO_CACHE'
+
+# bump when the layout of the pickled payload changes; 2: documents are stored before hdmf edits them
+_CACHE_FORMAT = 2
+_PREFIX = 'namespace-'
+_SUFFIX = '.pickle'
+
+
+def cache_dir():
+    """Return the directory holding the cached namespace documents."""
+    path = os.environ.get(CACHE_DIR_ENV)
+    if path:
+        return path
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ndx-tempo')
+
+
+def _spec_sources(namespace_path):
+    spec_dir = os.path.dirname(namespace_path)
+    prefix = os.path.basename(namespace_path)[:-len('.namespace.yaml')]
+    return [namespace_path, os.path.join(spec_dir, prefix + '.extensions.yaml')]
+
+
+def cache_key(namespace_path):
+    """Hash of the namespace/extensions YAML files and the pynwb, hdmf and Python versions."""
+    digest = hashlib.sha256()
+    for part in (str(_CACHE_FORMAT), pynwb.__version__, hdmf.__version__, '%d.%d' % sys.version_info[:2]):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    for path in _spec_sources(namespace_path):
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(cache_dir(), _PREFIX + key[:32] + _SUFFIX)
+
+
+def load_cached_documents(namespace_path):
+    """Return the cached documents for *namespace_path*, or None if there is no valid entry."""
+    key = cache_key(namespace_path)
+    try:
+        with open(_cache_path(key), 'rb') as f:
+            payload = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if not isinstance(payload, dict) or payload.get('key') != key:
+        return None
+    return payload['documents']
+
+
+def store_documents(namespace_path, documents):
+    """Write *documents* to the cache and drop entries for other keys.
+
+    Failures (e.g. a read-only home directory) are ignored, the cache is only an optimization.
+    """
+    key = cache_key(namespace_path)
+    path = _cache_path(key)
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=_SUFFIX)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({'key': key, 'documents': documents}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            # atomic, so concurrent workers never see a partially written entry
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        for entry in os.listdir(directory):
+            if entry.startswith(_PREFIX) and entry.endswith(_SUFFIX) and entry != os.path.basename(path):
+                os.unlink(os.path.join(directory, entry))
+    except OSError:
+        pass
+
+
+class CachedSpecReader(YAMLSpecReader):
+    """
+    YAMLSpecReader that serves already parsed documents and records the ones it had to parse.
+
+    hdmf edits the documents it is given while it resolves the namespace, so the reader keeps
+    pristine copies and hands out a fresh deep copy on every read.
+    """
+
+    def __init__(self, indir, documents=None):
+        super().__init__(indir=indir)
+        self.documents = dict(documents or {})
+        self.parsed = False
+
+    def __read(self, path, parse):
+        key = os.path.basename(path)
+        if key not in self.documents:
+            self.documents[key] = parse(path)
+            self.parsed = True
+        return copy.deepcopy(self.documents[key])
+
+    def read_namespace(self, namespace_path):
+        return self.__read(namespace_path, super().read_namespace)
+
+    def read_spec(self, spec_path):
+        return self.__read(spec_path, super().read_spec)
+
+
+def load_namespaces(namespace_path):
+    """Load *namespace_path* into the global pynwb type map, parsing the YAML only on a cache miss."""
+    # pynwb.load_namespaces does not accept a spec reader, so go through the type map it wraps
+    type_map = getattr(pynwb, '__TYPE_MAP', None)
+    if os.environ.get(NO_CACHE_ENV) or type_map is None:
+        return pynwb.load_namespaces(namespace_path)
+    reader = CachedSpecReader(os.path.dirname(namespace_path), load_cached_documents(namespace_path))
+    ret = type_map.load_namespaces(namespace_path, reader=reader)
+    if reader.parsed:
+        store_documents(namespace_path, reader.documents)
+    return ret
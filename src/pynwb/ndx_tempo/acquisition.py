@@ -0,0 +1,216 @@
+"""
+asyncio bridge from lock-in amplifier packets to a synchronous HDF5 writer.
+
+Packets (``(num_samples, num_channels)`` arrays, one column per LockInAmplifier channel) are put
+on a bounded asyncio queue by the network side. A coalescing task groups them into writes of
+whole chunks and hands each write to a dedicated writer thread, so a slow HDF5 flush never
+blocks the event loop that reads the socket. When the writer falls behind and the queue fills,
+:py:meth:`AcquisitionBridge.put` either waits (backpressure, the default) or drops the packet,
+and :py:class:`AcquisitionStats` records both::
+
+    session = AppendSession.create('live.nwb', nwbfile)
+    async with AcquisitionBridge(session_writer(session, 'lockin_signals'), num_channels=64) as bridge:
+        await feed_from_socket(bridge, '192.168.1.20', 5025)
+    print(bridge.stats)
+
+The wire format read by :py:func:`read_packets` is a little-endian uint32 row count followed by
+the rows in C order; :py:func:`encode_packet` produces it.
+"""
+import asyncio
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from .streaming import default_chunk_rows
+
+_HEADER = struct.Struct('<I')
+_STOP = object()
+
+
+@dataclass
+class AcquisitionStats:
+    packets_received: int = 0
+    rows_received: int = 0
+    packets_dropped: int = 0
+    rows_dropped: int = 0
+    backpressure_waits: int = 0
+    backpressure_seconds: float = 0.0
+    max_queue_depth: int = 0
+    writes: int = 0
+    rows_written: int = 0
+    write_seconds: float = 0.0
+    max_write_seconds: float = 0.0
+
+
+def session_writer(session, series):
+    """A write callable appending to *series* of an ndx_tempo.append.AppendSession."""
+    def write(block):
+        session.append(series, block)
+    return write
+
+
+class AcquisitionBridge:
+    """
+    Bounded asyncio queue in front of a single writer thread.
+
+    :param write: called in the writer thread with each ``(rows, num_channels)`` array to store
+    :param num_channels: number of columns of every packet
+    :param chunk_rows: writes hold a multiple of this many rows, except the last one; use the
+                       chunk size of the target dataset
+    :param maxsize: maximum number of packets waiting in the queue
+    :param drop: drop packets when the queue is full instead of waiting for room
+    :param dtype: dtype packets are converted to
+    """
+
+    def __init__(self, write, num_channels, chunk_rows=None, maxsize=256, drop=False, dtype='float64'):
+        self.write = write
+        self.num_channels = int(num_channels)
+        self.dtype = np.dtype(dtype)
+        self.chunk_rows = int(chunk_rows or default_chunk_rows(self.num_channels, self.dtype.itemsize))
+        self.maxsize = maxsize
+        self.drop = drop
+        self.stats = AcquisitionStats()
+        self.__queue = None
+        self.__task = None
+        self.__executor = None
+
+    async def start(self):
+        self.__queue = asyncio.Queue(self.maxsize)
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ndx-tempo-writer')
+        self.__task = asyncio.ensure_future(self.__coalesce())
+
+    async def put(self, packet):
+        """Queue a packet; returns False if it was dropped because the queue was full."""
+        packet = np.asarray(packet, dtype=self.dtype)
+        if packet.ndim == 1:
+            packet = packet.reshape(-1, self.num_channels)
+        if packet.ndim != 2 or packet.shape[1] != self.num_channels:
+            raise ValueError('packet has shape %s, expected (n, %d)' % (packet.shape, self.num_channels))
+        if self.__task.done():
+            self.__task.result()  # re-raise a writer error instead of queuing forever
+        stats = self.stats
+        stats.packets_received += 1
+        stats.rows_received += len(packet)
+        if self.__queue.full():
+            if self.drop:
+                stats.packets_dropped += 1
+                stats.rows_dropped += len(packet)
+                return False
+            stats.backpressure_waits += 1
+            start = time.perf_counter()
+            await self.__put_waiting(packet)
+            stats.backpressure_seconds += time.perf_counter() - start
+        else:
+            self.__queue.put_nowait(packet)
+        stats.max_queue_depth = max(stats.max_queue_depth, self.__queue.qsize())
+        return True
+
+    async def __put_waiting(self, item):
+        # wait for room in the queue, but give up when the writer task ends: a writer that died
+        # never frees the room, so a plain queue.put would wait forever
+        put = asyncio.ensure_future(self.__queue.put(item))
+        await asyncio.wait((put, self.__task), return_when=asyncio.FIRST_COMPLETED)
+        if put.done():
+            return
+        put.cancel()
+        self.__task.result()  # re-raises the writer's error
+        raise RuntimeError('the writer stopped while a packet was waiting for room in the queue')
+
+    def __write(self, loop, block):
+        # runs in the writer thread; stats belong to the event loop, which gets the update before
+        # the write's future completes
+        start = time.perf_counter()
+        self.write(block)
+        loop.call_soon_threadsafe(self.__record_write, len(block), time.perf_counter() - start)
+
+    def __record_write(self, rows, elapsed):
+        stats = self.stats
+        stats.writes += 1
+        stats.rows_written += rows
+        stats.write_seconds += elapsed
+        stats.max_write_seconds = max(stats.max_write_seconds, elapsed)
+
+    async def __coalesce(self):
+        loop = asyncio.get_running_loop()
+        pending, pending_rows = [], 0
+        writing = None
+        while True:
+            packet = await self.__queue.get()
+            if packet is _STOP:
+                break
+            pending.append(packet)
+            pending_rows += len(packet)
+            # take everything that is already waiting, so small packets become one write
+            while pending_rows < self.chunk_rows and not self.__queue.empty():
+                packet = self.__queue.get_nowait()
+                if packet is _STOP:
+                    self.__queue.put_nowait(_STOP)
+                    break
+                pending.append(packet)
+                pending_rows += len(packet)
+            if pending_rows < self.chunk_rows:
+                continue
+            rows = pending_rows - pending_rows % self.chunk_rows
+            block = np.concatenate(pending)
+            pending, pending_rows = [block[rows:]], pending_rows - rows
+            if writing is not None:
+                await writing
+            writing = loop.run_in_executor(self.__executor, self.__write, loop, block[:rows])
+        if writing is not None:
+            await writing
+        if pending_rows:
+            await loop.run_in_executor(self.__executor, self.__write, loop, np.concatenate(pending))
+
+    async def stop(self):
+        """Write out everything queued, including a final partial chunk, and stop the writer thread."""
+        if self.__task is None:
+            return
+        try:
+            if not self.__task.done():
+                await self.__put_waiting(_STOP)
+            await self.__task
+        finally:
+            self.__executor.shutdown()
+            self.__task = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+
+def encode_packet(block):
+    """The wire format of a ``(rows, num_channels)`` block: uint32 row count, then the rows."""
+    block = np.ascontiguousarray(block)
+    return _HEADER.pack(len(block)) + block.tobytes()
+
+
+async def read_packets(reader, num_channels, dtype='float64'):
+    """Yield the blocks sent over an asyncio StreamReader until the connection is closed."""
+    dtype = np.dtype(dtype).newbyteorder('<')
+    row_bytes = num_channels * dtype.itemsize
+    while True:
+        try:
+            header = await reader.readexactly(_HEADER.size)
+        except asyncio.IncompleteReadError as error:
+            if error.partial:
+                raise
+            return
+        (rows,) = _HEADER.unpack(header)
+        payload = await reader.readexactly(rows * row_bytes)
+        yield np.frombuffer(payload, dtype=dtype).reshape(rows, num_channels)
+
+
+async def feed_from_socket(bridge, host, port, dtype='float64'):
+    """Connect to an amplifier at *host*:*port* and put every packet it sends on *bridge*."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        async for packet in read_packets(reader, bridge.num_channels, dtype):
+            await bridge.put(packet)
+    finally:
+        writer.close()
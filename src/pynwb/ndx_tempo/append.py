@@ -0,0 +1,189 @@
+"""
+Incremental writing of TEMPO files during a live recording.
+
+An :py:class:`AppendSession` writes the device metadata and empty, resizable signal datasets up
+front, then appends sample blocks as they arrive and flushes them on a configurable cadence. The
+file is created with the latest HDF5 file format and the session switches it to SWMR
+(single-writer/multiple-reader) mode, so a monitor process can follow it with :py:func:`tail`
+while it is being written::
+
+    nwbfile.add_acquisition(TempoSeries(name='lockin_signals', rate=2000.0,
+                                        channels=lockinamp.create_channel_region(),
+                                        data=appendable_data(num_channels=64)))
+    with AppendSession.create('session.nwb', nwbfile, flush_interval=0.5) as session:
+        for block in blocks:
+            session.append('lockin_signals', block)
+        with session.reconfigure() as nwb:     # leaves SWMR mode while new devices are written
+            nwb.devices['tempo'].laserline_devices.add_laserline(new_laserline)
+
+SWMR writers cannot create new HDF5 objects, so :py:meth:`AppendSession.reconfigure` closes the
+SWMR handle, adds the new containers with ``NWBHDF5IO`` in 'a' mode and then resumes SWMR mode;
+monitors have to reopen the file after a reconfiguration.
+"""
+import time
+from contextlib import ExitStack, contextmanager
+
+import h5py
+import numpy as np
+from hdmf.backends.hdf5 import H5DataIO
+from hdmf.utils import get_docval
+from pynwb import NWBHDF5IO
+
+from .streaming import default_chunk_rows
+
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+def appendable_data(num_channels, chunk_rows=None, dtype='float64', compression=None, compression_opts=None,
+                    shuffle=False):
+    """
+    An empty ``(0, num_channels)`` dataset with an unlimited first axis, to use as the data of a
+    TempoSeries that an AppendSession appends to.
+
+    Compression is off by default since every flush then recompresses the partially filled last chunk.
+    """
+    dtype = np.dtype(dtype)
+    chunk_rows = int(chunk_rows or default_chunk_rows(num_channels, dtype.itemsize))
+    return H5DataIO(np.empty((0, num_channels), dtype=dtype), maxshape=(None, num_channels),
+                    chunks=(chunk_rows, num_channels), compression=compression,
+                    compression_opts=compression_opts, shuffle=shuffle)
+
+
+def _takes_file():
+    return 'file' in [arg['name'] for arg in get_docval(NWBHDF5IO.__init__)]
+
+
+def _write_latest(path, nwbfile, **kwargs):
+    """Write *nwbfile* to a new file with the latest HDF5 format, which SWMR requires."""
+    if _takes_file():
+        with h5py.File(path, 'w', libver='latest') as f:
+            with NWBHDF5IO(path, 'w', file=f, **kwargs) as io:
+                io.write(nwbfile)
+    else:
+        # older pynwb cannot take an open file: create it empty with the latest format and add to it
+        h5py.File(path, 'w', libver='latest').close()
+        with NWBHDF5IO(path, 'a', **kwargs) as io:
+            io.write(nwbfile)
+
+
+class AppendSession:
+    """
+    Appends sample blocks to the resizable datasets of an existing file and flushes them every
+    *flush_interval* seconds or every *flush_rows* rows, whichever comes first.
+
+    :param path: the file, written with the latest HDF5 format (see AppendSession.create)
+    :param flush_interval: seconds between flushes; None to flush only on row count or explicitly
+    :param flush_rows: rows appended to a dataset between flushes; None to flush only on time
+    :param swmr: switch the file to SWMR mode so readers can follow it
+    """
+
+    def __init__(self, path, flush_interval=DEFAULT_FLUSH_INTERVAL, flush_rows=None, swmr=True):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.swmr = swmr
+        self.file = None
+        self.flushes = 0
+        self.__datasets = {}
+        self.__unflushed = {}
+        self.__last_flush = time.monotonic()
+        self.open()
+
+    @classmethod
+    def create(cls, path, nwbfile, manager=None, **kwargs):
+        """Write *nwbfile* (devices and empty appendable_data series) to *path* and start a session on it."""
+        io_kwargs = {'manager': manager} if manager is not None else {}
+        _write_latest(path, nwbfile, **io_kwargs)
+        return cls(path, **kwargs)
+
+    def open(self):
+        self.file = h5py.File(self.path, 'r+', libver='latest')
+        if self.swmr:
+            self.file.swmr_mode = True
+        self.__datasets = {}
+        self.__last_flush = time.monotonic()
+
+    def dataset(self, series):
+        """The data dataset of *series*, a TimeSeries name in /acquisition or a path in the file."""
+        dataset = self.__datasets.get(series)
+        if dataset is None:
+            path = series if series.startswith('/') else '/acquisition/%s/data' % series
+            dataset = self.file[path]
+            if dataset.maxshape[0] is not None:
+                raise ValueError('%s is not resizable, create it with ndx_tempo.append.appendable_data' % path)
+            self.__datasets[series] = dataset
+        return dataset
+
+    def rows(self, series):
+        return self.dataset(series).shape[0]
+
+    def append(self, series, block):
+        """Append the rows of *block*, shape (num_samples, num_channels), to *series*."""
+        dataset = self.dataset(series)
+        block = np.asarray(block, dtype=dataset.dtype)
+        if block.ndim == 1 and dataset.ndim == 2:
+            block = block[np.newaxis, :] if len(block) == dataset.shape[1] else block[:, np.newaxis]
+        if block.shape[1:] != dataset.shape[1:]:
+            raise ValueError('block has shape %s, expected (n,) + %s' % (block.shape, dataset.shape[1:]))
+        start = dataset.shape[0]
+        dataset.resize(start + len(block), axis=0)
+        dataset[start:] = block
+        self.__unflushed[series] = self.__unflushed.get(series, 0) + len(block)
+        if self.flush_rows is not None and self.__unflushed[series] >= self.flush_rows:
+            self.flush()
+        elif self.flush_interval is not None and time.monotonic() - self.__last_flush >= self.flush_interval:
+            self.flush()
+        return start
+
+    def flush(self):
+        """Make everything appended so far visible to readers and durable in the file."""
+        for series in self.__unflushed:
+            self.dataset(series).flush()
+        self.file.flush()
+        self.__unflushed.clear()
+        self.__last_flush = time.monotonic()
+        self.flushes += 1
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+            self.__datasets = {}
+
+    @contextmanager
+    def reconfigure(self, **kwargs):
+        """
+        Context manager yielding the NWBFile read back in 'a' mode; containers added to it (new
+        LaserLine, LockInAmplifier or TempoSeries objects) are written on exit, after which the
+        session resumes appending in SWMR mode.
+        """
+        self.close()
+        try:
+            with ExitStack() as stack:
+                if _takes_file():
+                    # keep the latest HDF5 format, as SWMR readers of the file require
+                    kwargs['file'] = stack.enter_context(h5py.File(self.path, 'a', libver='latest'))
+                io = stack.enter_context(NWBHDF5IO(self.path, 'a', **kwargs))
+                nwbfile = io.read()
+                yield nwbfile
+                io.write(nwbfile)
+        finally:
+            self.open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_reader(path):
+    """Open *path* for reading while an AppendSession writes to it."""
+    return h5py.File(path, 'r', libver='latest', swmr=True)
+
+
+def tail(dataset, start=0):
+    """Rows of *dataset* (from a file opened with open_reader) from *start* to its current end."""
+    dataset.refresh()
+    return dataset[start:]
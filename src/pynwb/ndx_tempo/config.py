@@ -0,0 +1,332 @@
+"""
+Build a whole TEMPO device tree from a tabular or nested configuration in one pass.
+
+A configuration is a dict (or a YAML file holding one)::
+
+    name: tempo
+    no_of_modules: 3
+    units:                       # optional, defaults for every entry
+      power: watts
+    laserlines:
+      - {name: laser470, analog_modulation_frequency: 1000, power: 0.002}
+    photodetectors:
+      - {name: pd0, gain: 1.0, bandwidth: {value: 100, unit: kHz, conversion: 1000}}
+    lockinamps:
+      - name: lockinamp
+        demodulation_filter_order: 4
+        demod_bandwidth: 50
+        channels: {channel_name: [a, b], offset: [0.0, 0.0], gain: [1.0, 1.0]}
+
+Measurement fields take a bare value, which gets the default unit of that field, or a dict with
+``value``, ``unit`` and optionally ``conversion``/``resolution``.
+
+The same content can be given as a flat table (a pandas DataFrame or a list of dicts) with one
+row per device and a ``kind`` column of 'tempo', 'laserline', 'photodetector', 'lockinamp' or
+'channel'; 'channel' rows name their amplifier in a ``lockinamp`` column.
+"""
+import numbers
+import os
+
+import numpy as np
+from hdmf.common.table import VectorData
+
+from .tempo import (Measurement, LaserLine, PhotoDetector, LockInAmplifier, LaserLineDevices,
+                    PhotoDetectorDevices, LockInAmplifierDevices)
+from . import tempo as _tempo
+
+DEFAULT_UNITS = {
+    'analog_modulation_frequency': 'Hz',
+    'power': 'watts',
+    'gain': '',
+    'bandwidth': 'Hz',
+    'demod_bandwidth': 'Hz',
+    'offset': 'volts',
+}
+
+_TOP_LEVEL_KEYS = {'name', 'description', 'manufacturer', 'no_of_modules', 'units', 'laserlines',
+                   'photodetectors', 'lockinamps'}
+_DEVICE_FIELDS = {
+    'laserlines': ('analog_modulation_frequency', 'power'),
+    'photodetectors': ('gain', 'bandwidth'),
+}
+_COLUMNS = ('channel_name', 'offset', 'gain')
+# Measurement fields the spec stores as text; the others take numbers or numeric strings
+_TEXT_FIELDS = ('analog_modulation_frequency',)
+
+
+def load_config(config):
+    """Normalize *config* (dict, DataFrame, list of row dicts or YAML path) to the nested dict form."""
+    if isinstance(config, (str, os.PathLike)):
+        from ruamel.yaml import YAML
+        with open(config) as f:
+            config = YAML(typ='safe').load(f)
+    elif hasattr(config, 'to_dict') and hasattr(config, 'columns'):
+        config = _from_rows(config.to_dict('records'))
+    if isinstance(config, (list, tuple)):
+        config = _from_rows(config)
+    if not isinstance(config, dict):
+        raise TypeError('expected a dict, DataFrame, list of rows or YAML path, got %s' % type(config).__name__)
+    return config
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _from_rows(rows):
+    config = {'laserlines': [], 'photodetectors': [], 'lockinamps': []}
+    lockinamps = {}
+    channels = []
+    for row in rows:
+        row = {key: value for key, value in row.items() if not _is_missing(value)}
+        kind = row.pop('kind', None)
+        if kind == 'tempo':
+            config.update(row)
+        elif kind in ('laserline', 'photodetector'):
+            config[kind + 's'].append(row)
+        elif kind == 'lockinamp':
+            row.setdefault('channels', {column: [] for column in _COLUMNS})
+            lockinamps[row.get('name')] = row
+            config['lockinamps'].append(row)
+        elif kind == 'channel':
+            channels.append(row)
+        else:
+            raise ValueError("row has unknown kind %r" % kind)
+    for row in channels:
+        lockinamp = lockinamps.get(row.get('lockinamp'))
+        if lockinamp is None:
+            raise ValueError('channel %r refers to unknown lockinamp %r'
+                             % (row.get('channel_name'), row.get('lockinamp')))
+        for column in _COLUMNS:
+            lockinamp['channels'][column].append(row.get(column))
+    return config
+
+
+def _is_numeric_text(value):
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _check_measurement(field, value, where, errors):
+    if isinstance(value, dict):
+        unknown = set(value) - {'value', 'unit', 'conversion', 'resolution'}
+        if unknown or 'value' not in value:
+            errors.append('%s: measurement dicts need a value and may only have unit/conversion/resolution' % where)
+            return
+        value = value['value']
+    if isinstance(value, str):
+        valid = field in _TEXT_FIELDS or _is_numeric_text(value)
+    else:
+        valid = isinstance(value, numbers.Number)
+    if not valid:
+        errors.append('%s: expected a number, got %r' % (where, value))
+
+
+def _check_entry(entry, where, names, errors):
+    """Check the name of a device entry; False if the entry is not a dict and cannot be checked further."""
+    if not isinstance(entry, dict):
+        errors.append('%s: expected a mapping, got %r' % (where, entry))
+        return False
+    if not isinstance(entry.get('name'), str):
+        errors.append('%s: missing name' % where)
+    elif entry['name'] in names:
+        errors.append('%s: duplicate name %r' % (where, entry['name']))
+    names.add(entry.get('name'))
+    return True
+
+
+def _values(value):
+    return value.get('value') if isinstance(value, dict) else value
+
+
+def _check_channels(channels, where, errors):
+    lengths = {column: len(_values(channels.get(column)) or ()) for column in _COLUMNS}
+    if len(set(lengths.values())) > 1:
+        errors.append('%s: columns have different lengths %s' % (where, lengths))
+    if isinstance(channels.get('gain'), dict):
+        # offset is a Measurement, gain a plain column without unit or conversion
+        errors.append('%s.gain: expected a list of numbers, got a dict' % where)
+        return
+    for column in ('offset', 'gain'):
+        for j, value in enumerate(_values(channels.get(column)) or ()):
+            if not isinstance(value, numbers.Number):
+                errors.append('%s.%s[%d]: expected a number, got %r' % (where, column, j, value))
+
+
+def validate_config(config):
+    """Check the whole configuration at once and raise a ValueError listing every problem."""
+    errors = []
+    unknown = set(config) - _TOP_LEVEL_KEYS
+    if unknown:
+        errors.append('unknown keys: %s' % ', '.join(sorted(unknown)))
+    for section, fields in _DEVICE_FIELDS.items():
+        names = set()
+        for i, entry in enumerate(config.get(section) or ()):
+            where = '%s[%d]' % (section, i)
+            if not _check_entry(entry, where, names, errors):
+                continue
+            for field in fields:
+                if field in entry:
+                    _check_measurement(field, entry[field], '%s.%s' % (where, field), errors)
+    names = set()
+    for i, entry in enumerate(config.get('lockinamps') or ()):
+        where = 'lockinamps[%d]' % i
+        if not _check_entry(entry, where, names, errors):
+            continue
+        if 'demod_bandwidth' in entry:
+            _check_measurement('demod_bandwidth', entry['demod_bandwidth'], where + '.demod_bandwidth', errors)
+        _check_channels(entry.get('channels') or {}, where + '.channels', errors)
+    if errors:
+        raise ValueError('invalid TEMPO config:\n  - ' + '\n  - '.join(errors))
+
+
+class _MeasurementFactory:
+    """Resolves unit/conversion/resolution settings once per field and unit and reuses them.
+
+    Each Measurement is still its own container, since a container can only have one parent.
+    """
+
+    def __init__(self, units):
+        self.units = dict(DEFAULT_UNITS, **(units or {}))
+        self.__settings = {}
+
+    def __settings_for(self, field, spec):
+        key = (field, spec.get('unit'), spec.get('conversion'), spec.get('resolution'))
+        settings = self.__settings.get(key)
+        if settings is None:
+            settings = {'unit': spec.get('unit', self.units.get(field, ''))}
+            for attr in ('conversion', 'resolution'):
+                if spec.get(attr) is not None:
+                    settings[attr] = float(spec[attr])
+            self.__settings[key] = settings
+        return settings
+
+    def __call__(self, field, value, description=None, array=False):
+        spec = value if isinstance(value, dict) else {'value': value}
+        data = spec['value']
+        if not array:
+            data = [data]
+        if field in _TEXT_FIELDS:
+            data = [str(v) for v in data]
+        else:
+            data = [float(v) if isinstance(v, str) else v for v in data]
+        return Measurement(name=field, description=description or field, data=data,
+                           **self.__settings_for(field, spec))
+
+
+SECTIONS = ('laserlines', 'photodetectors', 'lockinamps')
+
+
+def tempo_from_config(config, cls=None, sections=SECTIONS):
+    """
+    Build a TEMPO device with all its LaserLine, PhotoDetector and LockInAmplifier devices from a
+    configuration, see the module documentation for the accepted forms.
+
+    :param sections: the device containers to build; the others are left out of the device
+    """
+    config = load_config(config)
+    validate_config(config)
+    measurement = _MeasurementFactory(config.get('units'))
+
+    def entries(section):
+        return (config.get(section) or ()) if section in sections else ()
+
+    laserlines = [LaserLine(name=entry['name'], reference=entry.get('reference'),
+                            description=entry.get('description'),
+                            **{field: measurement(field, entry[field])
+                               for field in _DEVICE_FIELDS['laserlines'] if field in entry})
+                  for entry in entries('laserlines')]
+    photodetectors = [PhotoDetector(name=entry['name'], reference=entry.get('reference'),
+                                    description=entry.get('description'),
+                                    **{field: measurement(field, entry[field])
+                                       for field in _DEVICE_FIELDS['photodetectors'] if field in entry})
+                      for entry in entries('photodetectors')]
+    lockinamps = []
+    for entry in entries('lockinamps'):
+        channels = entry.get('channels') or {}
+        offset = channels.get('offset') or []
+        columns = [VectorData(name='channel_name', description='name of the channel of lock_in_amp',
+                              data=list(channels.get('channel_name') or [])),
+                   measurement('offset', offset, 'offset for channel of lock_in_amp', array=True),
+                   VectorData(name='gain', description='gain for channel of lock_in_amp',
+                              data=[float(v) for v in channels.get('gain') or []])]
+        kwargs = {}
+        if 'demod_bandwidth' in entry:
+            kwargs['demod_bandwidth'] = measurement('demod_bandwidth', entry['demod_bandwidth'])
+        if entry.get('demodulation_filter_order') is not None:
+            kwargs['demodulation_filter_order'] = float(entry['demodulation_filter_order'])
+        lockinamps.append(LockInAmplifier(name=entry['name'], reference=entry.get('reference'),
+                                          description=entry.get('description'), columns=columns, **kwargs))
+
+    kwargs = {key: config[key] for key in ('description', 'manufacturer') if config.get(key) is not None}
+    if config.get('no_of_modules') is not None:
+        kwargs['no_of_modules'] = int(config['no_of_modules'])
+    if 'laserlines' in sections:
+        kwargs['laserline_devices'] = LaserLineDevices(laser_lines=laserlines)
+    if 'photodetectors' in sections:
+        kwargs['photodetector_devices'] = PhotoDetectorDevices(photo_detectors=photodetectors)
+    if 'lockinamps' in sections:
+        kwargs['lockinamp_devices'] = LockInAmplifierDevices(lock_in_amplifiers=lockinamps)
+    cls = cls or _tempo.TEMPO
+    return cls(name=config.get('name', 'tempo'), **kwargs)
+
+
+def _to_list(data):
+    values = np.asarray(data)
+    if values.dtype.kind in 'SUO':
+        return [value.decode('utf-8') if isinstance(value, bytes) else str(value) for value in values.ravel()]
+    return values.tolist()
+
+
+def _measurement_config(measurement, array=False):
+    if measurement is None:
+        return None
+    values = _to_list(measurement.data[:])
+    entry = {'value': values if array else values[0], 'unit': getattr(measurement, 'unit', '')}
+    for attr in ('conversion', 'resolution'):
+        if getattr(measurement, attr, None) is not None:
+            entry[attr] = float(getattr(measurement, attr))
+    return entry
+
+
+def _device_config(device, fields):
+    entry = {'name': device.name}
+    for attr in ('reference', 'description'):
+        if getattr(device, attr, None) is not None:
+            entry[attr] = getattr(device, attr)
+    for field in fields:
+        value = _measurement_config(getattr(device, field, None))
+        if value is not None:
+            entry[field] = value
+    return entry
+
+
+def tempo_to_config(tempo):
+    """Inverse of tempo_from_config: the configuration dict of a TEMPO device, with explicit units."""
+    config = {'name': tempo.name, 'no_of_modules': tempo.no_of_modules,
+              'laserlines': [], 'photodetectors': [], 'lockinamps': []}
+    for attr in ('description', 'manufacturer'):
+        if getattr(tempo, attr, None) is not None:
+            config[attr] = getattr(tempo, attr)
+    if tempo.laserline_devices is not None:
+        config['laserlines'] = [_device_config(laserline, _DEVICE_FIELDS['laserlines'])
+                                for laserline in tempo.laserline_devices.children]
+    if tempo.photodetector_devices is not None:
+        config['photodetectors'] = [_device_config(photodetector, _DEVICE_FIELDS['photodetectors'])
+                                    for photodetector in tempo.photodetector_devices.children]
+    for lockinamp in (tempo.lockinamp_devices.children if tempo.lockinamp_devices is not None else ()):
+        entry = _device_config(lockinamp, ())
+        if lockinamp.demod_bandwidth is not None:
+            entry['demod_bandwidth'] = _measurement_config(lockinamp.demod_bandwidth)
+        if lockinamp.demodulation_filter_order is not None:
+            entry['demodulation_filter_order'] = float(lockinamp.demodulation_filter_order)
+        entry['channels'] = {
+            'channel_name': _to_list(lockinamp['channel_name'].data[:]),
+            'offset': _measurement_config(lockinamp['offset'], array=True),
+            'gain': np.asarray(lockinamp['gain'].data[:], dtype=float).tolist(),
+        }
+        config['lockinamps'].append(entry)
+    return config
@@ -0,0 +1,370 @@
+"""
+Batch conversion of vendor rig exports (a rig configuration plus a raw binary signal dump per
+session) to ndx_tempo NWB files.
+
+A manifest lists the sessions, as JSON or YAML; relative paths are relative to the manifest and
+``defaults`` apply to every session::
+
+    defaults:
+      rate: 2000
+      dtype: int16
+      conversion: 0.000305       # volts per count; integer dumps are stored as counts (ndx_tempo.counts)
+      preset: archive
+    sessions:
+      - output: nwb/mouse01_day1.nwb
+        config: rigs/rig2.yaml       # or an inline config, see ndx_tempo.config
+        signals: dumps/mouse01_day1.bin
+        session_start_time: 2019-06-03T10:15:00-04:00
+        identifier: mouse01_day1
+
+With ``rig_store: <directory>`` the device tree of each distinct rig configuration is written
+once to that directory and linked from the sessions, see ndx_tempo.rig.
+
+Signal dumps are C-ordered ``(num_samples, num_channels)`` arrays after ``header_bytes`` bytes;
+``num_channels`` defaults to the number of channels of the lock-in amplifier (the first one, or
+``lockinamp``). They are memory-mapped and streamed chunk by chunk, so sessions of any length
+convert in constant memory.
+
+Sessions run on a process pool. A session is skipped when its output exists and the sha256 of its
+manifest entry and input files matches the one recorded in the ledger (``.ndx_tempo_convert.json``
+next to the manifest) at its last successful conversion; input digests are cached in the ledger by
+size and modification time, so unchanged dumps are not re-hashed. Run it as::
+
+    ndx-tempo-convert manifest.yaml --workers 8 --report timings.csv
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+
+import numpy as np
+from dateutil.parser import isoparse
+from dateutil.tz import tzlocal
+from pynwb import NWBFile, NWBHDF5IO
+
+from .config import tempo_from_config
+from .counts import counts_series
+from .index import file_sha256
+from .rig import RigStore
+from .streaming import iter_blocks, stream_data
+from .tempo import TempoSeries
+
+_logger = logging.getLogger(__name__)
+_rig_stores = {}
+
+LEDGER_NAME = '.ndx_tempo_convert.json'
+LEDGER_VERSION = 1
+DEFAULT_BLOCK_ROWS = 1 << 16
+
+_REQUIRED_KEYS = ('output', 'config', 'signals')
+_PATH_KEYS = _REQUIRED_KEYS + ('rig_store',)
+_SESSION_KEYS = set(_PATH_KEYS) | {
+    'rate', 'dtype', 'num_channels', 'header_bytes', 'conversion', 'lockinamp', 'series_name', 'preset',
+    'identifier', 'session_start_time', 'session_description', 'experimenter', 'lab', 'institution'}
+
+
+@dataclass
+class SessionResult:
+    output: str
+    status: str  # 'converted', 'skipped' or 'failed'
+    seconds: float = 0.0
+    samples: int = 0
+    input_bytes: int = 0
+    output_bytes: int = 0
+    digest: str = None
+    error: str = None
+
+    @property
+    def throughput(self):
+        """Input megabytes converted per second."""
+        return self.input_bytes / 1e6 / self.seconds if self.seconds else 0.0
+
+
+def load_manifest(path):
+    """The sessions of the manifest at *path* with defaults applied and paths made absolute."""
+    with open(path) as f:
+        if path.endswith('.json'):
+            manifest = json.load(f)
+        else:
+            from ruamel.yaml import YAML
+            manifest = YAML(typ='safe').load(f)
+    if isinstance(manifest, list):
+        manifest = {'sessions': manifest}
+    base = os.path.dirname(os.path.abspath(path))
+    defaults = manifest.get('defaults') or {}
+    sessions = []
+    for i, entry in enumerate(manifest.get('sessions') or ()):
+        session = dict(defaults, **entry)
+        unknown = set(session) - _SESSION_KEYS
+        if unknown:
+            raise ValueError('sessions[%d]: unknown keys %s' % (i, ', '.join(sorted(unknown))))
+        for key in _REQUIRED_KEYS:
+            if key not in session:
+                raise ValueError('sessions[%d]: missing %s' % (i, key))
+        for key in _PATH_KEYS:
+            if isinstance(session.get(key), str):
+                session[key] = os.path.normpath(os.path.join(base, os.path.expanduser(session[key])))
+        if session.get('session_start_time') is not None and not isinstance(session['session_start_time'], str):
+            # YAML parses unquoted timestamps itself
+            session['session_start_time'] = session['session_start_time'].isoformat()
+        sessions.append(session)
+    outputs = [session['output'] for session in sessions]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError('several sessions write to the same output file')
+    return sessions
+
+
+def _input_paths(session):
+    return [session[key] for key in ('config', 'signals') if isinstance(session[key], str)]
+
+
+class Ledger:
+    """
+    Digests of the inputs of every converted session, stored as JSON.
+
+    :param path: the ledger file, created on the first save
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sessions = {}
+        self.files = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state.get('version') == LEDGER_VERSION:
+                self.sessions = state.get('sessions', {})
+                self.files = state.get('files', {})
+
+    def save(self):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'version': LEDGER_VERSION, 'sessions': self.sessions, 'files': self.files}, f, indent=1,
+                      sort_keys=True)
+        os.replace(temporary, self.path)
+
+    def cached_digest(self, path):
+        """The recorded sha256 of *path* if its size and modification time did not change, else None."""
+        entry = self.files.get(path)
+        stat = os.stat(path)
+        if entry is not None and (entry['size'], entry['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+            return entry['sha256']
+        return None
+
+    def record_digest(self, path, sha256):
+        stat = os.stat(path)
+        self.files[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+
+    def session_digest(self, session):
+        """sha256 over the manifest entry and the digests of its input files."""
+        digest = hashlib.sha256(json.dumps(session, sort_keys=True, default=str).encode('utf-8'))
+        for path in _input_paths(session):
+            digest.update(self.files[path]['sha256'].encode('ascii'))
+        return digest.hexdigest()
+
+    def is_current(self, session, digest):
+        return self.sessions.get(session['output'], {}).get('digest') == digest and os.path.exists(session['output'])
+
+
+def _hash(path):
+    return path, file_sha256(path)
+
+
+def _nwbfile(session, tempo):
+    if session.get('session_start_time'):
+        start = isoparse(session['session_start_time'])
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=tzlocal())
+    else:
+        # legacy dumps often carry no start time; the dump's modification time is the best guess
+        start = datetime.fromtimestamp(os.path.getmtime(session['signals']), tzlocal())
+    identifier = session.get('identifier') or os.path.splitext(os.path.basename(session['output']))[0]
+    kwargs = {key: session[key] for key in ('experimenter', 'lab', 'institution') if session.get(key)}
+    nwbfile = NWBFile(session_description=session.get('session_description') or 'converted TEMPO session',
+                      identifier=identifier, session_start_time=start, **kwargs)
+    nwbfile.add_device(tempo)
+    return nwbfile
+
+
+def convert_session(session, block_rows=DEFAULT_BLOCK_ROWS):
+    """
+    Convert one manifest session and write its output file; the output only appears once it is
+    complete.
+
+    :return: a SessionResult
+    """
+    start = time.perf_counter()
+    store = None
+    if session.get('rig_store'):
+        store = _rig_stores.setdefault(session['rig_store'], RigStore(session['rig_store']))
+        tempo = store.session_device(session['config'])
+    else:
+        tempo = tempo_from_config(session['config'])
+    lockinamps = tempo.lockinamp_devices.children
+    if not lockinamps:
+        raise ValueError('the rig configuration has no lock-in amplifier')
+    lockinamp = tempo.lockinamp_devices[session['lockinamp']] if session.get('lockinamp') else lockinamps[0]
+    num_channels = int(session.get('num_channels') or len(lockinamp))
+    if num_channels != len(lockinamp):
+        raise ValueError('%d signal channels but lock-in amplifier %s has %d'
+                         % (num_channels, lockinamp.name, len(lockinamp)))
+    dtype = np.dtype(session.get('dtype', 'float64'))
+    signals = np.memmap(session['signals'], dtype=dtype, mode='r', offset=int(session.get('header_bytes', 0)))
+    if signals.size % num_channels:
+        raise ValueError('%s holds %d values, not a multiple of %d channels' % (session['signals'], signals.size,
+                                                                                num_channels))
+    signals = signals.reshape(-1, num_channels)
+    rate = float(session['rate'])
+    data = stream_data(iter_blocks(signals, block_rows), preset=session.get('preset'), rate=rate)
+    name = session.get('series_name', 'lockin_signals')
+    conversion = session.get('conversion')
+    if dtype.kind in 'iu' and conversion is not None:
+        series = counts_series(name, data, lockinamp, conversion=float(conversion), rate=rate)
+    else:
+        series = TempoSeries(name=name, data=data, rate=rate, channels=lockinamp.create_channel_region(),
+                             conversion=1.0 if conversion is None else float(conversion))
+    nwbfile = _nwbfile(session, tempo)
+    nwbfile.add_acquisition(series)
+
+    output = session['output']
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    temporary = output + '.part'
+    try:
+        with NWBHDF5IO(temporary, 'w') as io:
+            io.write(nwbfile)
+        if store is not None:
+            store.link(temporary, tempo)
+        os.replace(temporary, output)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return SessionResult(output=output, status='converted', seconds=time.perf_counter() - start,
+                         samples=len(signals), input_bytes=signals.nbytes, output_bytes=os.path.getsize(output))
+
+
+def _convert(session, digest, block_rows):
+    # runs in worker processes: return picklable results and never raise
+    try:
+        result = convert_session(session, block_rows)
+    except Exception as error:
+        result = SessionResult(output=session['output'], status='failed',
+                               error='%s: %s' % (type(error).__name__, error))
+    result.digest = digest
+    return result
+
+
+def convert(sessions, ledger=None, workers=1, force=False, block_rows=DEFAULT_BLOCK_ROWS, callback=None):
+    """
+    Convert *sessions* (as returned by load_manifest) on a process pool.
+
+    :param ledger: a Ledger, or the path of one, to skip sessions converted from the same inputs
+    :param workers: number of processes; None uses os.cpu_count()
+    :param force: convert sessions even if the ledger says they are up to date
+    :param callback: called with each SessionResult as it completes
+    :return: the SessionResults, in the order of *sessions*
+    """
+    if ledger is None or isinstance(ledger, str):
+        ledger = Ledger(ledger) if ledger else None
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(workers) if workers > 1 and len(sessions) > 1 else None
+    results = {}
+
+    def done(result):
+        results[result.output] = result
+        if ledger is not None and result.status == 'converted':
+            ledger.sessions[result.output] = {'digest': result.digest, 'converted': time.time()}
+            ledger.save()
+        if callback is not None:
+            callback(result)
+
+    try:
+        digests = {}
+        if ledger is not None:
+            paths = sorted({path for session in sessions for path in _input_paths(session)})
+            missing = [path for path in paths if ledger.cached_digest(path) is None]
+            hashed = pool.map(_hash, missing) if pool is not None else map(_hash, missing)
+            for path, sha256 in hashed:
+                ledger.record_digest(path, sha256)
+            for session in sessions:
+                digests[session['output']] = digest = ledger.session_digest(session)
+                if not force and ledger.is_current(session, digest):
+                    done(SessionResult(output=session['output'], status='skipped', digest=digest))
+        todo = [session for session in sessions if session['output'] not in results]
+        if pool is None:
+            for session in todo:
+                done(_convert(session, digests.get(session['output']), block_rows))
+        else:
+            futures = [pool.submit(_convert, session, digests.get(session['output']), block_rows)
+                       for session in todo]
+            for future in as_completed(futures):
+                done(future.result())
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if ledger is not None:
+            ledger.save()
+    return [results[session['output']] for session in sessions]
+
+
+def write_report(results, path):
+    """Write one CSV row of timing and throughput per session."""
+    names = [field.name for field in fields(SessionResult)] + ['throughput']
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, names)
+        writer.writeheader()
+        for result in results:
+            writer.writerow(dict(asdict(result), throughput=result.throughput))
+
+
+def _print_result(result):
+    if result.status == 'converted':
+        print('converted %s: %d samples in %.2f s (%.1f MB/s)'
+              % (result.output, result.samples, result.seconds, result.throughput))
+    elif result.status == 'skipped':
+        print('skipped %s: up to date' % result.output)
+    else:
+        print('FAILED %s: %s' % (result.output, result.error))
+    sys.stdout.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='ndx-tempo-convert',
+                                     description='Convert TEMPO rig exports listed in a manifest to NWB files.')
+    parser.add_argument('manifest', help='JSON or YAML manifest of the sessions to convert')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--ledger', help='ledger of converted sessions (default: %s next to the manifest)'
+                                         % LEDGER_NAME)
+    parser.add_argument('--force', action='store_true', help='convert sessions that are up to date, too')
+    parser.add_argument('--block-rows', type=int, default=DEFAULT_BLOCK_ROWS,
+                        help='rows read from a signal dump at a time (default: %(default)s)')
+    parser.add_argument('--report', help='write per-session timings to this CSV file')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    sessions = load_manifest(args.manifest)
+    ledger = args.ledger or os.path.join(os.path.dirname(os.path.abspath(args.manifest)), LEDGER_NAME)
+    start = time.perf_counter()
+    results = convert(sessions, ledger=ledger, workers=args.workers, force=args.force, block_rows=args.block_rows,
+                      callback=_print_result)
+    elapsed = time.perf_counter() - start
+    if args.report:
+        write_report(results, args.report)
+    counts = {status: sum(result.status == status for result in results)
+              for status in ('converted', 'skipped', 'failed')}
+    converted_bytes = sum(result.input_bytes for result in results if result.status == 'converted')
+    print('%(converted)d converted, %(skipped)d skipped, %(failed)d failed' % counts
+          + ' in %.1f s (%.1f MB/s)' % (elapsed, converted_bytes / 1e6 / elapsed if elapsed else 0.0))
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Integer storage of TEMPO signals as raw ADC counts.
+
+A counts TempoSeries stores the amplifier's native integers (e.g. int16, a quarter of float64)
+with ``conversion`` set to the size of one count in the series' unit. Physical values are
+
+    ``offset[channel] + gain[channel] * conversion * counts``
+
+with ``offset`` and ``gain`` taken from the LockInAmplifier rows the series' ``channels`` region
+points to. :py:class:`CountsView` decodes lazily and only the slice that is read, so nothing is
+converted to float until it is used::
+
+    series = counts_series('lockin_counts', adc_counts, lockinamp, conversion=10.0 / 2 ** 15, rate=2000.0)
+    ...
+    trace = series.decoded()[10000:20000, 3]      # float64 volts, read and decoded on demand
+"""
+import numpy as np
+
+from .presets import get_preset, h5dataio
+from .views import data_view
+
+
+def decode_counts(counts, gain=1.0, offset=0.0, conversion=1.0, dtype='float64'):
+    """Physical values ``offset + gain * conversion * counts``, broadcasting gain/offset over the last axis."""
+    scale = np.asarray(gain, dtype=dtype) * conversion
+    return np.asarray(offset, dtype=dtype) + scale * np.asarray(counts, dtype=dtype)
+
+
+def encode_counts(values, gain=1.0, offset=0.0, conversion=1.0, dtype='int16', tolerance=1e-6):
+    """
+    Inverse of decode_counts: the integer counts of physical *values*.
+
+    :param tolerance: largest allowed rounding error, as a fraction of one count; a ValueError is
+                      raised for values that are not (within tolerance) whole counts or that do not
+                      fit *dtype*, since storing them as counts would lose precision
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind not in 'iu':
+        raise ValueError('counts must have an integer dtype, got %s' % dtype)
+    scale = np.asarray(gain, dtype=float) * conversion
+    exact = (np.asarray(values, dtype=float) - np.asarray(offset, dtype=float)) / scale
+    counts = np.rint(exact)
+    info = np.iinfo(dtype)
+    if counts.size and (counts.min() < info.min or counts.max() > info.max):
+        raise ValueError('values span counts %d..%d, which do not fit %s' % (counts.min(), counts.max(), dtype))
+    if tolerance is not None and counts.size and np.abs(exact - counts).max() > tolerance:
+        raise ValueError('values are not whole counts of %g (largest error %.3g counts)'
+                         % (np.ravel(scale)[0], np.abs(exact - counts).max()))
+    return counts.astype(dtype)
+
+
+def channel_parameters(channels):
+    """Per-column (gain, offset) arrays of a TempoSeries from the LockInAmplifier rows of *channels*."""
+    rows = np.asarray(channels.data[:], dtype=np.intp)
+    lockinamp = channels.table
+    return lockinamp.gains[rows], lockinamp.offsets[rows]
+
+
+class CountsView:
+    """
+    Lazily decoded view of a TempoSeries that stores integer counts. Indexing reads only the
+    selected counts (through ndx_tempo.views.data_view) and decodes them in one vectorized step.
+    """
+
+    def __init__(self, series, dtype='float64'):
+        self.series = series
+        self.counts = data_view(series)
+        if np.dtype(self.counts.dtype).kind not in 'iu':
+            raise ValueError('%s does not store integer counts (dtype %s)' % (series.name, self.counts.dtype))
+        self.dtype = np.dtype(dtype)
+        self.conversion = float(series.conversion if series.conversion is not None else 1.0)
+        self.gain, self.offset = channel_parameters(series.channels)
+
+    @property
+    def shape(self):
+        return self.counts.shape
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, selection):
+        if not isinstance(selection, tuple):
+            selection = (selection,)
+        counts = np.asarray(self.counts[selection])
+        if self.ndim == 1:
+            gain, offset = self.gain[0], self.offset[0]
+        else:
+            columns = selection[1] if len(selection) > 1 else slice(None)
+            gain, offset = self.gain[columns], self.offset[columns]
+        return decode_counts(counts, gain, offset, self.conversion, self.dtype)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self[:], dtype=dtype)
+
+    def iter_blocks(self, block_rows):
+        """Yield ``(start, decoded block)`` along the first axis."""
+        for start in range(0, len(self), block_rows):
+            yield start, self[start:start + block_rows]
+
+
+def counts_series(name, counts, lockinamp, conversion, region=None, preset=None, **kwargs):
+    """
+    TempoSeries storing integer *counts* of shape (num_samples, num_columns).
+
+    :param lockinamp: the LockInAmplifier whose gain/offset decode the columns
+    :param conversion: size of one count in the series' unit, e.g. ADC range / 2 ** bits
+    :param region: LockInAmplifier rows of the columns, all rows by default
+    :param preset: write preset of the data (see ndx_tempo.presets); the integer-aware 'archive'
+                   preset by default. Pass already wrapped data (e.g. from stream_data) to keep it.
+    :param kwargs: passed on to TempoSeries, e.g. rate or timestamps
+    """
+    from .tempo import TempoSeries
+    if hasattr(counts, 'dtype') and np.dtype(counts.dtype).kind not in 'iu':
+        raise ValueError('counts must have an integer dtype, got %s' % counts.dtype)
+    if isinstance(counts, np.ndarray):
+        counts = h5dataio(counts, get_preset(preset or 'archive'), rate=kwargs.get('rate'))
+    kwargs.setdefault('resolution', float(conversion))
+    kwargs.setdefault('description', 'integer ADC counts; physical values are offset + gain * conversion * counts '
+                                     'with the gain and offset of the LockInAmplifier channels')
+    return TempoSeries(name=name, data=counts, channels=lockinamp.create_channel_region(region=region),
+                       conversion=float(conversion), **kwargs)
@@ -0,0 +1,376 @@
+"""
+Software lock-in demodulation driven by the metadata of a TEMPO device.
+
+Every photodetector trace (one LockInAmplifier channel) is demodulated at the
+analog_modulation_frequency of every LaserLine, for all channels and lines at once:
+
+* the raw trace is scaled to physical units, ``gain * raw + offset`` with the per-channel
+  ``offset`` (times its Measurement conversion) and ``gain`` of the LockInAmplifier;
+* it is mixed with ``2 * exp(-2j * pi * f * t)``;
+* it is low-pass filtered by ``demodulation_filter_order`` cascaded first-order filters whose
+  combined -3 dB bandwidth is ``demod_bandwidth``, as in hardware lock-in amplifiers.
+
+The result is complex: the real part is the in-phase (X), the imaginary part the quadrature (Y)
+component and its modulus the amplitude (R) of the modulated signal.
+
+The first-order recursion ``y[k] = a * y[k-1] + (1 - a) * x[k]`` is evaluated in closed form
+with cumulative sums over segments anchored at absolute sample indices, and the partial sums
+are carried over between blocks, so processing a recording block by block returns exactly the
+same numbers as processing it in one call.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from .streaming import iter_blocks, stream_data
+from .tempo import TempoSeries
+from .utils import get_processing_module, measurement_value
+
+COMPONENTS = ('in_phase', 'quadrature', 'amplitude', 'phase')
+
+# samples per block when reading raw data
+DEFAULT_BLOCK_ROWS = 1 << 14
+# samples per window shared with the worker processes
+DEFAULT_WINDOW_ROWS = 1 << 17
+
+# a segment is cut short before a ** -length overflows
+_MAX_LOG_GROWTH = 600.0
+_MAX_SEGMENT = 1 << 16
+
+
+def stage_decay(bandwidth, filter_order, rate):
+    """Coefficient ``a`` of each first-order stage so that *filter_order* of them have a -3 dB
+    bandwidth of *bandwidth* Hz at a sampling rate of *rate* Hz."""
+    if bandwidth <= 0:
+        raise ValueError('demodulation bandwidth must be positive, got %r' % bandwidth)
+    cutoff = bandwidth / np.sqrt(2.0 ** (1.0 / filter_order) - 1.0)
+    return float(np.exp(-2.0 * np.pi * cutoff / rate))
+
+
+def _segment_length(decay):
+    if decay <= 0.0:
+        return 1
+    return int(min(_MAX_SEGMENT, max(1, _MAX_LOG_GROWTH // -np.log(decay))))
+
+
+def select_component(demodulated, component):
+    """Return one of COMPONENTS of the complex output of LockInDemodulator.process."""
+    if component == 'in_phase':
+        return demodulated.real
+    if component == 'quadrature':
+        return demodulated.imag
+    if component == 'amplitude':
+        return np.abs(demodulated)
+    if component == 'phase':
+        return np.angle(demodulated)
+    raise ValueError('unknown component %r, expected one of %s' % (component, ', '.join(COMPONENTS)))
+
+
+class LockInDemodulator:
+    """
+    Block-streaming software lock-in.
+
+    :param rate: sampling rate of the raw traces in Hz
+    :param frequencies: modulation frequency of each laser line in Hz
+    :param bandwidth: -3 dB bandwidth of the demodulation filter in Hz
+    :param filter_order: number of cascaded first-order filter stages
+    :param offset: per-channel offset added after the gain, in physical units
+    :param gain: per-channel gain applied to the raw traces
+    """
+
+    def __init__(self, rate, frequencies, bandwidth, filter_order=1, offset=0.0, gain=1.0):
+        self.rate = float(rate)
+        self.frequencies = np.atleast_1d(np.asarray(frequencies, dtype=float))
+        self.bandwidth = float(bandwidth)
+        self.filter_order = max(1, int(round(filter_order)))
+        self.offset = np.asarray(offset, dtype=float)
+        self.gain = np.asarray(gain, dtype=float)
+        self.decay = stage_decay(self.bandwidth, self.filter_order, self.rate)
+        self.segment = _segment_length(self.decay)
+        exponents = np.arange(self.segment + 1, dtype=float)
+        self.__powers = np.power(self.decay, exponents)
+        with np.errstate(divide='ignore', over='ignore'):
+            self.__inverse_powers = np.power(self.decay, -exponents[:-1]) if self.decay > 0 else np.ones(1)
+        self.reset()
+
+    @classmethod
+    def from_device(cls, tempo, rate, lockinamp=None, channels=None):
+        """
+        Build a demodulator from the LaserLine and LockInAmplifier metadata of a TEMPO device.
+
+        :param tempo: the TEMPO device
+        :param rate: sampling rate of the raw traces in Hz
+        :param lockinamp: name of the LockInAmplifier to use, the first one by default
+        :param channels: names of the lock-in channels the raw traces hold, all channels by default
+        """
+        lockinamp = get_lockinamp(tempo, lockinamp)
+        frequencies = [measurement_value(laserline.analog_modulation_frequency)
+                       for laserline in tempo.laserline_devices.children]
+        offset, gain = lockinamp.offsets, lockinamp.gains
+        if channels is not None:
+            rows = lockinamp.channel_indices(channels)
+            offset, gain = offset[rows], gain[rows]
+        filter_order = lockinamp.demodulation_filter_order
+        if filter_order is None or filter_order < 1:
+            filter_order = 1
+        return cls(rate, frequencies, measurement_value(lockinamp.demod_bandwidth), filter_order=filter_order,
+                   offset=offset, gain=gain)
+
+    @property
+    def parameters(self):
+        return dict(rate=self.rate, frequencies=self.frequencies, bandwidth=self.bandwidth,
+                    filter_order=self.filter_order, offset=self.offset, gain=self.gain)
+
+    def clone(self):
+        """A demodulator with the same parameters and a fresh state."""
+        return type(self)(**self.parameters)
+
+    def reset(self):
+        """Forget the filter state and restart at sample 0."""
+        self.__sample = 0
+        self.__start = None
+        self.__sums = None
+
+    @property
+    def sample(self):
+        """Absolute index of the next sample to process."""
+        return self.__sample
+
+    def get_state(self):
+        """Copy of the filter state, to resume elsewhere with set_state."""
+        if self.__start is None:
+            return self.__sample, None, None
+        return self.__sample, self.__start.copy(), self.__sums.copy()
+
+    def set_state(self, state):
+        sample, start, sums = state
+        self.__sample = sample
+        self.__start = None if start is None else start.copy()
+        self.__sums = None if sums is None else sums.copy()
+
+    def __lowpass(self, piece, stage, position):
+        m = len(piece)
+        shape = (m,) + (1,) * (piece.ndim - 1)
+        scaled = piece * self.__inverse_powers[position:position + m].reshape(shape)
+        sums = np.cumsum(np.concatenate([self.__sums[stage][np.newaxis], scaled]), axis=0)[1:]
+        out = (self.__powers[position + 1:position + m + 1].reshape(shape) * self.__start[stage]
+               + (1.0 - self.decay) * self.__powers[position:position + m].reshape(shape) * sums)
+        if position + m == self.segment:
+            self.__start[stage] = out[-1]
+            self.__sums[stage] = 0.0
+        else:
+            self.__sums[stage] = sums[-1]
+        return out
+
+    def process(self, block):
+        """
+        Demodulate the next block of raw traces.
+
+        :param block: raw samples, shape (num_samples, num_channels)
+        :return: complex array of shape (num_samples, num_channels, num_lines)
+        """
+        raw = np.asarray(block, dtype=float)
+        if raw.ndim == 1:
+            raw = raw[:, np.newaxis]
+        num_samples, num_channels = raw.shape
+        if self.__start is None:
+            state_shape = (self.filter_order, num_channels, len(self.frequencies))
+            self.__start = np.zeros(state_shape, dtype=complex)
+            self.__sums = np.zeros(state_shape, dtype=complex)
+        elif self.__start.shape[1] != num_channels:
+            raise ValueError('block has %d channels, expected %d' % (num_channels, self.__start.shape[1]))
+
+        index = np.arange(self.__sample, self.__sample + num_samples, dtype=float)
+        phasor = np.exp(-2j * np.pi * np.multiply.outer(index, self.frequencies / self.rate))
+        mixed = 2.0 * (self.gain * raw + self.offset)[:, :, np.newaxis] * phasor[:, np.newaxis, :]
+
+        out = np.empty_like(mixed)
+        done = 0
+        while done < num_samples:
+            position = (self.__sample + done) % self.segment
+            stop = done + min(num_samples - done, self.segment - position)
+            piece = mixed[done:stop]
+            for stage in range(self.filter_order):
+                piece = self.__lowpass(piece, stage, position)
+            out[done:stop] = piece
+            done = stop
+        self.__sample += num_samples
+        return out
+
+    def iter_process(self, raw, block_rows=DEFAULT_BLOCK_ROWS):
+        """Demodulate *raw* block by block, yielding the complex output of each block."""
+        for block in iter_blocks(raw, block_rows):
+            yield self.process(block)
+
+
+def _attach(name):
+    """Attach to an existing shared memory block without handing it to this process's resource tracker."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _demodulate_job(parameters, state, raw_name, raw_shape, out_name, out_shape, num_rows, channels, line,
+                    block_rows):
+    raw_shm, out_shm = _attach(raw_name), _attach(out_name)
+    raw = np.ndarray(raw_shape, dtype=float, buffer=raw_shm.buf)
+    out = np.ndarray(out_shape, dtype=complex, buffer=out_shm.buf)
+    try:
+        demodulator = LockInDemodulator(**parameters)
+        if state is not None:
+            demodulator.set_state(state)
+        for start in range(0, num_rows, block_rows):
+            stop = min(start + block_rows, num_rows)
+            out[start:stop, channels, line] = demodulator.process(raw[start:stop, channels])[:, :, 0]
+        return demodulator.get_state()
+    finally:
+        del raw, out
+        raw_shm.close()
+        out_shm.close()
+
+
+class ParallelDemodulator:
+    """
+    Run a LockInDemodulator on a process pool.
+
+    The (channel, laser line) grid is split into jobs of one laser line and a contiguous group of
+    LockInAmplifier channels. The raw samples are processed in windows: each window is copied
+    once into shared memory, every worker reads its channels from there and writes its output
+    into a shared output window, and the filter state of every job is handed back and forth with
+    the jobs. Since each column only depends on its own input, the output is identical to the
+    serial path.
+
+    :param demodulator: the LockInDemodulator whose parameters to use; its state is not touched
+    :param workers: number of worker processes, os.cpu_count() by default; 1 runs in-process
+    :param window_rows: samples per window
+    :param block_rows: samples per LockInDemodulator.process call within a window
+    """
+
+    def __init__(self, demodulator, workers=None, window_rows=DEFAULT_WINDOW_ROWS, block_rows=DEFAULT_BLOCK_ROWS):
+        self.demodulator = demodulator
+        self.workers = workers or os.cpu_count() or 1
+        self.window_rows = int(window_rows)
+        self.block_rows = int(block_rows)
+
+    def jobs(self, num_channels):
+        """The (channel slice, laser line) pairs the work is split into."""
+        num_lines = len(self.demodulator.frequencies)
+        num_groups = min(num_channels, max(1, -(-self.workers // num_lines)))
+        bounds = np.linspace(0, num_channels, num_groups + 1).astype(int)
+        return [(slice(start, stop), line) for start, stop in zip(bounds, bounds[1:]) for line in range(num_lines)]
+
+    def __job_parameters(self, channels, line, num_channels):
+        parameters = self.demodulator.parameters
+        parameters['frequencies'] = parameters['frequencies'][line:line + 1]
+        parameters['offset'] = np.broadcast_to(parameters['offset'], (num_channels,))[channels]
+        parameters['gain'] = np.broadcast_to(parameters['gain'], (num_channels,))[channels]
+        return parameters
+
+    def iter_process(self, raw):
+        """Demodulate *raw* of shape (num_samples, num_channels), yielding one complex output array
+        of shape (window_rows, num_channels, num_lines) per window."""
+        if self.workers == 1:
+            worker = self.demodulator.clone()
+            for window in iter_blocks(raw, self.window_rows):
+                yield np.concatenate([worker.process(block) for block in iter_blocks(window, self.block_rows)])
+            return
+
+        num_samples, num_channels = raw.shape
+        num_lines = len(self.demodulator.frequencies)
+        raw_shape = (self.window_rows, num_channels)
+        out_shape = raw_shape + (num_lines,)
+        raw_shm = shared_memory.SharedMemory(create=True, size=int(np.prod(raw_shape)) * 8)
+        out_shm = shared_memory.SharedMemory(create=True, size=int(np.prod(out_shape)) * 16)
+        raw_window = np.ndarray(raw_shape, dtype=float, buffer=raw_shm.buf)
+        out_window = np.ndarray(out_shape, dtype=complex, buffer=out_shm.buf)
+        try:
+            jobs = self.jobs(num_channels)
+            parameters = [self.__job_parameters(channels, line, num_channels) for channels, line in jobs]
+            states = [None] * len(jobs)
+            with ProcessPoolExecutor(self.workers) as pool:
+                for start in range(0, num_samples, self.window_rows):
+                    num_rows = min(self.window_rows, num_samples - start)
+                    raw_window[:num_rows] = raw[start:start + num_rows]
+                    futures = [pool.submit(_demodulate_job, job_parameters, state, raw_shm.name, raw_shape,
+                                           out_shm.name, out_shape, num_rows, channels, line, self.block_rows)
+                               for job_parameters, state, (channels, line) in zip(parameters, states, jobs)]
+                    states = [future.result() for future in futures]
+                    yield out_window[:num_rows].copy()
+        finally:
+            del raw_window, out_window
+            raw_shm.close()
+            raw_shm.unlink()
+            out_shm.close()
+            out_shm.unlink()
+
+    def process(self, raw):
+        """Demodulate all of *raw* and return the complex output of shape (num_samples, num_channels, num_lines)."""
+        return np.concatenate(list(self.iter_process(raw)))
+
+
+def get_lockinamp(tempo, lockinamp=None):
+    """Return the LockInAmplifier called *lockinamp* of a TEMPO device, or its first one."""
+    if lockinamp is None:
+        return tempo.lockinamp_devices.children[0]
+    if isinstance(lockinamp, str):
+        return tempo.lockinamp_devices.get_lockinamp(lockinamp)
+    return lockinamp
+
+
+def demodulated_series(demodulator, raw, lockinamp, name, component='amplitude', block_rows=DEFAULT_BLOCK_ROWS,
+                       chunk_rows=None, preset=None, workers=1, **kwargs):
+    """
+    Return a TempoSeries holding one component of the demodulated *raw* data.
+
+    The data is demodulated lazily, block by block, while the series is written. Column
+    ``channel * num_lines + line`` holds LockInAmplifier channel ``channel`` demodulated at the
+    modulation frequency of laser line ``line``, so ``channels`` repeats every channel row
+    num_lines times.
+
+    :param raw: array-like of shape (num_samples, num_channels) that can be sliced more than once,
+                e.g. an h5py dataset or numpy.memmap
+    :param preset: write preset of the data, see ndx_tempo.presets
+    :param workers: number of processes to demodulate with, see ParallelDemodulator
+    :param kwargs: passed on to TempoSeries
+    """
+    num_lines = len(demodulator.frequencies)
+    region = [channel for channel in range(raw.shape[1]) for _ in range(num_lines)]
+    window_rows = block_rows if workers == 1 else max(block_rows, DEFAULT_WINDOW_ROWS)
+
+    def blocks():
+        runner = ParallelDemodulator(demodulator, workers=workers, window_rows=window_rows, block_rows=block_rows)
+        for demodulated in runner.iter_process(raw):
+            yield select_component(demodulated, component).reshape(len(demodulated), -1)
+
+    kwargs.setdefault('description', '%s of the lock-in demodulated signals at %s Hz' % (
+        component.replace('_', '-'), ', '.join('%g' % f for f in demodulator.frequencies)))
+    kwargs.setdefault('unit', 'radians' if component == 'phase' else 'volts')
+    data = stream_data(blocks(), chunk_rows=chunk_rows, preset=preset, rate=demodulator.rate)
+    return TempoSeries(name=name, data=data,
+                       channels=lockinamp.create_channel_region(region=region), rate=demodulator.rate, **kwargs)
+
+
+def add_demodulated_series(nwbfile, tempo, raw, rate, lockinamp=None, components=('amplitude',),
+                           prefix='demodulated', module='tempo', **kwargs):
+    """
+    Demodulate *raw* with the parameters of *tempo* and add one TempoSeries per component to the
+    processing module *module* of *nwbfile*. Each component is computed in its own streaming
+    pass over *raw* when the file is written.
+
+    :return: the added TempoSeries
+    """
+    lockinamp = get_lockinamp(tempo, lockinamp)
+    demodulator = LockInDemodulator.from_device(tempo, rate, lockinamp)
+    processing = get_processing_module(nwbfile, module, 'signals derived from a TEMPO device')
+    added = []
+    for component in components:
+        series = demodulated_series(demodulator, raw, lockinamp, '%s_%s' % (prefix, component),
+                                    component=component, **kwargs)
+        processing.add(series)
+        added.append(series)
+    return added
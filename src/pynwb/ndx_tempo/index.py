@@ -0,0 +1,280 @@
+"""
+SQLite index of the TEMPO rig configuration of every NWB file in a directory tree.
+
+Files are read with :py:func:`ndx_tempo.metadata.read_metadata`, so indexing never builds pynwb
+objects, and :py:meth:`TempoIndex.update` only re-reads files whose size or modification time
+changed (and, with ``checksum=True``, whose content actually changed). Numeric fields are stored
+in SI units (value times conversion times the scale of the unit, see :py:mod:`ndx_tempo.units`)
+with an index on every queried column, so questions such as
+"sessions with a laser line above 1 mW at 1 kHz and a 4th order lock-in filter" are answered by
+:py:meth:`TempoIndex.sessions` without opening any NWB file::
+
+    with TempoIndex('archive.sqlite') as index:
+        index.update('/data/archive')
+        paths = index.sessions(min_power=1e-3, frequency=1000.0, filter_order=4)
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatch
+
+from .metadata import read_metadata
+from .units import UnitError, parse_unit
+
+_logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    sha256 TEXT,
+    identifier TEXT,
+    session_start_time TEXT,
+    subject_id TEXT,
+    species TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS laserlines (
+    file_id INTEGER NOT NULL REFERENCES files ON DELETE CASCADE,
+    tempo TEXT, name TEXT, reference TEXT,
+    frequency REAL, power REAL, power_unit TEXT
+);
+CREATE TABLE IF NOT EXISTS photodetectors (
+    file_id INTEGER NOT NULL REFERENCES files ON DELETE CASCADE,
+    tempo TEXT, name TEXT, reference TEXT,
+    gain REAL, bandwidth REAL
+);
+CREATE TABLE IF NOT EXISTS lockinamps (
+    file_id INTEGER NOT NULL REFERENCES files ON DELETE CASCADE,
+    tempo TEXT, name TEXT, reference TEXT,
+    filter_order REAL, demod_bandwidth REAL, num_channels INTEGER
+);
+CREATE TABLE IF NOT EXISTS surgeries (
+    file_id INTEGER NOT NULL REFERENCES files ON DELETE CASCADE,
+    surgery_date TEXT, target_anatomy TEXT, virus_injection_opsin TEXT, virus_injection_volume REAL,
+    ophys_injection_brain_area TEXT, ophys_implant_name TEXT
+);
+CREATE INDEX IF NOT EXISTS laserlines_frequency_power ON laserlines (frequency, power);
+CREATE INDEX IF NOT EXISTS laserlines_file ON laserlines (file_id);
+CREATE INDEX IF NOT EXISTS photodetectors_gain ON photodetectors (gain);
+CREATE INDEX IF NOT EXISTS photodetectors_file ON photodetectors (file_id);
+CREATE INDEX IF NOT EXISTS lockinamps_filter_order ON lockinamps (filter_order, demod_bandwidth);
+CREATE INDEX IF NOT EXISTS lockinamps_file ON lockinamps (file_id);
+CREATE INDEX IF NOT EXISTS surgeries_opsin ON surgeries (virus_injection_opsin);
+CREATE INDEX IF NOT EXISTS surgeries_file ON surgeries (file_id);
+"""
+
+
+def _number(value):
+    try:
+        return float(value.decode('utf-8') if isinstance(value, bytes) else value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _si(measurement):
+    if measurement is None:
+        return None
+    value = _number(measurement.value)
+    if value is None:
+        return None
+    try:
+        scale = parse_unit(measurement.unit or '').scale
+    except UnitError:
+        # not comparable with the other files, so not indexed rather than stored unscaled
+        return None
+    return value * measurement.conversion * scale
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read(path):
+    # runs in worker processes: return picklable results and never raise
+    try:
+        return path, read_metadata(path), None
+    except Exception as error:
+        return path, None, '%s: %s' % (type(error).__name__, error)
+
+
+def find_files(root, pattern='*.nwb'):
+    """All files under *root* whose name matches *pattern*, sorted."""
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        paths.extend(os.path.join(dirpath, filename) for filename in filenames if fnmatch(filename, pattern))
+    return sorted(paths)
+
+
+class TempoIndex:
+    """
+    SQLite-backed index of LaserLine, PhotoDetector, LockInAmplifier and Surgery fields across files.
+
+    :param path: the index database, created if needed; ':memory:' keeps it in memory
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise ValueError('%s has index schema version %d, expected %d' % (path, version, SCHEMA_VERSION))
+        with self.connection:
+            if 0 < version < SCHEMA_VERSION:
+                # values of older schemas are not comparable: drop them, the next update re-reads every file
+                _logger.info('rebuilding %s: index schema version %d, expected %d', path, version, SCHEMA_VERSION)
+                for table in ('surgeries', 'lockinamps', 'photodetectors', 'laserlines', 'files'):
+                    self.connection.execute('DROP TABLE IF EXISTS %s' % table)
+            self.connection.executescript(_SCHEMA)
+            self.connection.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM files WHERE error IS NULL').fetchone()[0]
+
+    def _stale(self, paths, checksum):
+        """The paths whose stat (or content, with checksum) changed since they were indexed."""
+        known = {row[0]: row[1:] for row in self.connection.execute('SELECT path, size, mtime_ns, sha256 FROM files')}
+        stale, touched = [], []
+        for path in paths:
+            stat = os.stat(path)
+            previous = known.get(path)
+            if previous is not None and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+                continue
+            sha256 = file_sha256(path) if checksum else None
+            if previous is not None and sha256 is not None and previous[2] == sha256:
+                touched.append((stat.st_size, stat.st_mtime_ns, path))
+            else:
+                stale.append((path, stat, sha256))
+        return stale, touched
+
+    def update(self, root, pattern='*.nwb', workers=1, checksum=False):
+        """
+        Bring the index up to date with the files under *root*.
+
+        :param workers: number of processes to read files with; None uses os.cpu_count()
+        :param checksum: also hash files whose stat changed and skip re-reading those whose content did not
+        :return: dict with the number of 'added', 'updated', 'removed', 'unchanged' and 'failed' files
+        """
+        root = os.path.abspath(root)
+        paths = find_files(root, pattern)
+        stale, touched = self._stale(paths, checksum)
+        known = {row[0] for row in self.connection.execute(
+            "SELECT path FROM files WHERE path = ? OR path LIKE ? ESCAPE '!'",
+            (root, root.replace('!', '!!').replace('%', '!%').replace('_', '!_') + os.sep + '%'))}
+        removed = known - set(paths)
+        stats = {'added': 0, 'updated': 0, 'removed': len(removed), 'failed': 0,
+                 'unchanged': len(paths) - len(stale)}
+
+        stat_of = {path: (stat, sha256) for path, stat, sha256 in stale}
+        workers = workers or os.cpu_count() or 1
+        pool = ProcessPoolExecutor(workers) if workers > 1 and len(stale) > 1 else None
+        if pool is None:
+            results = map(_read, stat_of)
+        else:
+            results = pool.map(_read, stat_of, chunksize=max(1, len(stale) // (4 * workers)))
+        try:
+            with self.connection:
+                self.connection.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in removed])
+                self.connection.executemany('UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?', touched)
+                for path, metadata, error in results:
+                    stat, sha256 = stat_of[path]
+                    if error is not None:
+                        _logger.warning('could not index %s: %s', path, error)
+                        stats['failed'] += 1
+                    else:
+                        stats['updated' if path in known else 'added'] += 1
+                    self._store(path, stat, sha256, metadata, error)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return stats
+
+    def _store(self, path, stat, sha256, metadata, error):
+        connection = self.connection
+        connection.execute('DELETE FROM files WHERE path = ?', (path,))
+        subject = metadata.subject if metadata is not None else None
+        file_id = connection.execute(
+            'INSERT INTO files (path, size, mtime_ns, sha256, identifier, session_start_time, subject_id, species, '
+            'error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (path, stat.st_size, stat.st_mtime_ns, sha256,
+             metadata.identifier if metadata is not None else None,
+             metadata.session_start_time if metadata is not None else None,
+             subject.subject_id if subject is not None else None,
+             subject.species if subject is not None else None, error)).lastrowid
+        if metadata is None:
+            return
+        for tempo in metadata.devices:
+            connection.executemany(
+                'INSERT INTO laserlines VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(file_id, tempo.name, line.name, line.reference, _si(line.analog_modulation_frequency),
+                  _si(line.power), line.power.unit if line.power is not None else None)
+                 for line in tempo.laserlines])
+            connection.executemany(
+                'INSERT INTO photodetectors VALUES (?, ?, ?, ?, ?, ?)',
+                [(file_id, tempo.name, detector.name, detector.reference, _si(detector.gain), _si(detector.bandwidth))
+                 for detector in tempo.photodetectors])
+            connection.executemany(
+                'INSERT INTO lockinamps VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(file_id, tempo.name, amp.name, amp.reference, amp.demodulation_filter_order,
+                  _si(amp.demod_bandwidth), len(amp.channel_name)) for amp in tempo.lockinamps])
+        surgery = subject.surgery if subject is not None else None
+        if surgery is not None:
+            connection.execute(
+                'INSERT INTO surgeries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (file_id, surgery.surgery_date, surgery.surgery_arget_anatomy, surgery.virus_injection_opsin,
+                 _number(surgery.virus_injection_volume), surgery.ophys_injection_brain_area,
+                 surgery.ophys_implant_name))
+
+    def query(self, sql, parameters=()):
+        """Run a read-only SQL query against the index tables and return all rows."""
+        return self.connection.execute(sql, parameters).fetchall()
+
+    def sessions(self, min_power=None, max_power=None, frequency=None, frequency_tolerance=1e-6,
+                 filter_order=None, max_demod_bandwidth=None, min_gain=None, opsin=None, brain_area=None):
+        """
+        Paths of the indexed files matching every given condition.
+
+        Power (watts) and frequency (Hz) conditions must hold for the same laser line; filter order
+        and demodulation bandwidth (Hz) for the same lock-in amplifier.
+        """
+        conditions, parameters = [], []
+
+        def exists(table, clauses):
+            clauses = [(sql, value) for sql, value in clauses if value is not None]
+            if clauses:
+                conditions.append('EXISTS (SELECT 1 FROM %s t WHERE t.file_id = f.file_id AND %s)'
+                                  % (table, ' AND '.join(sql for sql, _ in clauses)))
+                for _, value in clauses:
+                    parameters.extend(value if isinstance(value, tuple) else (value,))
+
+        exists('laserlines', [('t.power >= ?', min_power), ('t.power <= ?', max_power),
+                              ('t.frequency BETWEEN ? AND ?',
+                               None if frequency is None else (frequency - frequency_tolerance,
+                                                               frequency + frequency_tolerance))])
+        exists('lockinamps', [('t.filter_order = ?', filter_order), ('t.demod_bandwidth <= ?', max_demod_bandwidth)])
+        exists('photodetectors', [('t.gain >= ?', min_gain)])
+        exists('surgeries', [('t.virus_injection_opsin = ?', opsin), ('t.ophys_injection_brain_area = ?', brain_area)])
+        sql = 'SELECT f.path FROM files f WHERE f.error IS NULL'
+        if conditions:
+            sql += ' AND ' + ' AND '.join(conditions)
+        return [row[0] for row in self.connection.execute(sql + ' ORDER BY f.path', parameters)]
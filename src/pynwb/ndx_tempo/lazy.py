@@ -0,0 +1,189 @@
+"""
+Lazy dask arrays and labelled xarray DataArrays of TEMPO series, for out-of-core analysis.
+
+:py:func:`to_dask` wraps the data of a TempoSeries read from a file in a ``dask.array`` whose
+chunks are whole multiples of the HDF5 chunks, so every HDF5 chunk is read and decompressed by
+exactly one task. :py:func:`to_xarray` adds the labels: a ``time`` coordinate from the series'
+rate or timestamps, and per-channel coordinates from the LockInAmplifier rows of ``channels``
+(``channel_name``, and ``offset``/``gain`` with the Measurement unit)::
+
+    with NWBHDF5IO(path, 'r') as io:
+        signals = to_xarray(io.read().acquisition['lockin_signals'])
+        baseline = signals.sel(time=slice(0, 60)).mean('time').compute(scheduler='processes')
+
+The tasks do not hold h5py objects: they read through an :py:class:`HDF5Source`, which only
+stores the file name and dataset path and opens the file once per worker process, so the graph
+can be sent to a multiprocess or distributed scheduler. Integer-count series are decoded to
+physical values chunk by chunk (see ndx_tempo.counts).
+
+dask and xarray are optional dependencies (``pip install ndx-tempo[dask]``).
+"""
+import hashlib
+import os
+
+import h5py
+import numpy as np
+from hdmf.data_utils import DataIO
+
+from .counts import channel_parameters, decode_counts
+from .views import data_view
+
+# rows of a dask chunk are chosen so that chunks hold about this many bytes
+DEFAULT_CHUNK_BYTES = 64 << 20
+
+# h5py files opened by HDF5Source in this process: path -> (pid, file)
+_files = {}
+
+
+def _open(path):
+    cached = _files.get(path)
+    if cached is None or cached[0] != os.getpid():
+        # a file inherited through fork is not reused, its HDF5 state belongs to the parent
+        _files[path] = cached = (os.getpid(), h5py.File(path, 'r'))
+    return cached[1]
+
+
+def close_files():
+    """Close the files opened by HDF5Source in this process."""
+    for pid, f in _files.values():
+        if pid == os.getpid():
+            f.close()
+    _files.clear()
+
+
+class HDF5Source:
+    """
+    Picklable, sliceable reader of one HDF5 dataset, optionally decoding integer counts.
+
+    :param path: the HDF5 file
+    :param name: path of the dataset in the file
+    :param gain: per-column gains to decode counts with (see ndx_tempo.counts), or None
+    """
+
+    def __init__(self, path, name, shape, dtype, gain=None, offset=None, conversion=1.0):
+        self.path = path
+        self.name = name
+        self.shape = tuple(shape)
+        self.gain = None if gain is None else np.asarray(gain, dtype=float)
+        self.offset = None if offset is None else np.asarray(offset, dtype=float)
+        self.conversion = float(conversion)
+        self.dtype = np.dtype('float64') if self.gain is not None else np.dtype(dtype)
+
+    @classmethod
+    def from_dataset(cls, dataset, **kwargs):
+        return cls(os.path.abspath(dataset.file.filename), dataset.name, dataset.shape, dataset.dtype, **kwargs)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, selection):
+        values = _open(self.path)[self.name][selection]
+        if self.gain is None:
+            return values
+        if not isinstance(selection, tuple):
+            selection = (selection,)
+        if self.ndim == 1:
+            gain, offset = self.gain[0], self.offset[0]
+        else:
+            columns = selection[1] if len(selection) > 1 else slice(None)
+            gain, offset = self.gain[columns], self.offset[columns]
+        return decode_counts(values, gain, offset, self.conversion, self.dtype)
+
+    def __repr__(self):
+        return '<HDF5Source %s:%s %s %s>' % (self.path, self.name, self.shape, self.dtype)
+
+
+def _dataset(series):
+    data = series.data
+    while isinstance(data, DataIO):
+        data = data.data
+    return data if isinstance(data, h5py.Dataset) else None
+
+
+def aligned_chunks(shape, itemsize, chunks=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Dask chunk shape for a dataset of *shape* with HDF5 *chunks* (None if contiguous): whole
+    multiples of the HDF5 chunk along the first axis, about *chunk_bytes* each, and all columns.
+    """
+    width = int(np.prod(shape[1:], dtype=np.int64)) if len(shape) > 1 else 1
+    unit = chunks[0] if chunks else 1
+    rows = max(unit, chunk_bytes // max(1, width * itemsize) // unit * unit)
+    return (min(rows, max(1, shape[0])),) + tuple(shape[1:])
+
+
+def _decodes(series, decode):
+    """Whether *series* stores integer counts that to_dask decodes."""
+    if not decode or getattr(series, 'channels', None) is None:
+        return False
+    data = data_view(series)
+    dtype = data.dtype if hasattr(data, 'dtype') else np.asarray(data).dtype
+    return np.dtype(dtype).kind in 'iu'
+
+
+def to_dask(series, chunk_bytes=DEFAULT_CHUNK_BYTES, decode=True):
+    """
+    Lazy dask array of the data of *series*.
+
+    :param chunk_bytes: approximate size of a dask chunk; chunk boundaries stay on HDF5 chunk boundaries
+    :param decode: decode integer-count TempoSeries to physical values
+    """
+    import dask.array as da
+
+    counts = _decodes(series, decode)
+    dataset = _dataset(series)
+    if dataset is None:
+        values = np.asarray(series.decoded() if counts else series.data)
+        return da.from_array(values, chunks=aligned_chunks(values.shape, values.dtype.itemsize,
+                                                           chunk_bytes=chunk_bytes))
+    kwargs = {}
+    if counts:
+        gain, offset = channel_parameters(series.channels)
+        kwargs = dict(gain=gain, offset=offset,
+                      conversion=series.conversion if series.conversion is not None else 1.0)
+    source = HDF5Source.from_dataset(dataset, **kwargs)
+    chunks = aligned_chunks(dataset.shape, dataset.dtype.itemsize, dataset.chunks, chunk_bytes)
+    stat = os.stat(source.path)
+    # a name that depends on the file content, so dask does not have to hash the source
+    token = '%s:%s:%d:%d:%s' % (source.path, source.name, stat.st_mtime_ns, stat.st_size, counts)
+    name = 'tempo-' + hashlib.sha1(token.encode('utf-8')).hexdigest()
+    return da.from_array(source, chunks=chunks, name=name, lock=False, asarray=True, fancy=False)
+
+
+def _times(series):
+    if series.rate is not None:
+        starting_time = series.starting_time if series.starting_time is not None else 0.0
+        return starting_time + np.arange(len(series.data)) / series.rate
+    timestamps = series.timestamps
+    if hasattr(timestamps, 'timestamps'):  # timestamps linked from another series
+        timestamps = timestamps.timestamps
+    return np.asarray(timestamps[:], dtype=float)
+
+
+def to_xarray(series, chunk_bytes=DEFAULT_CHUNK_BYTES, decode=True):
+    """
+    Lazy xarray.DataArray of *series* with dims ('time', 'channel'), labelled with the channel
+    names, offsets and gains of its LockInAmplifier rows.
+    """
+    import xarray as xr
+
+    data = to_dask(series, chunk_bytes, decode)
+    coords = {'time': ('time', _times(series), {'units': 'seconds'})}
+    dims = ('time',) if data.ndim == 1 else ('time', 'channel')
+    channels = getattr(series, 'channels', None)
+    if channels is not None and data.ndim > 1:
+        table = channels.table
+        rows = np.asarray(channels.data[:], dtype=np.intp)
+        offset = table['offset']
+        coords['channel'] = ('channel', np.asarray(table.channel_names, dtype=object)[rows])
+        units = {'units': offset.unit} if hasattr(offset, 'unit') else {}
+        coords['offset'] = ('channel', table.offsets[rows], units)
+        coords['gain'] = ('channel', table.gains[rows])
+    attrs = {'units': series.unit, 'description': series.description}
+    if not _decodes(series, decode):
+        # decoded counts are in units already, other data still has to be multiplied by conversion
+        attrs['conversion'] = series.conversion
+    return xr.DataArray(data, dims=dims, coords=coords, name=series.name, attrs=attrs)
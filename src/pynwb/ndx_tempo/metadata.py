@@ -0,0 +1,344 @@
+"""
+Metadata-only reader for TEMPO files.
+
+:py:func:`read_metadata` goes straight to the TEMPO devices under ``/general/devices`` and to
+``/general/subject`` with h5py and returns frozen, slotted dataclasses of the extension's fields.
+No pynwb containers are built and signal datasets are never touched, so cataloguing many files
+is bound by I/O rather than by object construction.
+"""
+import os
+from dataclasses import dataclass, fields
+
+import h5py
+import numpy as np
+
+from .units import parse_unit
+
+NAMESPACE = 'ndx-tempo'
+
+# (file, mtime_ns, path) of device containers linked from other files -> their device records
+_linked_devices = {}
+
+
+class _Record:
+    """Pickle support for frozen dataclasses with __slots__ (they have no __dict__ to restore)."""
+
+    __slots__ = ()
+
+    def __getstate__(self):
+        return tuple(getattr(self, field.name) for field in fields(self))
+
+    def __setstate__(self, state):
+        for field, value in zip(fields(self), state):
+            object.__setattr__(self, field.name, value)
+
+
+@dataclass(frozen=True)
+class MeasurementInfo(_Record):
+    __slots__ = ('value', 'unit', 'conversion', 'resolution')
+    value: object
+    unit: str
+    conversion: float
+    resolution: float
+
+    @property
+    def si_value(self):
+        """Numeric value in SI base units: value times conversion times the scale of the unit, e.g.
+        0.002 for 2 'mW'. Raises units.UnitError if the unit cannot be parsed."""
+        scale = self.conversion * parse_unit(self.unit or '').scale
+        if isinstance(self.value, tuple):
+            return tuple(_to_float(v) * scale for v in self.value)
+        return _to_float(self.value) * scale
+
+
+@dataclass(frozen=True)
+class LaserLineInfo(_Record):
+    __slots__ = ('name', 'reference', 'description', 'analog_modulation_frequency', 'power')
+    name: str
+    reference: str
+    description: str
+    analog_modulation_frequency: MeasurementInfo
+    power: MeasurementInfo
+
+
+@dataclass(frozen=True)
+class PhotoDetectorInfo(_Record):
+    __slots__ = ('name', 'reference', 'description', 'gain', 'bandwidth')
+    name: str
+    reference: str
+    description: str
+    gain: MeasurementInfo
+    bandwidth: MeasurementInfo
+
+
+@dataclass(frozen=True)
+class LockInAmplifierInfo(_Record):
+    __slots__ = ('name', 'reference', 'description', 'demodulation_filter_order', 'demod_bandwidth',
+                 'channel_name', 'offset', 'gain')
+    name: str
+    reference: str
+    description: str
+    demodulation_filter_order: float
+    demod_bandwidth: MeasurementInfo
+    channel_name: tuple
+    offset: MeasurementInfo
+    gain: tuple
+
+
+@dataclass(frozen=True)
+class TempoInfo(_Record):
+    __slots__ = ('name', 'path', 'description', 'manufacturer', 'no_of_modules', 'laserlines', 'photodetectors',
+                 'lockinamps')
+    name: str
+    path: str
+    description: str
+    manufacturer: str
+    no_of_modules: int
+    laserlines: tuple
+    photodetectors: tuple
+    lockinamps: tuple
+
+
+@dataclass(frozen=True)
+class SurgeryInfo(_Record):
+    __slots__ = ('surgery_date', 'surgery_notes', 'surgery_pharmacology', 'surgery_arget_anatomy',
+                 'ophys_implant_name', 'ephys_implant_name', 'implantation_device', 'virus_injection_id',
+                 'virus_injection_opsin', 'virus_injection_opsin_l_r', 'virus_injection_scheme',
+                 'virus_injection_tag', 'virus_injection_coordinates_description', 'virus_injection_volume',
+                 'virus_injection_coordinates', 'ophys_injection_date', 'ophys_injection_volume',
+                 'ophys_injection_brain_area')
+    surgery_date: str
+    surgery_notes: str
+    surgery_pharmacology: str
+    surgery_arget_anatomy: str
+    ophys_implant_name: str
+    ephys_implant_name: str
+    implantation_device: str
+    virus_injection_id: str
+    virus_injection_opsin: str
+    virus_injection_opsin_l_r: str
+    virus_injection_scheme: str
+    virus_injection_tag: str
+    virus_injection_coordinates_description: str
+    virus_injection_volume: float
+    virus_injection_coordinates: str
+    ophys_injection_date: str
+    ophys_injection_volume: float
+    ophys_injection_brain_area: str
+
+
+@dataclass(frozen=True)
+class SubjectInfo(_Record):
+    __slots__ = ('neurodata_type', 'subject_id', 'species', 'strain', 'genotype', 'sex', 'age', 'weight',
+                 'date_of_birth', 'description', 'sacrificial_date', 'surgery')
+    neurodata_type: str
+    subject_id: str
+    species: str
+    strain: str
+    genotype: str
+    sex: str
+    age: str
+    weight: str
+    date_of_birth: str
+    description: str
+    sacrificial_date: str
+    surgery: SurgeryInfo
+
+
+@dataclass(frozen=True)
+class FileMetadata(_Record):
+    __slots__ = ('path', 'identifier', 'session_start_time', 'devices', 'subject')
+    path: str
+    identifier: str
+    session_start_time: str
+    devices: tuple
+    subject: SubjectInfo
+
+
+def _to_float(value):
+    return float(value.decode('utf-8') if isinstance(value, bytes) else value)
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _attr(obj, name):
+    return _text(obj.attrs.get(name)) if obj is not None else None
+
+
+def _scalar(group, name):
+    dataset = group.get(name) if group is not None else None
+    if not isinstance(dataset, h5py.Dataset):
+        return None
+    value = dataset[()]
+    if isinstance(value, np.ndarray):
+        return tuple(_text(v) for v in value.ravel())
+    return _text(value)
+
+
+def _neurodata_type(obj):
+    return _attr(obj, 'neurodata_type')
+
+
+def _children(group, neurodata_type):
+    if group is None:
+        return []
+    # get() skips dangling external links, which values() would fail on
+    children = (group.get(key) for key in group)
+    return [child for child in children if isinstance(child, h5py.Group) and _neurodata_type(child) == neurodata_type]
+
+
+def _measurement(group, name, array=False):
+    dataset = group.get(name)
+    if not isinstance(dataset, h5py.Dataset):
+        return None
+    values = tuple(_text(v) for v in np.asarray(dataset[()]).ravel())
+    return MeasurementInfo(value=values if array else (values[0] if values else None),
+                           unit=_attr(dataset, 'unit'),
+                           conversion=float(dataset.attrs.get('conversion', 1.0)),
+                           resolution=float(dataset.attrs.get('resolution', 0.0)))
+
+
+def _column(group, name):
+    dataset = group.get(name)
+    if not isinstance(dataset, h5py.Dataset):
+        return ()
+    return tuple(_text(v) for v in np.asarray(dataset[()]).ravel())
+
+
+def _laserline(group):
+    return LaserLineInfo(name=group.name.rsplit('/', 1)[-1], reference=_attr(group, 'reference'),
+                         description=_attr(group, 'description'),
+                         analog_modulation_frequency=_measurement(group, 'analog_modulation_frequency'),
+                         power=_measurement(group, 'power'))
+
+
+def _photodetector(group):
+    return PhotoDetectorInfo(name=group.name.rsplit('/', 1)[-1], reference=_attr(group, 'reference'),
+                             description=_attr(group, 'description'), gain=_measurement(group, 'gain'),
+                             bandwidth=_measurement(group, 'bandwidth'))
+
+
+def _lockinamp(group):
+    order = group.attrs.get('demodulation_filter_order')
+    return LockInAmplifierInfo(name=group.name.rsplit('/', 1)[-1], reference=_attr(group, 'reference'),
+                               description=_attr(group, 'description'),
+                               demodulation_filter_order=None if order is None else float(order),
+                               demod_bandwidth=_measurement(group, 'demod_bandwidth'),
+                               channel_name=_column(group, 'channel_name'),
+                               offset=_measurement(group, 'offset', array=True),
+                               gain=tuple(float(v) for v in _column(group, 'gain')))
+
+
+def _linked_key(group, name):
+    """Cache key of the child *name* of *group* if it is an external link (e.g. to a shared rig
+    file, see ndx_tempo.rig), None otherwise."""
+    link = group.get(name, getlink=True)
+    if not isinstance(link, h5py.ExternalLink):
+        return None
+    target = group.get(name)
+    if target is None:
+        return None
+    filename = os.path.realpath(target.file.filename)
+    return filename, os.stat(filename).st_mtime_ns, link.path
+
+
+def tempo_info(group):
+    """Read a TEMPO device group into a TempoInfo. Device containers linked from another file are
+    parsed once per process."""
+    def devices(container_type, device_type, read):
+        result = []
+        for key in group:
+            container = group.get(key)
+            if not isinstance(container, h5py.Group) or _neurodata_type(container) != container_type:
+                continue
+            cache_key = _linked_key(group, key)
+            if cache_key is not None and cache_key in _linked_devices:
+                result.extend(_linked_devices[cache_key])
+                continue
+            read_devices = tuple(read(device) for device in _children(container, device_type))
+            if cache_key is not None:
+                _linked_devices[cache_key] = read_devices
+            result.extend(read_devices)
+        return tuple(result)
+
+    no_of_modules = group.attrs.get('no_of_modules')
+    return TempoInfo(name=group.name.rsplit('/', 1)[-1], path=group.name,
+                     description=_attr(group, 'description'), manufacturer=_attr(group, 'manufacturer'),
+                     no_of_modules=None if no_of_modules is None else int(no_of_modules),
+                     laserlines=devices('LaserLineDevices', 'LaserLine', _laserline),
+                     photodetectors=devices('PhotoDetectorDevices', 'PhotoDetector', _photodetector),
+                     lockinamps=devices('LockInAmplifierDevices', 'LockInAmplifier', _lockinamp))
+
+
+def _link_target(group, name):
+    if group is None:
+        return None
+    link = group.get(name, getlink=True)
+    if isinstance(link, h5py.SoftLink):
+        return link.path
+    if isinstance(link, h5py.ExternalLink):
+        return '%s:%s' % (link.filename, link.path)
+    return None
+
+
+def surgery_info(group):
+    """Read the Surgery attributes of a Surgery/SubjectComplete group into a SurgeryInfo."""
+    values = {}
+    for name in ('surgery_date', 'surgery_notes', 'surgery_pharmacology', 'surgery_arget_anatomy'):
+        values[name] = _attr(group, name)
+    implantation = group.get('implantation')
+    values['ophys_implant_name'] = _attr(implantation, 'ophys_implant_name')
+    values['ephys_implant_name'] = _attr(implantation, 'ephys_implant_name')
+    values['implantation_device'] = _link_target(implantation, 'implantation_device')
+    virus_injection = group.get('virus_injection')
+    for name in ('virus_injection_id', 'virus_injection_opsin', 'virus_injection_opsin_l_r',
+                 'virus_injection_scheme', 'virus_injection_tag', 'virus_injection_coordinates_description',
+                 'virus_injection_volume'):
+        values[name] = _attr(virus_injection, name)
+    values['virus_injection_coordinates'] = _scalar(virus_injection, 'virus_injection_coordinates')
+    ophys_injection = group.get('ophys_injection')
+    for name in ('ophys_injection_date', 'ophys_injection_volume', 'ophys_injection_brain_area'):
+        values[name] = _attr(ophys_injection, name)
+    return SurgeryInfo(**values)
+
+
+def subject_info(group):
+    """Read a /general/subject group into a SubjectInfo, with the Surgery fields when it is an
+    ndx-tempo Surgery/SubjectComplete."""
+    neurodata_type = _neurodata_type(group)
+    surgery = None
+    # the SubjectComplete strain attribute shadows the dataset of the core Subject, which pynwb writes
+    strain = _attr(group, 'strain')
+    if strain is None:
+        strain = _scalar(group, 'strain')
+    if _attr(group, 'namespace') == NAMESPACE:
+        surgery_group = group.get('surgery_data')
+        surgery = surgery_info(surgery_group if isinstance(surgery_group, h5py.Group) else group)
+    return SubjectInfo(neurodata_type=neurodata_type,
+                       subject_id=_scalar(group, 'subject_id'), species=_scalar(group, 'species'),
+                       strain=strain, genotype=_scalar(group, 'genotype'),
+                       sex=_scalar(group, 'sex'), age=_scalar(group, 'age'), weight=_scalar(group, 'weight'),
+                       date_of_birth=_scalar(group, 'date_of_birth'), description=_scalar(group, 'description'),
+                       sacrificial_date=_attr(group, 'sacrificial_date'), surgery=surgery)
+
+
+def find_tempo_groups(f):
+    """The TEMPO device groups under /general/devices of an open h5py.File."""
+    return [group for group in _children(f.get('general/devices'), 'TEMPO')
+            if _attr(group, 'namespace') == NAMESPACE]
+
+
+def read_metadata(path):
+    """Read the TEMPO device trees and the subject of an NWB file without building pynwb objects."""
+    with h5py.File(path, 'r') as f:
+        subject = f.get('general/subject')
+        return FileMetadata(path=str(path), identifier=_scalar(f, 'identifier'),
+                            session_start_time=_scalar(f, 'session_start_time'),
+                            devices=tuple(tempo_info(group) for group in find_tempo_groups(f)),
+                            subject=subject_info(subject) if isinstance(subject, h5py.Group) else None)
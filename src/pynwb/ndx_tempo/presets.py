@@ -0,0 +1,162 @@
+"""
+Named HDF5 write presets for TEMPO signal datasets.
+
+Demodulated TEMPO traces are smooth and oversampled, so after the shuffle filter their bytes
+compress well; raw ADC counts are small integers that pack tightly with HDF5's scale-offset
+filter. The presets trade write speed for size:
+
+=========  =============  ========  ==========================================
+preset     compression    chunks    integer data
+=========  =============  ========  ==========================================
+fast       lzf + shuffle  ~0.25 s   as is
+balanced   gzip 4 + shuf  ~1 s      as is
+archive    gzip 9 + shuf  ~4 s      scale-offset (lossless, minimum bit width)
+=========  =============  ========  ==========================================
+
+Chunks always span all channels and are capped in bytes. ``balanced`` is the default for
+:py:func:`ndx_tempo.streaming.stream_data` and ``ndx_tempo.demodulation``; set
+``NDX_TEMPO_PRESET`` or call :py:func:`set_default_preset` to change it, and use
+:py:func:`apply_preset` to wrap the in-memory data of the TempoSeries in an NWBFile before writing.
+"""
+import os
+from dataclasses import dataclass
+
+import numpy as np
+from hdmf.backends.hdf5 import H5DataIO
+from hdmf.data_utils import DataIO
+
+PRESET_ENV = 'NDX_TEMPO_PRESET'
+MIN_CHUNK_ROWS = 64
+
+
+@dataclass(frozen=True)
+class WritePreset:
+    name: str
+    compression: str = None
+    compression_opts: int = None
+    shuffle: bool = False
+    chunk_seconds: float = 1.0
+    max_chunk_bytes: int = 1 << 20
+    integer_scaleoffset: bool = False
+
+    def chunk_rows(self, num_channels, itemsize, rate=None):
+        """Rows per chunk: *chunk_seconds* of samples at *rate*, at most *max_chunk_bytes*."""
+        row_bytes = max(1, num_channels * itemsize)
+        max_rows = max(1, self.max_chunk_bytes // row_bytes)
+        rows = max_rows
+        if rate:
+            rows = min(rows, int(round(rate * self.chunk_seconds)))
+        return max(rows, min(MIN_CHUNK_ROWS, max_rows))
+
+    def chunk_shape(self, shape, dtype, rate=None):
+        shape = tuple(shape)
+        num_channels = shape[1] if len(shape) > 1 else 1
+        rows = self.chunk_rows(num_channels, np.dtype(dtype).itemsize, rate)
+        if shape and shape[0]:
+            rows = min(rows, shape[0])
+        return (rows,) + shape[1:]
+
+    def dataset_options(self, shape, dtype, rate=None):
+        """Keyword arguments for h5py create_dataset (and H5DataIO) for a dataset of *shape* and *dtype*."""
+        options = {'chunks': self.chunk_shape(shape, dtype, rate), 'compression': self.compression,
+                   'compression_opts': self.compression_opts if self.compression == 'gzip' else None,
+                   'shuffle': bool(self.shuffle and self.compression)}
+        if self.integer_scaleoffset and np.dtype(dtype).kind in 'iu':
+            # lossless for integers: values are stored as the minimum number of bits above the chunk minimum
+            options['scaleoffset'] = 0
+            options['shuffle'] = False
+        return options
+
+
+PRESETS = {
+    'fast': WritePreset('fast', compression='lzf', shuffle=True, chunk_seconds=0.25, max_chunk_bytes=256 << 10),
+    'balanced': WritePreset('balanced', compression='gzip', compression_opts=4, shuffle=True, chunk_seconds=1.0,
+                            max_chunk_bytes=1 << 20),
+    'archive': WritePreset('archive', compression='gzip', compression_opts=9, shuffle=True, chunk_seconds=4.0,
+                           max_chunk_bytes=4 << 20, integer_scaleoffset=True),
+    'none': WritePreset('none', chunk_seconds=1.0, max_chunk_bytes=1 << 20),
+}
+
+_default = [os.environ.get(PRESET_ENV, 'balanced')]
+
+
+def get_preset(preset=None):
+    """The WritePreset called *preset* (or *preset* itself if it is one); the default preset for None."""
+    if preset is None:
+        preset = _default[0]
+    if isinstance(preset, WritePreset):
+        return preset
+    try:
+        return PRESETS[preset]
+    except KeyError:
+        raise ValueError('unknown write preset %r, expected one of %s' % (preset, ', '.join(sorted(PRESETS))))
+
+
+def set_default_preset(preset):
+    """
+    Make *preset*, a preset name or a WritePreset, the default of every ndx_tempo writer. A
+    WritePreset is used as given, even if it shares its name with one of PRESETS.
+
+    :return: the previous default, to pass back to set_default_preset
+    """
+    previous = _default[0]
+    _default[0] = preset if isinstance(preset, WritePreset) else get_preset(preset).name
+    return previous
+
+
+def _h5dataio_options(options):
+    # H5DataIO arguments and the scaleoffset setting, which H5DataIO has no argument for
+    options = dict(options)
+    scaleoffset = options.pop('scaleoffset', None)
+    if options.get('compression') != 'gzip':
+        options['compression_opts'] = None
+    options['shuffle'] = bool(options.get('shuffle') and options.get('compression'))
+    return options, scaleoffset
+
+
+def _set_scaleoffset(data_io, scaleoffset):
+    if scaleoffset is not None:
+        # H5DataIO passes io_settings on to create_dataset
+        data_io.io_settings['scaleoffset'] = scaleoffset
+    return data_io
+
+
+def make_h5dataio(data, options):
+    """H5DataIO from create_dataset keyword arguments as returned by WritePreset.dataset_options."""
+    options, scaleoffset = _h5dataio_options(options)
+    return _set_scaleoffset(H5DataIO(data=data, **options), scaleoffset)
+
+
+def h5dataio(data, preset=None, rate=None, **overrides):
+    """Wrap array *data* in an H5DataIO with the settings of *preset*; keyword arguments override them."""
+    data = data if hasattr(data, 'dtype') else np.asarray(data)
+    options = get_preset(preset).dataset_options(np.shape(data), data.dtype, rate)
+    options.update(overrides)
+    return make_h5dataio(data, options)
+
+
+def apply_preset(nwbfile, preset=None, types=None):
+    """
+    Wrap the in-memory data of every TempoSeries (or instance of *types*) in *nwbfile* in an
+    H5DataIO with the settings of *preset*, with hdmf's Container.set_data_io. Data already
+    wrapped in a DataIO is left alone.
+
+    :return: the number of datasets wrapped
+    """
+    from .tempo import TempoSeries
+    types = types or (TempoSeries,)
+    count = 0
+    for container in list(nwbfile.objects.values()):
+        if not isinstance(container, types):
+            continue
+        data = container.data
+        if isinstance(data, DataIO) or not isinstance(data, (np.ndarray, list, tuple)):
+            continue
+        data = data if hasattr(data, 'dtype') else np.asarray(data)
+        options, scaleoffset = _h5dataio_options(
+            get_preset(preset).dataset_options(np.shape(data), data.dtype, getattr(container, 'rate', None)))
+        # TimeSeries.data cannot be reassigned once set; set_data_io wraps it in place
+        container.set_data_io('data', H5DataIO, data_io_kwargs=options)
+        _set_scaleoffset(container.data, scaleoffset)
+        count += 1
+    return count
@@ -0,0 +1,305 @@
+"""
+Decimated min/max/mean pyramids of TEMPO signals for fast overview plots.
+
+:py:func:`add_pyramid` stores, for each decimation factor, a TempoSeries in the processing
+module ``tempo_pyramid`` named ``<series>_x<factor>`` whose row ``i`` summarizes samples
+``[i * factor, (i + 1) * factor)`` of the source. Its columns are the per-channel minimum, then
+maximum, then mean (column ``stat * num_channels + channel``), so its ``channels`` region
+repeats the source's rows three times. The levels are ordinary TempoSeries, readable without
+ndx_tempo's Python API.
+
+:py:class:`Pyramid` picks the coarsest level that still has a bin per pixel for the requested
+time range and reads only that range of it::
+
+    add_pyramid(nwbfile, nwbfile.acquisition['lockin_signals'], factors=(10, 100, 1000))
+    ...
+    overview = Pyramid(nwbfile, 'lockin_signals').read(0.0, 3600.0, pixels=1500)
+    plt.fill_between(overview.times, overview.min[:, 0], overview.max[:, 0])
+
+The source is read once: the finest level is reduced from it and every coarser level from the
+next finer one, so each factor must be a multiple of the next smaller one. hdmf writes the levels
+one after another, so the rows of the coarser levels wait until their turn; beyond
+``max_queued_bytes`` they wait in a temporary file, which keeps memory bounded for recordings of
+any length. The source must still be
+readable when the file is written: an array, a DataIO wrapping one, or a dataset in a file opened
+in 'a' mode. Integer count series (ndx_tempo.counts) are summarized in physical units; the levels
+of other series keep the source's conversion.
+"""
+import re
+import tempfile
+from collections import deque, namedtuple
+
+import numpy as np
+
+from .counts import CountsView
+from .streaming import stream_data
+from .utils import get_processing_module
+from .views import data_view, series_values
+
+DEFAULT_FACTORS = (10, 100, 1000)
+DEFAULT_MODULE = 'tempo_pyramid'
+DEFAULT_BLOCK_ROWS = 1 << 16
+DEFAULT_MAX_QUEUED_BYTES = 64 << 20
+STATISTICS = ('min', 'max', 'mean')
+
+Overview = namedtuple('Overview', ['times', 'min', 'max', 'mean', 'factor'])
+
+
+def reduce_blocks(data, factor, block_rows=DEFAULT_BLOCK_ROWS):
+    """Yield the ``(bins, 3 * num_channels)`` min/max/mean rows of *data* for bins of *factor* samples."""
+    block_rows = max(factor, block_rows - block_rows % factor)
+    for start in range(0, len(data), block_rows):
+        block = np.asarray(data[start:start + block_rows], dtype=float)
+        if block.ndim == 1:
+            block = block[:, np.newaxis]
+        full = len(block) - len(block) % factor
+        rows = []
+        if full:
+            bins = block[:full].reshape(full // factor, factor, block.shape[1])
+            rows.append(np.concatenate([bins.min(axis=1), bins.max(axis=1), bins.mean(axis=1)], axis=1))
+        if full < len(block):
+            # the last, partial bin of the recording
+            tail = block[full:]
+            rows.append(np.concatenate([tail.min(axis=0), tail.max(axis=0), tail.mean(axis=0)])[np.newaxis])
+        yield np.concatenate(rows)
+
+
+def coarsen_rows(rows, counts, ratio):
+    """
+    Combine min/max/mean *rows* of one level into rows for bins *ratio* times as large: min of the
+    mins, max of the maxes and the mean of the means weighted by *counts*, the number of samples
+    of each row. The last bin may take fewer rows.
+    """
+    columns = rows.shape[1] // len(STATISTICS)
+    starts = np.arange(0, len(rows), ratio)
+    sums = np.add.reduceat(rows[:, 2 * columns:] * counts[:, np.newaxis], starts, axis=0)
+    return np.concatenate([np.minimum.reduceat(rows[:, :columns], starts, axis=0),
+                           np.maximum.reduceat(rows[:, columns:2 * columns], starts, axis=0),
+                           sums / np.add.reduceat(counts, starts)[:, np.newaxis]], axis=1)
+
+
+class _RowQueue:
+    """FIFO of row blocks that keeps at most *max_bytes* in memory and the rest in a temporary file."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0  # in memory
+        self.__memory = deque()
+        self.__spilled = deque()  # shapes of the blocks in the file, oldest first
+        self.__file = None
+        self.__read_offset = 0
+
+    def __bool__(self):
+        return bool(self.__memory or self.__spilled)
+
+    def append(self, rows):
+        rows = np.ascontiguousarray(rows, dtype=float)
+        # once blocks are in the file, later ones follow them there to keep the order
+        if not self.__spilled and self.nbytes + rows.nbytes <= self.max_bytes:
+            self.__memory.append(rows)
+            self.nbytes += rows.nbytes
+            return
+        if self.__file is None:
+            self.__file = tempfile.TemporaryFile()
+        self.__file.seek(0, 2)
+        self.__file.write(rows.tobytes())
+        self.__spilled.append(rows.shape)
+
+    def popleft(self):
+        if self.__memory:
+            rows = self.__memory.popleft()
+            self.nbytes -= rows.nbytes
+            return rows
+        shape = self.__spilled.popleft()
+        size = int(np.prod(shape)) * 8
+        self.__file.seek(self.__read_offset)
+        rows = np.frombuffer(self.__file.read(size), dtype=float).reshape(shape)
+        self.__read_offset += size
+        if not self.__spilled:
+            self.close()
+        return rows
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.close()
+        self.__file = None
+        self.__read_offset = 0
+
+
+class _Cascade:
+    """
+    A single pass over the source that feeds every level: the finest level is reduced from the
+    source blocks and each coarser level from the rows of the next finer one. The levels are
+    written one after another, so rows wait in a bounded queue per level until their writer asks
+    for them.
+    """
+
+    def __init__(self, data, factors, block_rows, max_queued_bytes=DEFAULT_MAX_QUEUED_BYTES):
+        self.factors = factors
+        self.size = len(data)
+        self.__blocks = reduce_blocks(data, factors[0], block_rows)
+        self.__ready = [_RowQueue(max_queued_bytes // len(factors)) for _ in factors]
+        self.__pending = [None for _ in factors]  # finer rows that do not make a whole bin yet
+        self.__consumed = [0 for _ in factors]  # finer rows combined into each level so far
+        self.__done = False
+
+    def rows(self, level):
+        """Yield the rows of *level*, advancing the pass over the source when it needs more."""
+        ready = self.__ready[level]
+        try:
+            while True:
+                while ready:
+                    yield ready.popleft()
+                if self.__done:
+                    return
+                self.__advance()
+        finally:
+            ready.close()
+
+    @property
+    def queued_bytes(self):
+        """Bytes of rows held in memory for levels that have not been written yet."""
+        return sum(ready.nbytes for ready in self.__ready)
+
+    def __advance(self):
+        rows = next(self.__blocks, None)
+        self.__done = rows is None
+        if rows is not None:
+            self.__ready[0].append(rows)
+        for level in range(1, len(self.factors)):
+            rows = self.__coarsen(level, rows)
+            if len(rows):
+                self.__ready[level].append(rows)
+
+    def __coarsen(self, level, rows):
+        ratio = self.factors[level] // self.factors[level - 1]
+        pending = self.__pending[level]
+        if rows is not None and pending is not None:
+            rows = np.concatenate([pending, rows])
+        elif rows is None:
+            rows = pending if pending is not None else np.empty((0, 0))
+        whole = len(rows) if self.__done else len(rows) - len(rows) % ratio
+        self.__pending[level] = rows[whole:] if whole < len(rows) else None
+        if not whole:
+            return rows[:0]
+        finer = self.factors[level - 1]
+        first = self.__consumed[level]
+        counts = np.minimum(finer, self.size - np.arange(first, first + whole) * finer).astype(float)
+        self.__consumed[level] += whole
+        return coarsen_rows(rows[:whole], counts, ratio)
+
+
+def level_name(source_name, factor):
+    return '%s_x%d' % (source_name, factor)
+
+
+def add_pyramid(nwbfile, series, factors=DEFAULT_FACTORS, module=DEFAULT_MODULE, block_rows=DEFAULT_BLOCK_ROWS,
+                preset=None, max_queued_bytes=DEFAULT_MAX_QUEUED_BYTES):
+    """
+    Add min/max/mean decimation levels of the TempoSeries *series* to the processing module
+    *module* of *nwbfile*. Levels are computed block by block while the file is written, in one
+    pass over the source.
+
+    :param factors: decimation factors, each a multiple of the next smaller one
+    :param max_queued_bytes: memory for rows of levels not written yet; the rest goes to a temporary file
+    :return: the level TempoSeries, finest first
+    """
+    from .tempo import TempoSeries
+    if series.rate is None:
+        raise ValueError('%s has timestamps; pyramids need a series with a constant rate' % series.name)
+    factors = sorted(int(factor) for factor in factors)
+    for finer, coarser in zip(factors, factors[1:]):
+        if coarser % finer:
+            raise ValueError('factor %d is not a multiple of %d; each level is computed from the next finer one'
+                             % (coarser, finer))
+    data = series_values(series)
+    # decoded counts are in physical units, anything else keeps the source's conversion
+    conversion = 1.0 if isinstance(data, CountsView) else series.conversion
+    rows = np.asarray(series.channels.data[:], dtype=np.intp).tolist()
+    lockinamp = series.channels.table
+    processing = get_processing_module(nwbfile, module, 'decimated min/max/mean levels of TEMPO signals')
+    cascade = _Cascade(data, factors, block_rows, max_queued_bytes)
+    levels = []
+    for index, factor in enumerate(factors):
+        level = TempoSeries(
+            name=level_name(series.name, factor), unit=series.unit, rate=series.rate / factor,
+            conversion=conversion,
+            starting_time=series.starting_time if series.starting_time is not None else 0.0,
+            data=stream_data(cascade.rows(index), preset=preset, rate=series.rate / factor),
+            channels=lockinamp.create_channel_region(region=rows * len(STATISTICS)),
+            description='min, max and mean over bins of %d samples of %s; column stat * %d + channel'
+                        % (factor, series.name, len(rows)))
+        processing.add(level)
+        levels.append(level)
+    return levels
+
+
+def _find_series(nwbfile, name):
+    if name in nwbfile.acquisition:
+        return nwbfile.acquisition[name]
+    for module in nwbfile.processing.values():
+        if name in module.data_interfaces:
+            return module[name]
+    raise KeyError('no series %r in acquisition or processing' % name)
+
+
+class Pyramid:
+    """
+    Reads overviews of a TempoSeries from the decimation levels added by add_pyramid.
+
+    :param nwbfile: the NWBFile holding the series and its levels
+    :param source: the source TempoSeries or its name
+    """
+
+    def __init__(self, nwbfile, source, module=DEFAULT_MODULE):
+        self.source = _find_series(nwbfile, source) if isinstance(source, str) else source
+        if self.source.rate is None:
+            raise ValueError('%s has timestamps; pyramids need a series with a constant rate' % self.source.name)
+        self.rate = float(self.source.rate)
+        self.starting_time = float(self.source.starting_time or 0.0)
+        pattern = re.compile(re.escape(self.source.name) + r'_x(\d+)$')
+        self.levels = {}
+        if module in nwbfile.processing:
+            for name, level in nwbfile.processing[module].data_interfaces.items():
+                match = pattern.match(name)
+                if match:
+                    self.levels[int(match.group(1))] = level
+        self.factors = sorted(self.levels)
+
+    def choose(self, start_time, stop_time, pixels):
+        """The coarsest factor that has at least *pixels* bins between *start_time* and *stop_time*;
+        1 (the full-rate data) if no level is fine enough."""
+        samples = max(0.0, stop_time - start_time) * self.rate
+        chosen = 1
+        for factor in self.factors:
+            if samples / factor >= pixels:
+                chosen = factor
+        return chosen
+
+    def read(self, start_time, stop_time, pixels, channels=None):
+        """
+        Overview of the source between *start_time* and *stop_time* in seconds at about *pixels*
+        points, read from the level choose() picks.
+
+        :param channels: column indices of the source to read, all by default
+        :return: an Overview of bin start times and (bins, channels) min, max and mean arrays
+        """
+        factor = self.choose(start_time, stop_time, pixels)
+        rate = self.rate / factor
+        start = max(0, int(np.floor((start_time - self.starting_time) * rate)))
+        stop = max(start, int(np.ceil((stop_time - self.starting_time) * rate)))
+        if factor == 1:
+            data = np.asarray(series_values(self.source)[start:stop], dtype=float)
+            if data.ndim == 1:
+                data = data[:, np.newaxis]
+            if channels is not None:
+                data = data[:, channels]
+            values = (data, data, data)
+        else:
+            data = data_view(self.levels[factor])[start:stop]
+            num_channels = data.shape[1] // len(STATISTICS)
+            columns = np.arange(num_channels) if channels is None else np.asarray(channels).ravel()
+            values = tuple(np.asarray(data[:, columns + i * num_channels], dtype=float)
+                           for i in range(len(STATISTICS)))
+        times = self.starting_time + np.arange(start, start + len(values[0])) / rate
+        return Overview(times, values[0], values[1], values[2], factor)
@@ -0,0 +1,250 @@
+"""
+Streaming regression of reference channels (hemodynamic, motion) out of TEMPO voltage signals.
+
+In a demodulated TempoSeries (see ndx_tempo.demodulation), column ``channel * num_lines + line``
+is the PhotoDetector behind lock-in channel ``channel`` at the LaserLine ``line``. Each LaserLine
+has a role: ``'signal'`` lines carry the voltage sensor, ``'reference'`` lines the hemodynamic or
+motion reference. Every signal column is fitted by least squares against an intercept and the
+reference columns of the same detector, and corrected by subtracting the fitted reference part
+(the intercept is kept, so corrected traces stay at the signal's level).
+
+The fit only needs the sufficient statistics ``X^T X`` and ``X^T y``, which are accumulated block
+by block, so recordings of any length are fitted in constant memory::
+
+    regression = ReferenceRegression.from_device(tempo, roles={'laser470': 'signal', 'laser560': 'reference'})
+    regression.fit(demodulated.data)                    # one streaming pass
+    corrected = regression.corrected_series(demodulated, name='corrected')   # second pass while writing
+    nwbfile.processing['tempo'].add(corrected)
+
+With ``window_rows``, coefficients are instead re-fitted for every block on the statistics of the
+surrounding window (centered, ``window_rows`` long), which follows slow drifts of the hemodynamic
+coupling; this needs a single pass and no prior fit.
+
+The corrected TempoSeries links to the source series (``source_series``) and records the source
+column of every column (``source_columns``).
+"""
+from collections import deque
+
+import numpy as np
+
+from .streaming import stream_data
+from .views import series_values
+
+ROLES = ('signal', 'reference')
+DEFAULT_BLOCK_ROWS = 1 << 14
+
+
+def laserline_roles(tempo, roles=None):
+    """
+    Role of every LaserLine of *tempo*, in device order.
+
+    :param roles: dict mapping LaserLine names (or their ``reference`` text) to 'signal' or
+                  'reference'; lines not in it use their ``reference`` attribute if that is a role,
+                  and are ignored (None) otherwise
+    """
+    roles = roles or {}
+    result = []
+    for laserline in tempo.laserline_devices.children:
+        role = roles.get(laserline.name, roles.get(laserline.reference, laserline.reference))
+        if role is not None and role not in ROLES:
+            if laserline.name in roles or laserline.reference in roles:
+                raise ValueError('unknown role %r of laser line %s, expected one of %s'
+                                 % (role, laserline.name, ', '.join(ROLES)))
+            role = None
+        result.append(role)
+    return result
+
+
+def paired_columns(line_roles, num_channels):
+    """
+    Target and reference columns of a demodulated series with *num_channels* lock-in channels
+    whose lines have the roles *line_roles*.
+
+    :return: (targets, references), an int array of the signal columns and a (targets, references)
+             int array of the reference columns of the same detector
+    """
+    num_lines = len(line_roles)
+    signal = [line for line, role in enumerate(line_roles) if role == 'signal']
+    reference = [line for line, role in enumerate(line_roles) if role == 'reference']
+    if not signal or not reference:
+        raise ValueError('need at least one signal and one reference laser line, got roles %s' % (line_roles,))
+    targets, references = [], []
+    for channel in range(num_channels):
+        for line in signal:
+            targets.append(channel * num_lines + line)
+            references.append([channel * num_lines + ref for ref in reference])
+    return np.asarray(targets, dtype=np.intp), np.asarray(references, dtype=np.intp)
+
+
+class RegressionStatistics:
+    """
+    Sufficient statistics of many independent least-squares fits ``y[:, t] ~ X[:, t, :] @ beta[t]``.
+
+    :param num_targets: number of fits
+    :param num_regressors: number of regressors of every fit, including the intercept
+    """
+
+    def __init__(self, num_targets, num_regressors):
+        self.xtx = np.zeros((num_targets, num_regressors, num_regressors))
+        self.xty = np.zeros((num_targets, num_regressors))
+        self.rows = 0
+
+    def update(self, x, y):
+        """Add a block of regressors ``(rows, targets, regressors)`` and targets ``(rows, targets)``."""
+        self.xtx += np.einsum('ntp,ntq->tpq', x, x)
+        self.xty += np.einsum('ntp,nt->tp', x, y)
+        self.rows += len(y)
+
+    def __iadd__(self, other):
+        self.xtx += other.xtx
+        self.xty += other.xty
+        self.rows += other.rows
+        return self
+
+    def __isub__(self, other):
+        self.xtx -= other.xtx
+        self.xty -= other.xty
+        self.rows -= other.rows
+        return self
+
+    def solve(self, ridge=0.0):
+        """The ``(targets, regressors)`` coefficients; singular fits fall back to the pseudo-inverse."""
+        xtx = self.xtx
+        if ridge:
+            # the intercept (regressor 0) is not penalized
+            penalty = np.eye(xtx.shape[1]) * ridge
+            penalty[0, 0] = 0.0
+            xtx = xtx + penalty
+        try:
+            return np.linalg.solve(xtx, self.xty[..., np.newaxis])[..., 0]
+        except np.linalg.LinAlgError:
+            return np.einsum('tpq,tq->tp', np.linalg.pinv(xtx), self.xty)
+
+
+class ReferenceRegression:
+    """
+    Block-streaming regression of reference columns out of target columns.
+
+    :param targets: the columns to correct
+    :param references: for every target, the columns regressed out of it (a (targets, k) array)
+    :param ridge: ridge penalty of the reference coefficients
+    :param window_rows: re-fit the coefficients of every block on a centered window of this many
+                        rows instead of on the whole recording
+    """
+
+    def __init__(self, targets, references, ridge=0.0, window_rows=None):
+        self.targets = np.asarray(targets, dtype=np.intp)
+        self.references = np.asarray(references, dtype=np.intp).reshape(len(self.targets), -1)
+        self.ridge = float(ridge)
+        self.window_rows = window_rows
+        self.coefficients = None
+
+    @classmethod
+    def from_device(cls, tempo, roles=None, num_channels=None, lockinamp=None, **kwargs):
+        """
+        Pair the signal and reference laser lines of every detector of *tempo* (see laserline_roles),
+        for a demodulated series of all channels of the lock-in amplifier *lockinamp* (the first one
+        by default) or *num_channels* channels.
+        """
+        from .demodulation import get_lockinamp
+        if num_channels is None:
+            num_channels = len(get_lockinamp(tempo, lockinamp))
+        targets, references = paired_columns(laserline_roles(tempo, roles), num_channels)
+        return cls(targets, references, **kwargs)
+
+    @property
+    def num_regressors(self):
+        return self.references.shape[1] + 1
+
+    def _design(self, block):
+        block = np.asarray(block, dtype=float)
+        if block.ndim == 1:
+            block = block[:, np.newaxis]
+        x = np.empty((len(block), len(self.targets), self.num_regressors))
+        x[..., 0] = 1.0
+        x[..., 1:] = block[:, self.references]
+        return x, block[:, self.targets]
+
+    def statistics(self, block):
+        """RegressionStatistics of one block of the source."""
+        x, y = self._design(block)
+        statistics = RegressionStatistics(len(self.targets), self.num_regressors)
+        statistics.update(x, y)
+        return statistics
+
+    def fit(self, data, block_rows=DEFAULT_BLOCK_ROWS):
+        """Fit the coefficients on all of *data* in one streaming pass; returns them as well."""
+        total = RegressionStatistics(len(self.targets), self.num_regressors)
+        for start in range(0, len(data), block_rows):
+            total += self.statistics(data[start:start + block_rows])
+        self.coefficients = total.solve(self.ridge)
+        return self.coefficients
+
+    def correct(self, block, coefficients=None):
+        """The corrected target columns of one block: targets minus the fitted reference part."""
+        coefficients = self.coefficients if coefficients is None else coefficients
+        if coefficients is None:
+            raise ValueError('call fit() first or set window_rows')
+        x, y = self._design(block)
+        return y - np.einsum('ntk,tk->nt', x[..., 1:], coefficients[:, 1:])
+
+    def iter_corrected(self, data, block_rows=DEFAULT_BLOCK_ROWS):
+        """Yield the corrected target columns of *data* block by block."""
+        if not self.window_rows:
+            for start in range(0, len(data), block_rows):
+                yield self.correct(data[start:start + block_rows])
+            return
+        # sliding window: block i is corrected with the statistics of blocks i - half .. i + half,
+        # so up to half a window of blocks is held back until its lookahead has been read
+        half = max(0, int(round(self.window_rows / block_rows)) // 2)
+        window = RegressionStatistics(len(self.targets), self.num_regressors)
+        history = deque()  # (index, statistics) of the blocks in the window
+        pending = deque()  # blocks read but not yet corrected
+        emitted = 0
+
+        def emit():
+            nonlocal emitted, window
+            corrected = self.correct(pending.popleft(), window.solve(self.ridge))
+            # block emitted - half is not in the window of the next block
+            if history and history[0][0] == emitted - half:
+                window -= history.popleft()[1]
+            emitted += 1
+            return corrected
+
+        for index, start in enumerate(range(0, len(data), block_rows)):
+            block = data[start:start + block_rows]
+            statistics = self.statistics(block)
+            window += statistics
+            history.append((index, statistics))
+            pending.append(block)
+            if index >= emitted + half:
+                yield emit()
+        while pending:
+            yield emit()
+
+    def corrected_series(self, source, name, block_rows=DEFAULT_BLOCK_ROWS, preset=None, **kwargs):
+        """
+        A TempoSeries of the corrected target columns of the TempoSeries *source*, computed while
+        it is written. Its channels are the LockInAmplifier rows of the targets and it links to
+        *source*.
+
+        :param kwargs: passed on to TempoSeries
+        """
+        from .tempo import TempoSeries
+        data = series_values(source)
+        if self.coefficients is None and not self.window_rows:
+            self.fit(data, block_rows)
+        rows = np.asarray(source.channels.data[:], dtype=np.intp)[self.targets].tolist()
+        kwargs.setdefault('description', 'column(s) %s of %s with reference column(s) regressed out%s' % (
+            ', '.join(map(str, self.targets)), source.name,
+            ' in windows of %d samples' % self.window_rows if self.window_rows else ''))
+        kwargs.setdefault('unit', source.unit)
+        if source.rate is not None:
+            kwargs.setdefault('rate', source.rate)
+            kwargs.setdefault('starting_time', source.starting_time if source.starting_time is not None else 0.0)
+        else:
+            kwargs.setdefault('timestamps', source)
+        return TempoSeries(name=name, data=stream_data(self.iter_corrected(data, block_rows), preset=preset,
+                                                       rate=source.rate),
+                           channels=source.channels.table.create_channel_region(region=rows),
+                           source_series=source, source_columns=self.targets.tolist(), **kwargs)
@@ -0,0 +1,175 @@
+"""
+Shared rig configurations: write the device tree of a TEMPO rig once and link to it from every
+session recorded on that rig.
+
+A :py:class:`RigStore` keeps one small NWB file per distinct rig configuration, named after the
+:py:func:`config_hash` of its device tree. A session file stores a TEMPO device holding only its
+lock-in amplifiers, whose channel tables the TempoSeries ``channels`` regions must reference within
+the file. Its ``laserline_devices`` and ``photodetector_devices`` are HDF5 external links into the
+rig file::
+
+    store = RigStore('/data/rigs')
+    tempo = store.session_device(rig_config)        # writes rigs/rig-<hash>.nwb the first time
+    nwbfile.add_device(tempo)
+    nwbfile.add_acquisition(TempoSeries(..., channels=tempo.lockinamp_devices.children[0].create_channel_region()))
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+    store.link(path, tempo)
+
+Links are stored relative to the session file, so sessions and the rig store can be moved together.
+HDF5 (and so pynwb and h5py) resolves them on read. :py:func:`ndx_tempo.metadata.read_metadata`
+parses each linked rig only once per process, and :py:func:`load_rig` caches the pynwb TEMPO
+device of a rig file, so batch jobs over many sessions from one rig pay for its configuration once.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import h5py
+from dateutil.tz import tzutc
+from pynwb import NWBFile, NWBHDF5IO
+
+from .config import tempo_from_config, tempo_to_config
+
+RIG_PREFIX = 'rig-'
+LINKED = ('laserline_devices', 'photodetector_devices')
+_DIGEST_LENGTH = 16
+
+_rigs = {}
+
+
+def _config(tempo):
+    # a session device has no laserline devices until linked: it is not a rig and fails load_config
+    if getattr(tempo, 'laserline_devices', None) is not None:
+        return tempo_to_config(tempo)
+    # normalized, so equal rigs given with different units or forms hash alike
+    return tempo_to_config(tempo_from_config(tempo))
+
+
+def _digest(config):
+    text = json.dumps(config, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def config_hash(tempo):
+    """sha256 of the configuration of a TEMPO device (or of a configuration, see ndx_tempo.config)."""
+    return _digest(_config(tempo))
+
+
+class RigStore:
+    """
+    Directory of shared rig configuration files.
+
+    :param directory: where rig files are written, created if needed
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.__configs = {}
+        self.__sessions = {}
+
+    def path(self, digest):
+        return os.path.join(self.directory, '%s%s.nwb' % (RIG_PREFIX, digest[:_DIGEST_LENGTH]))
+
+    def __resolve(self, tempo):
+        """The normalized configuration and rig file of *tempo*, written if needed; configurations
+        given as dicts are normalized once per store."""
+        key = None
+        if isinstance(tempo, dict):
+            key = json.dumps(tempo, sort_keys=True, default=str)
+            if key in self.__configs:
+                return self.__configs[key]
+        config = _config(tempo)
+        path = self.path(_digest(config))
+        if not os.path.exists(path):
+            self.__write(path, config)
+        if key is not None:
+            self.__configs[key] = config, path
+        return config, path
+
+    def __write(self, path, config):
+        os.makedirs(self.directory, exist_ok=True)
+        nwbfile = NWBFile(session_description='shared TEMPO rig configuration',
+                          identifier=RIG_PREFIX + _digest(config),
+                          session_start_time=datetime(1970, 1, 1, tzinfo=tzutc()))
+        nwbfile.add_device(tempo_from_config(config))
+        temporary = '%s.%d.part' % (path, os.getpid())
+        try:
+            with NWBHDF5IO(temporary, 'w') as io:
+                io.write(nwbfile)
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    def add(self, tempo):
+        """Write the rig file of a TEMPO device or configuration unless it exists; returns its path."""
+        return self.__resolve(tempo)[1]
+
+    def session_device(self, tempo):
+        """
+        The TEMPO device to add to a session recorded with the rig *tempo* (a device or a
+        configuration): it holds the lock-in amplifiers only, the rest is linked by :py:meth:`link`.
+        """
+        config, path = self.__resolve(tempo)
+        device = tempo_from_config(config, sections=('lockinamps',))
+        self.__sessions[id(device)] = (device, path)
+        return device
+
+    def link(self, session_path, device):
+        """Add the links to the rig file to *device* of a session from session_device, once written to
+        *session_path*."""
+        _, rig_path = self.__sessions.pop(id(device))
+        link_rig(session_path, device.name, rig_path)
+
+
+def link_rig(session_path, device_name, rig_path):
+    """Add external links to the LaserLineDevices and PhotoDetectorDevices of the rig file *rig_path*
+    to the TEMPO device *device_name* of the session file *session_path*."""
+    target = os.path.relpath(os.path.abspath(rig_path), os.path.dirname(os.path.abspath(session_path)))
+    with h5py.File(rig_path, 'r') as rig:
+        (rig_device,) = [name for name in rig['general/devices']]
+        available = [name for name in LINKED if name in rig['general/devices'][rig_device]]
+    with h5py.File(session_path, 'a') as f:
+        group = f['general/devices'][device_name]
+        for name in available:
+            if name in group:
+                raise ValueError('%s already has %s; build the device with RigStore.session_device' %
+                                 (group.name, name))
+            group[name] = h5py.ExternalLink(target, '/general/devices/%s/%s' % (rig_device, name))
+
+
+def rig_path(session_path, device_name):
+    """The rig file a session's TEMPO device links to, or None if its device tree is stored in the file."""
+    with h5py.File(session_path, 'r') as f:
+        group = f['general/devices'][device_name]
+        for name in LINKED:
+            link = group.get(name, getlink=True)
+            if isinstance(link, h5py.ExternalLink):
+                return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(session_path)), link.filename))
+    return None
+
+
+def load_rig(path):
+    """
+    The TEMPO device of the rig file *path*, read once per process and kept open; later calls
+    return the same container as long as the file is unchanged.
+    """
+    path = os.path.realpath(path)
+    mtime_ns = os.stat(path).st_mtime_ns
+    cached = _rigs.get(path)
+    if cached is None or cached[0] != mtime_ns:
+        if cached is not None:
+            cached[1].close()
+        io = NWBHDF5IO(path, 'r')
+        (device,) = io.read().devices.values()
+        cached = _rigs[path] = (mtime_ns, io, device)
+    return cached[2]
+
+
+def clear_cache():
+    """Close the rig files opened by load_rig."""
+    for _, io, _ in _rigs.values():
+        io.close()
+    _rigs.clear()
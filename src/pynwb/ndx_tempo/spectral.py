@@ -0,0 +1,212 @@
+"""
+Power spectra and coherence of TEMPO signals, cached in the NWB file.
+
+Spectra are estimated with Welch's method (a Hann or other numpy window) or with multitaper
+windows (DPSS), averaged over overlapping segments. The source is read in blocks of many segments
+and the FFTs of all segments, tapers and channels of a block are computed in one batched call, so
+recordings of any length take constant memory. The cross-spectral matrix of all channel pairs is
+accumulated at once, which gives the coherence of every pair.
+
+:py:func:`spectra` stores each result in the processing module ``tempo_spectra`` as a
+DynamicTable named after the source and a hash of the parameters, with one row per frequency.
+A second request with the same parameters reads that table instead of the signal::
+
+    with NWBHDF5IO(path, 'a') as io:
+        nwbfile = io.read()
+        result = spectra(nwbfile, 'lockin_signals', SpectralParameters(method='multitaper', bandwidth=4))
+        io.write(nwbfile)      # keeps the new entry for the next session
+    plt.semilogy(result.frequencies, result.power)
+"""
+import hashlib
+import json
+from collections import namedtuple
+from dataclasses import asdict, dataclass
+
+import numpy as np
+from hdmf.common.table import DynamicTable, VectorData
+from scipy.linalg import eigh_tridiagonal
+
+from .pyramid import _find_series
+from .utils import get_processing_module
+from .views import series_values
+
+DEFAULT_MODULE = 'tempo_spectra'
+METHODS = ('welch', 'multitaper')
+# segments read and transformed per block
+DEFAULT_BLOCK_SEGMENTS = 64
+
+Spectra = namedtuple('Spectra', ['frequencies', 'power', 'coherence', 'pairs', 'parameters', 'cached'])
+
+
+@dataclass(frozen=True)
+class SpectralParameters:
+    """
+    :param method: 'welch' or 'multitaper'
+    :param nperseg: samples per segment
+    :param noverlap: samples shared by consecutive segments, nperseg // 2 by default
+    :param window: numpy window function of Welch's method, e.g. 'hanning', 'hamming', 'blackman'
+    :param bandwidth: time-half-bandwidth product NW of the multitaper method
+    :param num_tapers: number of DPSS tapers, 2 * NW - 1 by default
+    :param detrend: 'constant' to remove the mean of every segment, or None
+    :param columns: columns of the source to analyze, all by default
+    """
+    method: str = 'welch'
+    nperseg: int = 1024
+    noverlap: int = None
+    window: str = 'hanning'
+    bandwidth: float = 3.0
+    num_tapers: int = None
+    detrend: str = 'constant'
+    columns: tuple = None
+
+    def __post_init__(self):
+        if self.method not in METHODS:
+            raise ValueError('unknown method %r, expected one of %s' % (self.method, ', '.join(METHODS)))
+        if self.columns is not None:
+            object.__setattr__(self, 'columns', tuple(int(column) for column in self.columns))
+
+    @property
+    def step(self):
+        noverlap = self.nperseg // 2 if self.noverlap is None else self.noverlap
+        if not 0 <= noverlap < self.nperseg:
+            raise ValueError('noverlap must be in [0, nperseg), got %d' % noverlap)
+        return self.nperseg - noverlap
+
+    def key(self, source):
+        """Hash of the parameters and of the identity of the source series. The identity includes
+        the series' object_id, which changes when the series is rewritten, so a new recording
+        under the same name does not hit the spectra of the old one."""
+        data = series_values(source)
+        identity = dict(asdict(self), source=source.name, object_id=source.object_id, shape=list(np.shape(data)),
+                        rate=source.rate)
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def dpss(nperseg, bandwidth, num_tapers=None):
+    """The first *num_tapers* discrete prolate spheroidal sequences (Slepian tapers) of length
+    *nperseg* and time-half-bandwidth *bandwidth*, unit energy, shape (num_tapers, nperseg)."""
+    num_tapers = int(num_tapers or max(1, int(2 * bandwidth) - 1))
+    n = np.arange(nperseg)
+    # the tapers are the eigenvectors of this symmetric tridiagonal matrix with the largest
+    # eigenvalues; only those are computed, without forming the matrix
+    diagonal = ((nperseg - 1 - 2 * n) / 2.0) ** 2 * np.cos(2 * np.pi * bandwidth / nperseg)
+    off_diagonal = n[1:] * (nperseg - n[1:]) / 2.0
+    _, vectors = eigh_tridiagonal(diagonal, off_diagonal, select='i',
+                                  select_range=(nperseg - num_tapers, nperseg - 1))
+    tapers = vectors[:, ::-1].T.copy()
+    # usual sign convention: symmetric tapers sum to a positive value, antisymmetric ones start positive
+    for k, taper in enumerate(tapers):
+        reference = taper.sum() if k % 2 == 0 else taper[:nperseg // 2] @ (nperseg // 2 - n[:nperseg // 2])
+        if reference < 0:
+            tapers[k] = -taper
+    return tapers
+
+
+def tapers(parameters):
+    """The (num_tapers, nperseg) unit-energy tapers of *parameters*."""
+    if parameters.method == 'multitaper':
+        return dpss(parameters.nperseg, parameters.bandwidth, parameters.num_tapers)
+    window = getattr(np, parameters.window)(parameters.nperseg)[np.newaxis]
+    return window / np.sqrt((window ** 2).sum())
+
+
+def _segments(block, nperseg, step):
+    count = (len(block) - nperseg) // step + 1
+    strides = (block.strides[0] * step,) + block.strides
+    return np.lib.stride_tricks.as_strided(block, (count, nperseg, block.shape[1]), strides, writeable=False)
+
+
+def cross_spectra(data, rate, parameters=SpectralParameters(), block_segments=DEFAULT_BLOCK_SEGMENTS):
+    """
+    Average one-sided cross-spectral density matrix of the columns of *data*.
+
+    :param data: sliceable (num_samples, num_channels) array, e.g. an h5py dataset
+    :return: (frequencies, csd) with csd of shape (num_frequencies, num_channels, num_channels)
+             in units of data squared per Hz
+    """
+    nperseg, step = parameters.nperseg, parameters.step
+    if len(data) < nperseg:
+        raise ValueError('need at least nperseg=%d samples, got %d' % (nperseg, len(data)))
+    windows = tapers(parameters)
+    columns = None if parameters.columns is None else list(parameters.columns)
+    num_segments = (len(data) - nperseg) // step + 1
+    frequencies = np.fft.rfftfreq(nperseg, 1.0 / rate)
+    csd = None
+    for first in range(0, num_segments, block_segments):
+        count = min(block_segments, num_segments - first)
+        start = first * step
+        block = np.asarray(data[start:start + (count - 1) * step + nperseg], dtype=float)
+        if block.ndim == 1:
+            block = block[:, np.newaxis]
+        if columns is not None:
+            block = block[:, columns]
+        segments = _segments(np.ascontiguousarray(block), nperseg, step)
+        if parameters.detrend == 'constant':
+            segments = segments - segments.mean(axis=1, keepdims=True)
+        # (segments, tapers, frequencies, channels) in one batched FFT
+        spectra = np.fft.rfft(segments[:, np.newaxis] * windows[np.newaxis, :, :, np.newaxis], axis=2)
+        block_csd = np.einsum('stfi,stfj->fij', spectra, spectra.conj())
+        csd = block_csd if csd is None else csd + block_csd
+    csd /= num_segments * len(windows) * rate
+    # one-sided: fold the negative frequencies, except at DC and (for even nperseg) Nyquist
+    last = len(frequencies) - 1 if nperseg % 2 == 0 else len(frequencies)
+    csd[1:last] *= 2
+    return frequencies, csd
+
+
+def coherence_from_csd(csd):
+    """Magnitude-squared coherence of every channel pair from a (frequencies, channels, channels) CSD."""
+    power = np.real(np.einsum('fii->fi', csd))
+    denominator = power[:, :, np.newaxis] * power[:, np.newaxis, :]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominator > 0, np.abs(csd) ** 2 / denominator, 0.0)
+
+
+def entry_name(source_name, key):
+    return '%s_spectra_%s' % (source_name, key)
+
+
+def _to_table(name, source, parameters, frequencies, power, coherence, pairs):
+    description = json.dumps({'source': source.name, 'parameters': asdict(parameters),
+                              'pairs': pairs.tolist()}, sort_keys=True)
+    return DynamicTable(name=name, description=description, columns=[
+        VectorData(name='frequency', description='frequency in Hz', data=frequencies),
+        VectorData(name='power', description='power spectral density of every channel, in %s^2/Hz' % source.unit,
+                   data=power),
+        VectorData(name='coherence', description='magnitude-squared coherence of every channel pair, in the '
+                                                 'order of the pairs in the table description', data=coherence)])
+
+
+def _from_table(table, parameters):
+    pairs = np.asarray(json.loads(table.description)['pairs'], dtype=np.intp).reshape(-1, 2)
+    return Spectra(np.asarray(table['frequency'].data[:]), np.asarray(table['power'].data[:]),
+                   np.asarray(table['coherence'].data[:]), pairs, parameters, True)
+
+
+def spectra(nwbfile, source, parameters=SpectralParameters(), module=DEFAULT_MODULE,
+            block_segments=DEFAULT_BLOCK_SEGMENTS, store=True):
+    """
+    Power spectra and pairwise coherence of the columns of the series *source* (or its name),
+    read from the cache in *module* when they were computed with the same parameters before.
+
+    :param store: add newly computed results to *module*; write the NWBFile (e.g. with an
+                  NWBHDF5IO opened in 'a' mode) to keep them
+    :return: Spectra with power of shape (frequencies, channels) and coherence of shape
+             (frequencies, pairs) for the channel pairs in ``pairs``
+    """
+    if isinstance(source, str):
+        source = _find_series(nwbfile, source)
+    if source.rate is None:
+        raise ValueError('%s has timestamps; spectra need a series with a constant rate' % source.name)
+    name = entry_name(source.name, parameters.key(source))
+    if module in nwbfile.processing and name in nwbfile.processing[module].data_interfaces:
+        return _from_table(nwbfile.processing[module][name], parameters)
+
+    frequencies, csd = cross_spectra(series_values(source), float(source.rate), parameters, block_segments)
+    power = np.real(np.einsum('fii->fi', csd))
+    pairs = np.column_stack(np.triu_indices(csd.shape[1], 1)).astype(np.intp)
+    coherence = coherence_from_csd(csd)[:, pairs[:, 0], pairs[:, 1]]
+    if store:
+        processing = get_processing_module(nwbfile, module, 'cached spectra of TEMPO signals')
+        processing.add(_to_table(name, source, parameters, frequencies, power, coherence, pairs))
+    return Spectra(frequencies, power, coherence, pairs, parameters, False)
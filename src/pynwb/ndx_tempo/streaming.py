@@ -0,0 +1,158 @@
+"""
+Streaming writes of TEMPO signal data.
+
+:py:func:`stream_data` wraps an iterable of ``(num_samples, num_channels)`` blocks so that
+``NWBHDF5IO.write`` writes it chunk by chunk, with the requested HDF5 chunking and compression.
+At most one chunk plus one incoming block is held in memory, however long the recording is.
+
+Example::
+
+    series = TempoSeries(name='lockin_signals', rate=2000., channels=lockinamp.create_channel_region(),
+                         data=stream_data(iter_blocks(raw_memmap, 20000)))
+    nwbfile.add_acquisition(series)
+    io.write(nwbfile)
+"""
+import numpy as np
+from hdmf.data_utils import AbstractDataChunkIterator, DataChunk
+
+from .presets import get_preset, make_h5dataio
+
+# size of a chunk when chunk_rows is not given
+DEFAULT_CHUNK_BYTES = 1 << 20
+
+
+def default_chunk_rows(num_channels, itemsize, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Number of rows such that a ``(rows, num_channels)`` chunk is about *chunk_bytes* large."""
+    return max(1, int(chunk_bytes // max(1, num_channels * itemsize)))
+
+
+def iter_blocks(data, block_rows, start=0, stop=None):
+    """Yield ``data[i:i + block_rows]`` as arrays, e.g. from an h5py dataset or a numpy.memmap."""
+    stop = len(data) if stop is None else min(stop, len(data))
+    for begin in range(start, stop, block_rows):
+        yield np.asarray(data[begin:min(begin + block_rows, stop)])
+
+
+class BlockIterator(AbstractDataChunkIterator):
+    """
+    Regroup an iterable of 2D sample blocks into DataChunks of exactly *chunk_rows* rows
+    (the last one may be shorter), so every write covers whole HDF5 chunks.
+
+    1D blocks are treated as a single channel. Without *chunk_rows*, the chunk size of the
+    write preset *preset* (see ndx_tempo.presets) for the sampling *rate* is used.
+    """
+
+    def __init__(self, blocks, chunk_rows=None, dtype=None, rate=None, preset=None):
+        self.__blocks = iter(blocks)
+        self.__dtype = None if dtype is None else np.dtype(dtype)
+        self.__pending = []
+        self.__pending_rows = 0
+        self.__exhausted = False
+        self.__position = 0
+        self.__num_channels = None
+        block = self.__read_block()
+        if block is None:
+            raise ValueError('cannot stream an empty iterable of blocks')
+        self.__append(block)
+        if self.__dtype is None:
+            self.__dtype = block.dtype
+        if not chunk_rows:
+            chunk_rows = get_preset(preset).chunk_rows(self.__num_channels, self.__dtype.itemsize, rate)
+        self.chunk_rows = int(chunk_rows)
+        # built up front so that recommended_data_shape matches what is written first
+        self.__first = self.__next_chunk()
+
+    def __read_block(self):
+        for block in self.__blocks:
+            block = np.asarray(block, dtype=self.__dtype)
+            if block.ndim == 1:
+                block = block[:, np.newaxis]
+            if block.ndim != 2:
+                raise ValueError('expected blocks of shape (num_samples, num_channels), got %s' % (block.shape,))
+            if self.__num_channels is None:
+                self.__num_channels = block.shape[1]
+            elif block.shape[1] != self.__num_channels:
+                raise ValueError('block has %d channels, expected %d' % (block.shape[1], self.__num_channels))
+            if len(block):
+                return block
+        self.__exhausted = True
+        return None
+
+    def __append(self, block):
+        self.__pending.append(block)
+        self.__pending_rows += len(block)
+
+    def __next_chunk(self):
+        while self.__pending_rows < self.chunk_rows and not self.__exhausted:
+            block = self.__read_block()
+            if block is not None:
+                self.__append(block)
+        if self.__pending_rows == 0:
+            return None
+        data = self.__pending[0] if len(self.__pending) == 1 else np.concatenate(self.__pending)
+        chunk, rest = data[:self.chunk_rows], data[self.chunk_rows:]
+        self.__pending = [rest] if len(rest) else []
+        self.__pending_rows = len(rest)
+        start = self.__position
+        self.__position += len(chunk)
+        return DataChunk(data=np.ascontiguousarray(chunk), selection=np.s_[start:self.__position, :])
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.__first is not None:
+            chunk, self.__first = self.__first, None
+            return chunk
+        chunk = self.__next_chunk()
+        if chunk is None:
+            raise StopIteration
+        return chunk
+
+    next = __next__
+
+    @property
+    def num_channels(self):
+        return self.__num_channels
+
+    def recommended_chunk_shape(self):
+        return (self.chunk_rows, self.__num_channels)
+
+    def recommended_data_shape(self):
+        rows = self.chunk_rows if self.__first is None else len(self.__first.data)
+        return (rows, self.__num_channels)
+
+    @property
+    def dtype(self):
+        return self.__dtype
+
+    @property
+    def maxshape(self):
+        return (None, self.__num_channels)
+
+
+def stream_data(blocks, chunk_rows=None, *, dtype=None, preset=None, rate=None, **overrides):
+    """
+    Wrap an iterable of ``(num_samples, num_channels)`` blocks for a chunked, compressed
+    streaming write.
+
+    All arguments after *chunk_rows* are keyword-only. Before write presets the third and later
+    positional arguments were ``compression, compression_opts, shuffle, dtype``; pass those
+    settings by keyword now, e.g. ``stream_data(blocks, 512, compression='lzf')``.
+
+    :param blocks: iterable of 2D arrays, e.g. from :py:func:`iter_blocks` or a generator
+                   reading from the acquisition hardware
+    :param chunk_rows: rows per HDF5 chunk; by default chosen by the preset from *rate*
+    :param dtype: cast blocks to this dtype before writing
+    :param preset: name of the write preset (see ndx_tempo.presets), the default preset if None
+    :param rate: sampling rate in Hz, used to size chunks to the preset's duration
+    :param overrides: h5py dataset options overriding the preset, e.g. ``compression='lzf'``,
+                      ``compression_opts=9``, ``shuffle=False`` or ``compression=None``
+    :return: an H5DataIO to pass as ``data`` of a TempoSeries
+    """
+    preset = get_preset(preset)
+    iterator = BlockIterator(blocks, chunk_rows=chunk_rows, dtype=dtype, rate=rate, preset=preset)
+    options = preset.dataset_options((0, iterator.num_channels), iterator.dtype)
+    options.update(overrides)
+    options['chunks'] = iterator.recommended_chunk_shape()
+    return make_h5dataio(iterator, options)
@@ -1,22 +1,227 @@
+import logging
 import os
-from pynwb import load_namespaces, get_class
-from pynwb import register_class, docval
-from hdmf.utils import call_docval_func
-from pynwb.file import MultiContainerInterface
-from hdmf.common.table import DynamicTable, ElementIdentifiers
+import sys
+import time
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+from pynwb import get_class
+from pynwb import register_class, register_map, docval
+from pynwb.base import TimeSeries
+from hdmf.utils import call_docval_func, get_docval, getargs, popargs
+from pynwb.file import MultiContainerInterface, Subject as _Subject
+from pynwb.io.file import SubjectMap
+from hdmf.build import ObjectMapper, TypeMap
+from hdmf.common.io.table import DynamicTableMap
+from hdmf.common.table import DynamicTable, DynamicTableRegion, ElementIdentifiers
+from . import units
+from ._spec_cache import load_namespaces
+from .utils import measurement_values
+from .views import data_view
 
 name = 'ndx-tempo'
 here = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 ns_path = os.path.join(here, 'spec', name + '.namespace.yaml')
 
+# TEMPO, Surgery, SubjectComplete and Subject are generated on first access, see _lazy_types
+__all__ = ['Measurement', 'LaserLine', 'PhotoDetector', 'LockInAmplifier', 'LaserLineDevices',
+           'PhotoDetectorDevices', 'LockInAmplifierDevices', 'TempoSeries',
+           'materialize', 'materialized_types', 'add_materialize_hook', 'remove_materialize_hook']
+
+_logger = logging.getLogger(__name__)
+_materialized = OrderedDict()
+_materialize_hooks = []
+
+
+def add_materialize_hook(hook):
+    """Call ``hook(type_name, seconds)`` every time an ndx-tempo type is generated and registered."""
+    _materialize_hooks.append(hook)
+
+
+def remove_materialize_hook(hook):
+    _materialize_hooks.remove(hook)
+
+
+def materialized_types():
+    """Return the ndx-tempo types materialized so far, in order, with the seconds each one took."""
+    return OrderedDict(_materialized)
+
+
+def _materialize(type_name, factory):
+    start = time.perf_counter()
+    cls = factory()
+    elapsed = time.perf_counter() - start
+    _materialized[type_name] = elapsed
+    _logger.debug('materialized %s in %.2f ms', type_name, elapsed * 1e3)
+    for hook in list(_materialize_hooks):
+        hook(type_name, elapsed)
+    return cls
+
+
+def _generate(data_type):
+    return _materialize(data_type, lambda: get_class(data_type, name))
+
+
+def _register(data_type):
+    def decorator(cls):
+        return _materialize(data_type, lambda: register_class(data_type, name)(cls))
+    return decorator
+
+
 load_namespaces(ns_path)
 
-Measurement = get_class('Measurement', name)
-LaserLine = get_class('LaserLine', name)
-PhotoDetector = get_class('PhotoDetector', name)
+# The hand-written containers below change how files are read, so they (and the generated
+# classes they depend on) are registered eagerly. Everything else is generated on first access.
+_SI = object()
+_dimension_warning = 'Measurement %r of %s has unit %r (%s), expected %s'
+
+# Measurement fields and columns with a fixed physical dimension; gain is left unchecked since
+# detector gains are given both as ratios and in V/W.
+_FIELD_UNITS = {
+    'analog_modulation_frequency': units.FREQUENCY,
+    'power': units.POWER,
+    'bandwidth': units.FREQUENCY,
+    'demod_bandwidth': units.FREQUENCY,
+    'offset': units.VOLTAGE,
+}
+
+
+@_register('Measurement')
+class Measurement(get_class('Measurement', name)):
+    """
+    Measurement that knows its unit: values are available scaled by conversion (:py:attr:`values`),
+    in SI base units (:py:attr:`si_values`) or in any compatible unit (:py:meth:`to`).
+
+    The converted arrays are computed once, cached and returned read-only, so repeated access
+    does not allocate; copy them before modifying. The cache is dropped when data, unit or
+    conversion is set and when data changes length; call :py:meth:`clear_cache` after editing
+    values of data in place. A unit whose dimension does not fit the field the Measurement is
+    assigned to (e.g. a bandwidth in 'uW') emits a units.UnitWarning.
+    """
+
+    # attributes whose assignment invalidates the converted arrays; hdmf's Data rebinds its data
+    # (set_data_io, append, extend, transform) through _Data__data
+    _converted_from = frozenset(('_Data__data', 'unit', 'conversion'))
+
+    @docval(*get_docval(get_class('Measurement', name).__init__))
+    def __init__(self, **kwargs):
+        call_docval_func(super().__init__, kwargs)
+        self.__check_unit(self.name)
+
+    def __setattr__(self, attr, value):
+        super().__setattr__(attr, value)
+        if attr in self._converted_from:
+            self.clear_cache()
+
+    def clear_cache(self):
+        """Drop the cached converted arrays, e.g. after editing values of data in place."""
+        self.__converted = {}
+        self.__converted_length = None
+
+    @property
+    def parsed_unit(self):
+        """The parsed unit, or None if it cannot be parsed."""
+        try:
+            return units.parse_unit(self.unit)
+        except units.UnitError:
+            return None
 
+    def __check_unit(self, field, parent=None):
+        expected = _FIELD_UNITS.get(field)
+        if expected is None:
+            return
+        unit = self.parsed_unit
+        if unit is None or not unit.compatible(expected):
+            where = 'field %r of %r' % (field, parent.name) if parent is not None else 'field %r' % field
+            actual = 'unknown unit' if unit is None else units.format_dimension(unit.dimension)
+            warnings.warn(_dimension_warning % (self.name, where, self.unit, actual,
+                                                units.format_dimension(expected.dimension)),
+                          units.UnitWarning, stacklevel=3)
 
-@register_class('LockInAmplifier', name)
+    @property
+    def parent(self):
+        return super().parent
+
+    @parent.setter
+    def parent(self, parent_container):
+        # hdmf sets the parent when the Measurement is assigned to a field, which is where the
+        # field name, and so the expected dimension, becomes known
+        super(Measurement, type(self)).parent.fset(self, parent_container)
+        # hdmf's __new__ sets the parent before the name exists
+        if parent_container is None or getattr(self, '_AbstractContainer__name', None) is None:
+            return
+        if self.name in _FIELD_UNITS:
+            return
+        fields = getattr(parent_container, 'fields', None) or {}
+        for field, value in fields.items():
+            if value is self:
+                self.__check_unit(field, parent_container)
+                break
+
+    def __converted_values(self, unit):
+        data = self.data
+        if len(data) != self.__converted_length:
+            self.__converted = {}
+            self.__converted_length = len(data)
+        values = self.__converted.get(unit)
+        if values is None:
+            values = np.asarray(data[:]).astype(float)
+            if self.conversion is not None:
+                values *= self.conversion
+            if unit is _SI:
+                values *= units.parse_unit(self.unit).scale
+            elif unit is not None:
+                values *= units.conversion_factor(self.unit, unit)
+            values.flags.writeable = False
+            self.__converted[unit] = values
+        return values
+
+    @property
+    def values(self):
+        """Read-only float array of data times conversion, in the Measurement's unit."""
+        return self.__converted_values(None)
+
+    @property
+    def si_values(self):
+        """Read-only float array of the values in SI base units, e.g. volts for 'mV' data."""
+        return self.__converted_values(_SI)
+
+    def to(self, unit):
+        """Read-only float array of the values in *unit*; raises units.UnitError if it is not
+        dimensionally compatible with the Measurement's unit."""
+        return self.__converted_values(unit)
+
+    def data_view(self):
+        """Read-only view of data that avoids copying it into memory, see ndx_tempo.views.data_view."""
+        return data_view(self.data)
+
+
+@register_map(Measurement)
+class MeasurementMap(ObjectMapper):
+
+    @ObjectMapper.constructor_arg('data')
+    def data(self, builder, manager):
+        # hdmf reads a single-value Measurement (e.g. demod_bandwidth) back as a scalar
+        data = builder.data
+        return [data] if np.ndim(data) == 0 else data
+
+
+LaserLine = _generate('LaserLine')
+PhotoDetector = _generate('PhotoDetector')
+
+
+def _extend(column, values):
+    if isinstance(column.data, list):
+        column.data.extend(values.tolist() if isinstance(values, np.ndarray) else values)
+    elif hasattr(column, 'extend'):
+        column.extend(values)
+    else:
+        for value in values:
+            column.append(value)
+
+
+@_register('LockInAmplifier')
 class LockInAmplifier(DynamicTable):
     __columns__ = (
         {'name': 'channel_name',
@@ -27,6 +232,10 @@ class LockInAmplifier(DynamicTable):
          'description': 'gain for channel of lock_in_amp'}
     )
 
+    __fields__ = ({'name': 'demod_bandwidth', 'child': True},
+                  'demodulation_filter_order',
+                  'reference')
+
     @docval({'name': 'name', 'type': str, 'doc': 'Name of this Compartments object',
              'default': 'compartments'},
             {'name': 'description', 'type': str, 'doc': 'a description of what is in this table',
@@ -47,45 +256,390 @@ class LockInAmplifier(DynamicTable):
     def __init__(self, **kwargs):
         if kwargs.get('description', None) is None:
             kwargs['description'] = "meta-data for the LockInAmplifier for TEMPO device"
+        demod_bandwidth, demodulation_filter_order, reference = popargs(
+            'demod_bandwidth', 'demodulation_filter_order', 'reference', kwargs)
         call_docval_func(super().__init__, kwargs)
+        self.demod_bandwidth = demod_bandwidth
+        self.demodulation_filter_order = demodulation_filter_order
+        self.reference = reference
+        self.__version = 0
+        self.__cache_key = None
+        self.__cached_data = ()
+        self.__index = None
+        self.__arrays = None
+
+    def clear_cache(self):
+        """Drop the cached channel index and arrays, e.g. after editing values of a column in place."""
+        self.__version += 1
+        if 'offset' in self.colnames and hasattr(self['offset'], 'clear_cache'):
+            self['offset'].clear_cache()
+
+    def __columns(self):
+        # channel index and arrays are rebuilt when rows were added or a column's data was replaced
+        # (e.g. by set_data_io) since they were cached; in-place edits need clear_cache
+        data = tuple(self[column].data for column in ('channel_name', 'offset', 'gain'))
+        key = (self.__version, len(self.id))
+        if key != self.__cache_key or any(new is not old for new, old in zip(data, self.__cached_data)):
+            names = [name.decode('utf-8') if isinstance(name, bytes) else str(name)
+                     for name in self['channel_name'].data[:]]
+            offset = measurement_values(self['offset'])
+            gain = np.asarray(self['gain'].data[:], dtype=float)
+            offset.flags.writeable = False
+            gain.flags.writeable = False
+            self.__index = {name: row for row, name in enumerate(names)}
+            self.__arrays = (tuple(names), offset, gain)
+            self.__cache_key = key
+            self.__cached_data = data
+        return self.__arrays
+
+    @property
+    def channel_names(self):
+        """The channel names, in row order. Like offsets and gains, it is cached until rows are added
+        or a column is replaced; call :py:meth:`clear_cache` after editing column values in place."""
+        return self.__columns()[0]
+
+    @property
+    def offsets(self):
+        """Read-only float array of the channel offsets with the Measurement conversion applied,
+        cached like :py:attr:`channel_names`."""
+        return self.__columns()[1]
+
+    @property
+    def gains(self):
+        """Read-only float array of the channel gains, cached like :py:attr:`channel_names`."""
+        return self.__columns()[2]
+
+    def channel_index(self, channel_name):
+        """Row of the channel called *channel_name*; raises KeyError if there is none."""
+        self.__columns()
+        return self.__index[channel_name]
+
+    def channel_indices(self, channel_names):
+        """Rows of the channels called *channel_names*, as an integer array."""
+        self.__columns()
+        index = self.__index
+        return np.fromiter((index[name] for name in channel_names), dtype=np.intp, count=len(channel_names))
+
+    def add_row(self, **kwargs):
+        super().add_row(**kwargs)
+        self.clear_cache()
+
+    @docval({'name': 'channel_name', 'type': 'array_data', 'doc': 'the names of the new channels'},
+            {'name': 'offset', 'type': 'array_data', 'doc': 'the offsets of the new channels, in the offset unit'},
+            {'name': 'gain', 'type': 'array_data', 'doc': 'the gains of the new channels'},
+            {'name': 'id', 'type': 'array_data', 'doc': 'the ids of the new rows, consecutive by default',
+             'default': None})
+    def add_rows(self, **kwargs):
+        """Append many channels at once, extending each column in one operation."""
+        channel_name, offset, gain, ids = getargs('channel_name', 'offset', 'gain', 'id', kwargs)
+        count = len(channel_name)
+        if len(offset) != count or len(gain) != count:
+            raise ValueError('channel_name, offset and gain must have the same length')
+        if ids is None:
+            ids = range(len(self.id), len(self.id) + count)
+        elif len(ids) != count:
+            raise ValueError('id must have the same length as channel_name')
+        for column, values in ((self.id, ids), (self['channel_name'], channel_name),
+                               (self['offset'], np.asarray(offset, dtype=float)),
+                               (self['gain'], np.asarray(gain, dtype=float))):
+            _extend(column, values)
+        self.clear_cache()
+
+    @docval({'name': 'region', 'type': (slice, list, tuple),
+             'doc': 'the indices of the channel rows, all rows by default', 'default': None},
+            {'name': 'name', 'type': str, 'doc': 'the name of the region', 'default': 'channels'},
+            {'name': 'description', 'type': str, 'doc': 'a brief description of what the region is',
+             'default': 'LockInAmplifier channels'})
+    def create_channel_region(self, **kwargs):
+        """Create a DynamicTableRegion over the channel rows, e.g. for TempoSeries.channels."""
+        region, name, description = getargs('region', 'name', 'description', kwargs)
+        if region is None:
+            region = list(range(len(self)))
+        return self.create_region(name, region, description)
+
 
+@register_map(LockInAmplifier)
+class LockInAmplifierMap(DynamicTableMap):
 
-@register_class('LaserLineDevices', name)
+    @ObjectMapper.constructor_arg('columns')
+    def columns(self, builder, manager):
+        # demod_bandwidth is a Measurement, and so a VectorData, but a field rather than a column
+        return [manager.construct(dataset) for name, dataset in builder.datasets.items()
+                if name not in ('id', 'demod_bandwidth')]
+
+
+def _devices_init(attr, container_type, default_name):
+    """__init__ of a *Devices container: the spec fixes its name, so that is the default."""
+    @docval({'name': attr, 'type': (list, tuple, dict, container_type), 'default': None,
+             'doc': '%s devices to store in this container' % container_type.__name__},
+            {'name': 'name', 'type': str, 'doc': 'the name of this container', 'default': default_name})
+    def __init__(self, **kwargs):
+        devices = popargs(attr, kwargs)
+        MultiContainerInterface.__init__(self, **kwargs)
+        setattr(self, attr, devices)
+    return __init__
+
+
+# 'attr' is the attribute name the ObjectMapper derives from the child type, e.g. LaserLine ->
+# laser_lines, so the children are found when files are read
+@_register('LaserLineDevices')
 class LaserLineDevices(MultiContainerInterface):
 
     __clsconf__ = {
-        'attr': 'laserline devices',
+        'attr': 'laser_lines',
         'type': LaserLine,
         'add': 'add_laserline',
         'get': 'get_laserline',
         'create': 'create_laserline',
     }
 
+    __init__ = _devices_init('laser_lines', LaserLine, 'laserline_devices')
+
 
-@register_class('PhotoDetectorDevices', name)
+@_register('PhotoDetectorDevices')
 class PhotoDetectorDevices(MultiContainerInterface):
 
     __clsconf__ = {
-        'attr': 'photodetector devices',
+        'attr': 'photo_detectors',
         'type': PhotoDetector,
         'add': 'add_photodetector',
         'get': 'get_photodetector',
         'create': 'create_photodector',
     }
 
+    __init__ = _devices_init('photo_detectors', PhotoDetector, 'photodetector_devices')
+
 
-@register_class('LockInAmplifierDevices', name)
+@_register('LockInAmplifierDevices')
 class LockInAmplifierDevices(MultiContainerInterface):
 
     __clsconf__ = {
-        'attr': 'lockinamp_device devices',
+        'attr': 'lock_in_amplifiers',
         'type': LockInAmplifier,
         'add': 'add_lockinamp',
         'get': 'get_lockinamp',
         'create': 'create_lockinamp',
     }
 
+    __init__ = _devices_init('lock_in_amplifiers', LockInAmplifier, 'lockinamp_devices')
+
+
+@_register('TempoSeries')
+class TempoSeries(TimeSeries):
+
+    __nwbfields__ = ({'name': 'channels', 'required_name': 'channels', 'child': True,
+                      'doc': 'the LockInAmplifier channel rows that correspond to the columns of data'},
+                     {'name': 'source_series', 'doc': 'for derived signals, the series they were computed from'},
+                     {'name': 'source_columns',
+                      'doc': 'for derived signals, the column of source_series each column of data was computed from'})
+
+    @docval(*get_docval(TimeSeries.__init__, 'name'),
+            {'name': 'data', 'type': ('array_data', 'data', TimeSeries), 'shape': ((None, ), (None, None)),
+             'doc': 'the signal data, shape (num_times, num_channels). Pass the result of '
+                    'ndx_tempo.streaming.stream_data to write it block by block'},
+            {'name': 'channels', 'type': DynamicTableRegion,
+             'doc': 'the LockInAmplifier channel rows that correspond to the columns of data'},
+            {'name': 'unit', 'type': str, 'doc': 'the base unit of measurement (should be SI unit)',
+             'default': 'volts'},
+            *get_docval(TimeSeries.__init__, 'resolution', 'conversion', 'timestamps', 'starting_time', 'rate',
+                        'comments', 'description', 'control', 'control_description'),
+            {'name': 'source_series', 'type': TimeSeries, 'default': None,
+             'doc': 'for derived signals, the series they were computed from'},
+            {'name': 'source_columns', 'type': ('array_data', 'data'), 'shape': (None, ), 'default': None,
+             'doc': 'for derived signals, the column of source_series each column of data was computed from'})
+    def __init__(self, **kwargs):
+        name, data, channels, unit = popargs('name', 'data', 'channels', 'unit', kwargs)
+        source_series, source_columns = popargs('source_series', 'source_columns', kwargs)
+        super().__init__(name, data, unit, **kwargs)
+        self.channels = channels
+        self.source_series = source_series
+        self.source_columns = source_columns
+
+    def data_view(self):
+        """Read-only view of data that avoids copying it into memory, see ndx_tempo.views.data_view."""
+        return data_view(self.data)
+
+    def decoded(self, dtype='float64'):
+        """Lazily decoded physical values of a series that stores integer ADC counts, see ndx_tempo.counts."""
+        from .counts import CountsView
+        return CountsView(self, dtype=dtype)
+
+
+def _define_tempo():
+    @register_class('TEMPO', name)
+    class TEMPO(get_class('TEMPO', name)):
+
+        @classmethod
+        def from_config(cls, config):
+            """Build the device and its whole device tree from a dict, DataFrame, list of rows or YAML
+            path in one pass, see ndx_tempo.config."""
+            from .config import tempo_from_config
+            return tempo_from_config(config, cls=cls)
+
+        def to_config(self):
+            """The configuration dict that from_config turns back into this device."""
+            from .config import tempo_to_config
+            return tempo_to_config(self)
+
+    return TEMPO
+
+
+# fields of the untyped subgroups of Surgery, which the Surgery classes keep as flat arguments and
+# attributes, e.g. Surgery(ophys_implant_name='fiber') for implantation/ophys_implant_name
+_surgery_groups = OrderedDict([
+    ('implantation', ('ophys_implant_name', 'ephys_implant_name', 'implantation_device')),
+    ('virus_injection', ('virus_injection_id', 'virus_injection_opsin', 'virus_injection_opsin_l_r',
+                         'virus_injection_scheme', 'virus_injection_tag', 'virus_injection_coordinates_description',
+                         'virus_injection_volume', 'virus_injection_coordinates')),
+    ('ophys_injection', ('ophys_injection_date', 'ophys_injection_volume', 'ophys_injection_brain_area',
+                         'ophys_injection_flr_protein_data')),
+])
+
+
+class SurgeryMap(SubjectMap):
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        for group, fields in _surgery_groups.items():
+            group_spec = spec.get_group(group)
+            for field in fields:
+                self.map_spec(field, (group_spec.get_attribute(field) or group_spec.get_dataset(field) or
+                                      group_spec.get_group(field) or group_spec.get_link(field)))
+
+
+def _flat_args(data_type, base):
+    """docval arguments of the generated *data_type* that *base* does not take, with the
+    'implantation__ophys_implant_name' etc. arguments of the Surgery subgroups made flat."""
+    base_args = {arg['name'] for arg in get_docval(base.__init__)}
+    args = []
+    for arg in get_docval(get_class(data_type, name).__init__):
+        group, _, field = arg['name'].partition('__')
+        if group in _surgery_groups:
+            arg = dict(arg, name=field)
+        if arg['name'] not in base_args and arg['name'] != 'skip_post_init':
+            args.append(arg)
+    return args
+
+
+def _define_surgery():
+    surgery_args = _flat_args('Surgery', _Subject)
+    fields = tuple(arg['name'] for arg in surgery_args)
+
+    @register_class('Surgery', name)
+    class Surgery(_Subject):
+        """
+        Subject with surgery metadata. The fields of the implantation, virus_injection and
+        ophys_injection groups are flat arguments and attributes, e.g. ``implantation_device``.
+        """
+
+        __nwbfields__ = tuple({'name': field, 'child': True, 'required_name': field}
+                              if field == 'ophys_injection_flr_protein_data' else field for field in fields)
+
+        @docval(*get_docval(_Subject.__init__), *surgery_args)
+        def __init__(self, **kwargs):
+            values = {field: kwargs.pop(field) for field in fields}
+            call_docval_func(super().__init__, kwargs)
+            for field, value in values.items():
+                setattr(self, field, value)
+
+    register_map(Surgery, _lazy_maps['Surgery'])
+    return Surgery
+
+
+def _define_subject_complete():
+    surgery = getattr(sys.modules[__name__], 'Surgery')
+    subject_args = _flat_args('SubjectComplete', surgery)
+    fields = tuple(arg['name'] for arg in subject_args)
+
+    @register_class('SubjectComplete', name)
+    class SubjectComplete(surgery):
+        """Surgery with the remaining subject metadata of a TEMPO experiment."""
+
+        __nwbfields__ = fields
+
+        @docval(*get_docval(surgery.__init__), *subject_args)
+        def __init__(self, **kwargs):
+            values = {field: kwargs.pop(field) for field in fields}
+            call_docval_func(super().__init__, kwargs)
+            for field, value in values.items():
+                setattr(self, field, value)
+
+    return SubjectComplete
+
+
+_factories = {
+    'TEMPO': _define_tempo,
+    'Surgery': _define_surgery,
+    'SubjectComplete': _define_subject_complete,
+}
+_lazy_maps = {'Surgery': SurgeryMap}
+_materializing = set()
+
+# attribute -> (data type, data types to materialize first)
+_lazy_types = {
+    'TEMPO': ('TEMPO', ()),
+    'Surgery': ('Surgery', ()),
+    'SubjectComplete': ('SubjectComplete', ('Surgery',)),
+    'Subject': ('SubjectComplete', ('Surgery',)),
+}
+
+
+def __getattr__(attr):
+    if attr not in _lazy_types:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, attr))
+    data_type, dependencies = _lazy_types[attr]
+    for dependency in dependencies:
+        getattr(sys.modules[__name__], dependency)
+    _materializing.add(data_type)
+    try:
+        if data_type in _factories:
+            cls = _materialize(data_type, _factories[data_type])
+        else:
+            cls = _generate(data_type)
+    finally:
+        _materializing.discard(data_type)
+    for alias, (alias_type, _) in _lazy_types.items():
+        if alias_type == data_type:
+            globals()[alias] = cls
+    return cls
+
+
+def materialize(*attrs):
+    """Generate and register the given lazily built types (all of them by default) and return them.
+
+    Reading a file does not need this: the types are also built the first time a TypeMap resolves
+    them, see _get_dt_container_cls.
+    """
+    module = sys.modules[__name__]
+    return tuple(getattr(module, attr) for attr in (attrs or tuple(_lazy_types)))
+
+
+_type_map_get_dt_container_cls = TypeMap.get_dt_container_cls
+
+
+def _register_materialized(type_map):
+    # TypeMaps copied from pynwb's before a type was built (e.g. the one of an open NWBHDF5IO)
+    # would otherwise generate a plain class of their own for it
+    for data_type in _factories:
+        cls = globals().get(data_type)
+        if cls is None:
+            continue
+        if _type_map_get_dt_container_cls(type_map, data_type, name, autogen=False) is not cls:
+            type_map.register_container_type(name, data_type, cls)
+            if data_type in _lazy_maps:
+                type_map.register_map(cls, _lazy_maps[data_type])
+
+
+def _get_dt_container_cls(self, *args, **kwargs):
+    """TypeMap.get_dt_container_cls that builds the lazy ndx-tempo types on first resolution, so
+    files read before ``ndx_tempo.TEMPO`` etc. are accessed still get the hand-written classes."""
+    data_type = args[0] if args else kwargs.get('data_type')
+    namespace = args[1] if len(args) > 1 else kwargs.get('namespace')
+    if (data_type in _factories and namespace in (None, name) and not _materializing
+            and name in self.namespace_catalog.namespaces):
+        getattr(sys.modules[__name__], data_type)
+        _register_materialized(self)
+    return _type_map_get_dt_container_cls(self, *args, **kwargs)
+
 
-TEMPO = get_class('TEMPO', name)
-Surgery = get_class('Surgery', name)
-Subject = get_class('SubjectComplete', name)
+TypeMap.get_dt_container_cls = _get_dt_container_cls
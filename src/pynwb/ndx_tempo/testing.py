@@ -0,0 +1,89 @@
+"""
+Helpers that build synthetic ndx-tempo objects for tests and benchmarks.
+"""
+import asyncio
+from datetime import datetime
+
+import numpy as np
+from dateutil.tz import tzlocal
+from hdmf.common.table import VectorData
+from pynwb import NWBFile
+
+from . import tempo as _tempo
+from .acquisition import encode_packet
+from .tempo import (Measurement, LaserLine, PhotoDetector, LockInAmplifier, LaserLineDevices,
+                    PhotoDetectorDevices, LockInAmplifierDevices)
+
+
+def mock_nwbfile(**kwargs):
+    kwargs.setdefault('session_description', 'session description')
+    kwargs.setdefault('identifier', 'session id')
+    kwargs.setdefault('session_start_time', datetime.now(tzlocal()))
+    return NWBFile(**kwargs)
+
+
+def mock_lockinamp(name='lockinamp', num_channels=4, filter_order=4.0, bandwidth=50.0):
+    return LockInAmplifier(name=name, demodulation_filter_order=float(filter_order), reference='internal',
+                           demod_bandwidth=Measurement(name='demod_bandwidth', description='demod_bandwidth',
+                                                       unit='Hz', data=[float(bandwidth)]),
+                           columns=[
+                               VectorData(name='channel_name', description='channel_name',
+                                          data=['channel%d' % i for i in range(num_channels)]),
+                               Measurement(name='offset', description='offset', unit='volts',
+                                           data=[0.0] * num_channels),
+                               VectorData(name='gain', description='gain', data=[1.0] * num_channels)])
+
+
+def mock_tempo(name='tempo', num_channels=4, num_lines=2, modulation_frequencies=None, filter_order=4.0,
+               bandwidth=50.0):
+    """Build a TEMPO device with *num_lines* laser lines, *num_channels* photodetectors and one lock-in
+    amplifier with *num_channels* channels."""
+    if modulation_frequencies is None:
+        modulation_frequencies = [1000.0 * (i + 1) for i in range(num_lines)]
+    laserlines = LaserLineDevices()
+    for i, frequency in enumerate(modulation_frequencies):
+        laserlines.add_laserline(LaserLine(
+            name='laserline%d' % i, reference='laserline%d' % i,
+            analog_modulation_frequency=Measurement(name='analog_modulation_frequency',
+                                                    description='analog_modulation_frequency',
+                                                    unit='Hz', data=[str(frequency)]),
+            power=Measurement(name='power', description='power', unit='watts', data=[1e-3])))
+    photodetectors = PhotoDetectorDevices()
+    for i in range(num_channels):
+        photodetectors.add_photodetector(PhotoDetector(
+            name='photodetector%d' % i, reference='photodetector%d' % i,
+            gain=Measurement(name='gain', description='gain', unit='', data=[1.0]),
+            bandwidth=Measurement(name='bandwidth', description='bandwidth', unit='Hz', data=[1e5])))
+    lockinamps = LockInAmplifierDevices()
+    lockinamps.add_lockinamp(mock_lockinamp(num_channels=num_channels, filter_order=filter_order,
+                                            bandwidth=bandwidth))
+    return _tempo.TEMPO(name=name, laserline_devices=laserlines, photodetector_devices=photodetectors,
+                        lockinamp_devices=lockinamps)
+
+
+def synthetic_signals(num_samples, num_channels, rate=20000.0, seed=0, dtype='float64'):
+    """Smooth, oversampled traces with a little noise, similar to demodulated TEMPO signals."""
+    rng = np.random.RandomState(seed)
+    t = np.arange(num_samples) / rate
+    slow = np.sin(2 * np.pi * 3.0 * t[:, np.newaxis] + rng.uniform(0, 2 * np.pi, num_channels))
+    noise = rng.normal(scale=0.01, size=(num_samples, num_channels))
+    return (1.0 + 0.05 * slow + noise).astype(dtype)
+
+
+async def serve_fake_amplifier(blocks, host='127.0.0.1', port=0, interval=0.0):
+    """Start a local TCP server that sends *blocks* to every client in the lock-in wire format (see
+    ndx_tempo.acquisition), pausing *interval* seconds between blocks, then closes the connection.
+
+    :return: the asyncio Server; its address is ``server.sockets[0].getsockname()``
+    """
+    async def send(reader, writer):
+        try:
+            for block in blocks:
+                writer.write(encode_packet(block))
+                await writer.drain()
+                if interval:
+                    await asyncio.sleep(interval)
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(send, host, port)
@@ -0,0 +1,195 @@
+"""
+Event-triggered averages of TEMPO series over many trials, read with sequential I/O.
+
+Event times (an array, or a column of a trials or other TimeIntervals table) are converted to
+sample indices in one vectorized step. The trial windows are then sorted and coalesced into bulk
+reads aligned to the HDF5 chunks of the dataset: windows that overlap, or that share or nearly
+share a chunk, are read together as one slice, so thousands of trials cost a few long sequential
+reads instead of one random read each. Each read is cut into its windows with a single fancy-index
+and folded into streaming statistics, so memory grows with the window length, not the number of
+trials::
+
+    average = triggered_average(series, nwbfile.trials, window=(-0.05, 0.2), channels=[0, 3])
+    plt.fill_between(average.times, average.lower[:, 0], average.upper[:, 0])
+    plt.plot(average.times, average.mean[:, 0])
+
+Means and standard errors use Welford's (Chan's) update. Confidence intervals come from a
+Poisson bootstrap: every trial gets an independent Poisson(1) weight in each replicate, which
+resamples trials with replacement without having all of them in memory at once.
+"""
+from collections import namedtuple
+
+import h5py
+import numpy as np
+from hdmf.data_utils import DataIO
+
+from .views import data_view, series_values
+
+# reads are not merged beyond this many rows
+DEFAULT_MAX_READ_ROWS = 1 << 18
+DEFAULT_NUM_BOOTSTRAP = 200
+
+TriggeredAverage = namedtuple('TriggeredAverage', ['times', 'mean', 'sem', 'lower', 'upper', 'count', 'trials'])
+Read = namedtuple('Read', ['start', 'stop', 'trials'])
+
+
+def event_times(events, column='start_time'):
+    """Event times in seconds from an array or from *column* of a TimeIntervals or other DynamicTable."""
+    if hasattr(events, 'colnames'):
+        return np.asarray(events[column].data[:], dtype=float)
+    return np.asarray(events, dtype=float).reshape(-1)
+
+
+def sample_indices(series, times):
+    """
+    Index of the sample of *series* at or right after each of *times*, computed for all times at
+    once: from ``starting_time`` and ``rate``, or by a binary search of the timestamps.
+    """
+    times = np.asarray(times, dtype=float)
+    if series.rate is not None:
+        starting_time = series.starting_time if series.starting_time is not None else 0.0
+        return np.ceil(np.round((times - starting_time) * series.rate, 6)).astype(np.int64)
+    timestamps = np.asarray(data_view(series.timestamps)[:], dtype=float)
+    return np.searchsorted(timestamps, times).astype(np.int64)
+
+
+def chunk_rows(series):
+    """Rows per HDF5 chunk of the data of *series*, or None if it is not chunked or not in a file."""
+    data = series.data
+    while isinstance(data, DataIO):
+        data = data.data
+    if isinstance(data, h5py.Dataset) and data.chunks is not None:
+        return data.chunks[0]
+    return None
+
+
+def plan_reads(starts, length, num_rows, chunk=None, max_read_rows=DEFAULT_MAX_READ_ROWS):
+    """
+    Group windows ``[start, start + length)`` into sorted bulk reads.
+
+    Windows that do not lie inside ``[0, num_rows)`` are dropped. Reads are expanded to whole
+    chunks of *chunk* rows and neighbouring windows are merged while their chunk-aligned ranges
+    touch and the read stays under *max_read_rows* rows.
+
+    :return: list of Read(start, stop, trials) with the indices of the windows of each read
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    chunk = max(1, int(chunk or 1))
+    valid = np.flatnonzero((starts >= 0) & (starts + length <= num_rows))
+    order = valid[np.argsort(starts[valid], kind='stable')]
+    reads = []
+    if not len(order):
+        return reads
+    first = starts[order]
+    # chunk-aligned range of every window
+    lower = first // chunk * chunk
+    upper = np.minimum(-(-(first + length) // chunk) * chunk, num_rows)
+    group_start, group_stop, members = lower[0], upper[0], [order[0]]
+    for index, low, high in zip(order[1:], lower[1:], upper[1:]):
+        if low <= group_stop and max(high, group_stop) - group_start <= max_read_rows:
+            group_stop = max(group_stop, high)
+            members.append(index)
+            continue
+        reads.append(Read(int(group_start), int(group_stop), np.asarray(members, dtype=np.intp)))
+        group_start, group_stop, members = low, high, [index]
+    reads.append(Read(int(group_start), int(group_stop), np.asarray(members, dtype=np.intp)))
+    return reads
+
+
+class TriggeredStatistics:
+    """
+    Streaming mean, standard error and Poisson-bootstrap means of trial windows.
+
+    :param shape: shape of one window, (samples, channels)
+    :param num_bootstrap: number of bootstrap replicates, 0 for none
+    :param seed: seed of the bootstrap weights
+    """
+
+    def __init__(self, shape, num_bootstrap=DEFAULT_NUM_BOOTSTRAP, seed=0):
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.random = np.random.RandomState(seed)
+        self.num_bootstrap = num_bootstrap
+        self.sums = np.zeros((num_bootstrap,) + tuple(shape))
+        self.weights = np.zeros(num_bootstrap)
+
+    def update(self, windows):
+        """Add a batch of trial windows, shape (trials, samples, channels)."""
+        windows = np.asarray(windows, dtype=float)
+        count = len(windows)
+        if not count:
+            return
+        mean = windows.mean(axis=0)
+        m2 = ((windows - mean) ** 2).sum(axis=0)
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * (count / total)
+        self.m2 += m2 + delta ** 2 * (self.count * count / total)
+        self.count = total
+        if self.num_bootstrap:
+            weights = self.random.poisson(1.0, size=(count, self.num_bootstrap)).astype(float)
+            self.sums += np.tensordot(weights, windows, axes=(0, 0))
+            self.weights += weights.sum(axis=0)
+
+    @property
+    def sem(self):
+        if self.count < 2:
+            return np.full_like(self.mean, np.nan)
+        return np.sqrt(self.m2 / (self.count - 1) / self.count)
+
+    def interval(self, confidence=0.95):
+        """Percentile bootstrap confidence interval of the mean, (lower, upper); NaN without replicates."""
+        used = self.weights > 0
+        if not self.num_bootstrap or not used.any():
+            nan = np.full_like(self.mean, np.nan)
+            return nan, nan.copy()
+        means = self.sums[used] / self.weights[used].reshape((-1,) + (1,) * self.mean.ndim)
+        tail = (1.0 - confidence) / 2.0 * 100.0
+        lower, upper = np.percentile(means, [tail, 100.0 - tail], axis=0)
+        return lower, upper
+
+
+def triggered_average(series, events, window=(-0.1, 0.5), channels=None, column='start_time',
+                      num_bootstrap=DEFAULT_NUM_BOOTSTRAP, confidence=0.95, seed=0,
+                      max_read_rows=DEFAULT_MAX_READ_ROWS):
+    """
+    Average of *series* around every event, over trials, with standard errors and bootstrap
+    confidence intervals.
+
+    :param series: a TimeSeries (integer-count TempoSeries are decoded to physical values)
+    :param events: event times in seconds, or a TimeIntervals/DynamicTable whose *column* holds them
+    :param window: (before, after) the event in seconds; before is usually negative
+    :param channels: columns of the series to average, all by default
+    :param num_bootstrap: number of Poisson bootstrap replicates, 0 to skip the confidence interval
+    :param max_read_rows: upper bound of the rows read at once when merging windows
+    :return: TriggeredAverage with times relative to the event and arrays of shape (samples, channels);
+             ``trials`` holds the indices of the events whose window lies within the recording
+    """
+    rate = series.rate
+    if rate is None:
+        timestamps = np.asarray(data_view(series.timestamps)[:], dtype=float)
+        rate = 1.0 / np.median(np.diff(timestamps))
+    offset = int(np.round(window[0] * rate))
+    length = int(np.round(window[1] * rate)) - offset
+    if length <= 0:
+        raise ValueError('empty window %s' % (window,))
+    data = series_values(series)
+    starts = sample_indices(series, event_times(events, column)) + offset
+    num_channels = 1 if len(data.shape) == 1 else data.shape[1]
+    columns = np.arange(num_channels) if channels is None else np.asarray(channels, dtype=np.intp)
+
+    statistics = TriggeredStatistics((length, len(columns)), num_bootstrap, seed)
+    trials = []
+    steps = np.arange(length)
+    for read in plan_reads(starts, length, len(data), chunk_rows(series), max_read_rows):
+        block = np.asarray(data[read.start:read.stop], dtype=float)
+        if block.ndim == 1:
+            block = block[:, np.newaxis]
+        rows = (starts[read.trials] - read.start)[:, np.newaxis] + steps
+        statistics.update(block[:, columns][rows])
+        trials.append(read.trials)
+    lower, upper = statistics.interval(confidence)
+    trials = np.sort(np.concatenate(trials)) if trials else np.zeros(0, dtype=np.intp)
+    return TriggeredAverage((offset + steps) / rate, statistics.mean, statistics.sem, lower, upper,
+                            statistics.count, trials)
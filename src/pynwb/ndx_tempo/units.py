@@ -0,0 +1,180 @@
+"""
+Parsing of the unit strings of Measurement into an SI scale factor and a dimension.
+
+Units are products and quotients of (optionally SI-prefixed) unit names with integer powers,
+e.g. ``'uW'``, ``'kHz'``, ``'millivolts'``, ``'V/W'``, ``'m/s^2'``, ``'m s**-2'`` or ``'mm**3'``; the empty
+string is dimensionless. Parsing is cached, so comparing and converting units is cheap enough to
+do on every access.
+"""
+import re
+from functools import lru_cache
+
+# exponents of (m, kg, s, A, K, mol, cd)
+_BASE_DIMENSIONS = ('m', 'kg', 's', 'A', 'K', 'mol', 'cd')
+
+_DIMENSIONLESS = (0, 0, 0, 0, 0, 0, 0)
+_LENGTH = (1, 0, 0, 0, 0, 0, 0)
+_MASS = (0, 1, 0, 0, 0, 0, 0)
+_TIME = (0, 0, 1, 0, 0, 0, 0)
+_CURRENT = (0, 0, 0, 1, 0, 0, 0)
+_TEMPERATURE = (0, 0, 0, 0, 1, 0, 0)
+_AMOUNT = (0, 0, 0, 0, 0, 1, 0)
+_LUMINOUS = (0, 0, 0, 0, 0, 0, 1)
+_FREQUENCY = (0, 0, -1, 0, 0, 0, 0)
+_POWER = (2, 1, -3, 0, 0, 0, 0)
+_VOLTAGE = (2, 1, -3, -1, 0, 0, 0)
+_VOLUME = (3, 0, 0, 0, 0, 0, 0)
+
+# name -> (scale to SI, dimension); prefixes apply to all of these except the ones in _UNPREFIXED
+_UNITS = {
+    'm': (1.0, _LENGTH), 'meter': (1.0, _LENGTH), 'metre': (1.0, _LENGTH),
+    'g': (1e-3, _MASS), 'gram': (1e-3, _MASS),
+    's': (1.0, _TIME), 'sec': (1.0, _TIME), 'second': (1.0, _TIME),
+    'min': (60.0, _TIME), 'minute': (60.0, _TIME), 'h': (3600.0, _TIME), 'hour': (3600.0, _TIME),
+    'A': (1.0, _CURRENT), 'amp': (1.0, _CURRENT), 'ampere': (1.0, _CURRENT),
+    'K': (1.0, _TEMPERATURE), 'kelvin': (1.0, _TEMPERATURE),
+    'mol': (1.0, _AMOUNT), 'mole': (1.0, _AMOUNT), 'M': (1e3, (-3, 0, 0, 0, 0, 1, 0)),
+    'cd': (1.0, _LUMINOUS), 'candela': (1.0, _LUMINOUS),
+    'Hz': (1.0, _FREQUENCY), 'hertz': (1.0, _FREQUENCY),
+    'W': (1.0, _POWER), 'watt': (1.0, _POWER),
+    'V': (1.0, _VOLTAGE), 'volt': (1.0, _VOLTAGE),
+    'J': (1.0, (2, 1, -2, 0, 0, 0, 0)), 'joule': (1.0, (2, 1, -2, 0, 0, 0, 0)),
+    'N': (1.0, (1, 1, -2, 0, 0, 0, 0)), 'newton': (1.0, (1, 1, -2, 0, 0, 0, 0)),
+    'ohm': (1.0, (2, 1, -3, -2, 0, 0, 0)), 'Ω': (1.0, (2, 1, -3, -2, 0, 0, 0)),
+    'l': (1e-3, _VOLUME), 'L': (1e-3, _VOLUME), 'liter': (1e-3, _VOLUME), 'litre': (1e-3, _VOLUME),
+    'rad': (1.0, _DIMENSIONLESS), 'radian': (1.0, _DIMENSIONLESS),
+    'deg': (3.141592653589793 / 180, _DIMENSIONLESS), 'degree': (3.141592653589793 / 180, _DIMENSIONLESS),
+    '%': (1e-2, _DIMENSIONLESS), 'percent': (1e-2, _DIMENSIONLESS),
+    'count': (1.0, _DIMENSIONLESS), 'unitless': (1.0, _DIMENSIONLESS), 'none': (1.0, _DIMENSIONLESS),
+}
+_UNPREFIXED = {'min', 'h', '%', 'percent', 'count', 'unitless', 'none', 'deg', 'degree'}
+
+_PREFIXES = {
+    'Y': 1e24, 'Z': 1e21, 'E': 1e18, 'P': 1e15, 'T': 1e12, 'G': 1e9, 'M': 1e6, 'k': 1e3, 'h': 1e2, 'da': 1e1,
+    'd': 1e-1, 'c': 1e-2, 'm': 1e-3, 'u': 1e-6, 'µ': 1e-6, 'μ': 1e-6, 'n': 1e-9, 'p': 1e-12, 'f': 1e-15,
+    'a': 1e-18, 'z': 1e-21, 'y': 1e-24,
+}
+_LONG_PREFIXES = {
+    'yotta': 1e24, 'zetta': 1e21, 'exa': 1e18, 'peta': 1e15, 'tera': 1e12, 'giga': 1e9, 'mega': 1e6,
+    'kilo': 1e3, 'hecto': 1e2, 'deca': 1e1, 'deci': 1e-1, 'centi': 1e-2, 'milli': 1e-3, 'micro': 1e-6,
+    'nano': 1e-9, 'pico': 1e-12, 'femto': 1e-15, 'atto': 1e-18, 'zepto': 1e-21, 'yocto': 1e-24,
+}
+
+_TOKEN = re.compile(r'\s*(?:([*/·])\s*)?([^\s*/·^]+)(?:\s*(?:\^|\*\*)\s*([+-]?\d+))?')
+
+
+class UnitError(ValueError):
+    """A unit string that cannot be parsed, or a conversion between incompatible units."""
+
+
+class UnitWarning(UserWarning):
+    """A Measurement unit whose dimension does not fit the field it is assigned to."""
+
+
+class Unit(tuple):
+    """A parsed unit: ``scale`` converts values in this unit to SI base units; ``dimension`` holds
+    the exponents of (m, kg, s, A, K, mol, cd)."""
+
+    __slots__ = ()
+
+    def __new__(cls, scale, dimension):
+        return super().__new__(cls, (float(scale), tuple(dimension)))
+
+    @property
+    def scale(self):
+        return self[0]
+
+    @property
+    def dimension(self):
+        return self[1]
+
+    @property
+    def dimensionless(self):
+        return self.dimension == _DIMENSIONLESS
+
+    def compatible(self, other):
+        return self.dimension == other.dimension
+
+    def factor(self, other):
+        """The factor that converts values in this unit to values in *other*."""
+        if not self.compatible(other):
+            raise UnitError('cannot convert %s to %s' % (format_dimension(self.dimension),
+                                                         format_dimension(other.dimension)))
+        return self.scale / other.scale
+
+    def __repr__(self):
+        return 'Unit(%g, %s)' % (self.scale, format_dimension(self.dimension))
+
+
+def format_dimension(dimension):
+    parts = ['%s^%d' % (base, power) if power != 1 else base
+             for base, power in zip(_BASE_DIMENSIONS, dimension) if power]
+    return ' '.join(parts) or 'dimensionless'
+
+
+def _singular(word):
+    if word.endswith('s') and len(word) > 2 and word[:-1] in _UNITS:
+        return word[:-1]
+    return word
+
+
+def _lookup(word):
+    word = _singular(word)
+    if word in _UNITS:
+        return _UNITS[word]
+    lowered = word.lower()
+    if lowered in _UNITS and len(lowered) > 2:
+        return _UNITS[lowered]
+    for prefix, factor in _LONG_PREFIXES.items():
+        if lowered.startswith(prefix):
+            base = _singular(lowered[len(prefix):])
+            if base in _UNITS and base not in _UNPREFIXED:
+                scale, dimension = _UNITS[base]
+                return factor * scale, dimension
+    for prefix, factor in _PREFIXES.items():
+        if word.startswith(prefix) and len(word) > len(prefix):
+            base = word[len(prefix):]
+            if base in _UNITS and base not in _UNPREFIXED:
+                scale, dimension = _UNITS[base]
+                return factor * scale, dimension
+    raise UnitError('unknown unit %r' % word)
+
+
+@lru_cache(maxsize=None)
+def parse_unit(text):
+    """Parse a unit string into a Unit; raises UnitError if it cannot be parsed."""
+    if not isinstance(text, str):
+        raise UnitError('unit must be a string, got %r' % (text,))
+    text = text.strip()
+    scale, dimension = 1.0, list(_DIMENSIONLESS)
+    position = 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise UnitError('cannot parse unit %r' % text)
+        operator, word, power = match.groups()
+        # words separated by whitespace only are multiplied, e.g. 'm s**-2'
+        if operator is None and position > 0 and not text[position].isspace():
+            raise UnitError('cannot parse unit %r' % text)
+        power = int(power) if power is not None else 1
+        if operator == '/':
+            power = -power
+        if word != '1':
+            unit_scale, unit_dimension = _lookup(word)
+            scale *= unit_scale ** power
+            dimension = [d + u * power for d, u in zip(dimension, unit_dimension)]
+        position = match.end()
+    return Unit(scale, dimension)
+
+
+def conversion_factor(from_unit, to_unit):
+    """Factor that converts values in *from_unit* to *to_unit*; raises UnitError if they are
+    not dimensionally compatible."""
+    return parse_unit(from_unit).factor(parse_unit(to_unit))
+
+
+FREQUENCY = Unit(1.0, _FREQUENCY)
+POWER = Unit(1.0, _POWER)
+VOLTAGE = Unit(1.0, _VOLTAGE)
+VOLUME = Unit(1.0, _VOLUME)
+DIMENSIONLESS = Unit(1.0, _DIMENSIONLESS)
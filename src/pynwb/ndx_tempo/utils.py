@@ -0,0 +1,34 @@
+"""
+Small helpers shared by the ndx-tempo processing modules.
+"""
+import numpy as np
+
+
+def get_processing_module(nwbfile, name, description):
+    """Return the processing module *name* of *nwbfile*, creating it if needed."""
+    if name in nwbfile.processing:
+        return nwbfile.processing[name]
+    return nwbfile.create_processing_module(name=name, description=description)
+
+
+def measurement_values(measurement, dtype=float):
+    """Values of a Measurement multiplied by its conversion factor, as a numpy array.
+
+    Float values come from the Measurement's cache and are read-only.
+    """
+    if measurement is None:
+        return None
+    cached = getattr(measurement, 'values', None)
+    if dtype is float and isinstance(cached, np.ndarray):
+        return cached
+    values = np.asarray(measurement.data[:]).astype(dtype)
+    conversion = getattr(measurement, 'conversion', None)
+    if conversion is not None:
+        values = values * conversion
+    return values
+
+
+def measurement_value(measurement, dtype=float):
+    """First value of a shape (1,) Measurement multiplied by its conversion factor."""
+    values = measurement_values(measurement, dtype)
+    return None if values is None else values.ravel()[0]
@@ -0,0 +1,282 @@
+"""
+Fast validation of the ndx-tempo groups of NWB files from HDF5 metadata alone.
+
+The specification (as exported by ``src/spec/create_extension_spec.py`` and loaded into pynwb's
+namespace catalog) is compiled once per process into plain :py:class:`TypeRules`: the required
+attributes, named datasets with their dtypes and shapes, subgroups, links and typed children of
+every ndx-tempo data type and of the core types they include. Checking a file then only touches
+h5py object headers (dtype, shape, attribute names and attribute dtypes) and never reads dataset
+contents or builds pynwb containers.
+
+Problems are reported with the error classes of :py:mod:`hdmf.validate.errors`, as pynwb.validate
+does, so both can be handled by the same code::
+
+    errors = validate_file('session.nwb')
+    results = validate_files(paths, workers=8)     # {path: [errors]}
+
+Only the objects written with the ndx-tempo namespace (and the typed objects they contain) are
+checked; run pynwb.validate for the rest of the file.
+"""
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import h5py
+from hdmf.spec import RefSpec
+from hdmf.validate.errors import DtypeError, Error, MissingDataType, MissingError, ShapeError
+from pynwb import get_type_map
+
+from .tempo import name as NAMESPACE
+
+TypeRules = namedtuple('TypeRules', ['data_type', 'attributes', 'datasets', 'groups', 'links', 'typed'])
+AttributeRule = namedtuple('AttributeRule', ['name', 'kinds', 'shape', 'required'])
+DatasetRule = namedtuple('DatasetRule', ['name', 'data_type', 'kinds', 'shape', 'required', 'attributes'])
+GroupRule = namedtuple('GroupRule', ['name', 'data_type', 'required', 'rules'])
+LinkRule = namedtuple('LinkRule', ['name', 'required'])
+TypedRule = namedtuple('TypedRule', ['data_type', 'required'])
+
+_OPTIONAL = ('?', '*', 'zero_or_one', 'zero_or_many')
+_NAMESPACES = (NAMESPACE, 'core', 'hdmf-common')
+
+# numpy kinds (plus 'text' and 'reference') accepted for each spec dtype
+_KINDS = {
+    'text': ('text',), 'utf': ('text',), 'utf8': ('text',), 'utf-8': ('text',), 'ascii': ('text',),
+    'bytes': ('text',), 'isodatetime': ('text',), 'datetime': ('text',),
+    'float': ('f',), 'float32': ('f',), 'double': ('f',), 'float64': ('f',),
+    'int': ('i', 'u'), 'int8': ('i', 'u'), 'int16': ('i', 'u'), 'int32': ('i', 'u'), 'int64': ('i', 'u'),
+    'uint': ('u',), 'uint8': ('u',), 'uint16': ('u',), 'uint32': ('u',), 'uint64': ('u',),
+    'short': ('i', 'u'), 'long': ('i', 'u'),
+    'numeric': ('f', 'i', 'u'), 'bool': ('b',),
+}
+
+
+def _kinds(dtype):
+    if dtype is None:
+        return None
+    if isinstance(dtype, RefSpec):
+        return ('reference',)
+    if isinstance(dtype, list):
+        return ('V',)  # compound
+    return _KINDS.get(str(dtype))
+
+
+def _shape(spec):
+    shape = spec.shape
+    if shape is None:
+        return None
+    shapes = shape if shape and isinstance(shape[0], (list, tuple)) else [shape]
+    return tuple(tuple(shape) for shape in shapes)
+
+
+def _required(spec):
+    return spec.quantity not in _OPTIONAL
+
+
+def _attribute_rules(spec):
+    return tuple(AttributeRule(attribute.name, _kinds(attribute.dtype), _shape(attribute), bool(attribute.required))
+                 for attribute in spec.attributes)
+
+
+def _compile(spec, data_type=None):
+    datasets, groups, links, typed = [], [], [], []
+    for dataset in getattr(spec, 'datasets', ()):
+        inc = dataset.data_type_def or dataset.data_type_inc
+        if dataset.name is None:
+            typed.append(TypedRule(inc, _required(dataset)))
+        else:
+            datasets.append(DatasetRule(dataset.name, inc, _kinds(dataset.dtype), _shape(dataset),
+                                        _required(dataset), _attribute_rules(dataset)))
+    for group in getattr(spec, 'groups', ()):
+        inc = group.data_type_def or group.data_type_inc
+        if group.name is None:
+            typed.append(TypedRule(inc, _required(group)))
+        else:
+            groups.append(GroupRule(group.name, inc, _required(group), None if inc else _compile(group)))
+    for link in getattr(spec, 'links', ()):
+        if link.name is not None:
+            links.append(LinkRule(link.name, _required(link)))
+    return TypeRules(data_type, _attribute_rules(spec), tuple(datasets), tuple(groups), tuple(links),
+                     tuple(typed))
+
+
+def _catalog():
+    return get_type_map().namespace_catalog
+
+
+@lru_cache(maxsize=None)
+def type_rules(data_type):
+    """The compiled TypeRules of *data_type*, with the fields it inherits; None for unknown types."""
+    catalog = _catalog()
+    for namespace in _NAMESPACES:
+        try:
+            spec = catalog.get_spec(namespace, data_type)
+        except (KeyError, ValueError):
+            continue
+        return _compile(spec, data_type)
+    return None
+
+
+@lru_cache(maxsize=None)
+def type_hierarchy(data_type):
+    """*data_type* and the types it extends, most specific first."""
+    catalog = _catalog()
+    for namespace in _NAMESPACES:
+        try:
+            return tuple(catalog.get_hierarchy(namespace, data_type))
+        except (KeyError, ValueError):
+            continue
+    return (data_type,)
+
+
+def compile_rules():
+    """Compile the rules of every ndx-tempo data type, e.g. before forking worker processes."""
+    return {data_type: type_rules(data_type)
+            for data_type in _catalog().get_namespace(NAMESPACE).get_registered_types()}
+
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def _neurodata_type(obj):
+    return _text(obj.attrs.get('neurodata_type'))
+
+
+def _kind(dtype):
+    if h5py.check_dtype(vlen=dtype) in (str, bytes) or dtype.kind == 'S':
+        return 'text'
+    if h5py.check_dtype(ref=dtype) is not None:
+        return 'reference'
+    return dtype.kind
+
+
+def _shape_matches(shape, expected):
+    return any(len(shape) == len(option) and all(e is None or e == s for e, s in zip(option, shape))
+               for option in expected)
+
+
+def _check_value(errors, name, location, dtype, shape, kinds, expected_shape):
+    if kinds is not None and _kind(dtype) not in kinds:
+        errors.append(DtypeError(name, '/'.join(kinds), str(dtype), location=location))
+    if expected_shape is not None and shape is not None and not _shape_matches(shape, expected_shape):
+        errors.append(ShapeError(name, list(expected_shape[0]), list(shape), location=location))
+
+
+def _check_attributes(obj, rules, prefix, errors):
+    for rule in rules:
+        name = '%s/%s' % (prefix, rule.name)
+        if rule.name not in obj.attrs:
+            if rule.required:
+                errors.append(MissingError(name, location=obj.name))
+            continue
+        attribute = obj.attrs.get_id(rule.name)  # header only, the value is not read
+        shape = attribute.shape
+        _check_value(errors, name, obj.name, attribute.dtype, None if not shape else shape, rule.kinds,
+                     rule.shape if shape else None)
+
+
+def _matches_type(obj, data_type):
+    child_type = _neurodata_type(obj)
+    return child_type is not None and data_type in type_hierarchy(child_type)
+
+
+def _check_typed(obj, data_type, errors):
+    if _text(obj.attrs.get('namespace')) == NAMESPACE:
+        return  # visited on its own by validate_file
+    rules = type_rules(data_type)
+    if rules is not None:
+        _check(obj, rules, data_type, errors)
+
+
+def _check(obj, rules, prefix, errors):
+    _check_attributes(obj, rules.attributes, prefix, errors)
+    if not isinstance(obj, h5py.Group):
+        return
+    for rule in rules.datasets:
+        name = '%s/%s' % (prefix, rule.name)
+        dataset = obj.get(rule.name)
+        if dataset is None:
+            if rule.required:
+                errors.append(MissingError(name, location=obj.name))
+            continue
+        if isinstance(dataset, h5py.Dataset):
+            _check_value(errors, name, obj.name, dataset.dtype, dataset.shape, rule.kinds, rule.shape)
+        attributes = rule.attributes
+        if rule.data_type is not None:
+            data_type = _neurodata_type(dataset) or rule.data_type
+            # attributes of the included type are checked once, with the rest of its rules
+            included = type_rules(data_type)
+            inherited = {attribute.name for attribute in included.attributes} if included is not None else set()
+            attributes = tuple(attribute for attribute in attributes if attribute.name not in inherited)
+            _check_typed(dataset, data_type, errors)
+        _check_attributes(dataset, attributes, name, errors)
+    for rule in rules.groups:
+        name = '%s/%s' % (prefix, rule.name)
+        group = obj.get(rule.name)
+        if group is None:
+            if rule.required:
+                errors.append(MissingError(name, location=obj.name))
+        elif rule.rules is not None:
+            _check(group, rule.rules, name, errors)
+        else:
+            _check_typed(group, _neurodata_type(group) or rule.data_type, errors)
+    for rule in rules.links:
+        if rule.required and obj.get(rule.name, getlink=True) is None:
+            errors.append(MissingError('%s/%s' % (prefix, rule.name), location=obj.name))
+    named = {rule.name for rule in rules.datasets + rules.groups}
+    for rule in rules.typed:
+        children = [child for key, child in obj.items() if key not in named and _matches_type(child, rule.data_type)]
+        if rule.required and not children:
+            errors.append(MissingDataType(prefix, rule.data_type, location=obj.name))
+        for child in children:
+            _check_typed(child, _neurodata_type(child), errors)
+
+
+def validate_file(path):
+    """Check the ndx-tempo objects of the NWB file at *path*; returns a list of hdmf validation errors."""
+    errors = []
+
+    def visit(_, obj):
+        if _text(obj.attrs.get('namespace')) != NAMESPACE:
+            return
+        data_type = _neurodata_type(obj)
+        rules = type_rules(data_type)
+        if rules is not None:
+            _check(obj, rules, data_type, errors)
+
+    with h5py.File(path, 'r') as f:
+        f.visititems(visit)
+    return errors
+
+
+def _validate(path):
+    # runs in worker processes: return picklable results and never raise
+    try:
+        return path, validate_file(path), None
+    except Exception as error:
+        return path, None, '%s: %s' % (type(error).__name__, error)
+
+
+def validate_files(paths, workers=None):
+    """
+    Validate many files in parallel.
+
+    :param workers: number of processes; None uses os.cpu_count(), 1 validates in this process
+    :return: dict mapping each path to its list of errors; files that cannot be read map to a
+             one-element list with an hdmf Error describing why
+    """
+    paths = list(paths)
+    compile_rules()
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(workers) if workers > 1 and len(paths) > 1 else None
+    try:
+        if pool is None:
+            results = map(_validate, paths)
+        else:
+            results = pool.map(_validate, paths, chunksize=max(1, len(paths) // (4 * workers)))
+        return {path: errors if failure is None else [Error(os.path.basename(path), failure, location=path)]
+                for path, errors, failure in results}
+    finally:
+        if pool is not None:
+            pool.shutdown()
@@ -0,0 +1,103 @@
+"""
+Zero-copy access to TEMPO datasets in files opened with ``NWBHDF5IO(..., 'r')``.
+
+``np.array(series.data)`` copies a whole dataset into memory. :py:func:`data_view` instead
+returns a read-only ``numpy.memmap`` when the dataset is stored contiguously and unfiltered,
+so the operating system pages in only what is touched, and a :py:class:`ChunkedDatasetView`
+otherwise, which reads only the chunks that a slice intersects.
+"""
+import h5py
+import numpy as np
+from hdmf.data_utils import DataIO
+
+# drivers that store the file as a single regular file on disk
+_MAPPABLE_DRIVERS = ('sec2', 'stdio')
+
+
+def memmap_dataset(dataset):
+    """Return a read-only numpy.memmap over *dataset*, or None if it cannot be memory-mapped
+    (chunked, filtered, not yet allocated, variable-length, external or not in a plain file)."""
+    if dataset.chunks is not None or dataset.compression is not None or dataset.external:
+        return None
+    if dataset.file.driver not in _MAPPABLE_DRIVERS:
+        return None
+    if dataset.dtype.hasobject or h5py.check_dtype(vlen=dataset.dtype) is not None:
+        return None
+    offset = dataset.id.get_offset()
+    if offset is None:
+        return None
+    return np.memmap(dataset.file.filename, mode='r', dtype=dataset.dtype, shape=dataset.shape, offset=offset)
+
+
+class ChunkedDatasetView:
+    """
+    Lazy, sliceable view of a chunked h5py dataset.
+
+    Slicing reads only the chunks the selection intersects; :py:meth:`iter_blocks` walks the
+    first axis in whole chunks so every chunk is decompressed exactly once.
+    """
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    @property
+    def shape(self):
+        return self.dataset.shape
+
+    @property
+    def dtype(self):
+        return self.dataset.dtype
+
+    @property
+    def ndim(self):
+        return self.dataset.ndim
+
+    @property
+    def chunks(self):
+        return self.dataset.chunks
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, selection):
+        return self.dataset[selection]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.dataset[()], dtype=dtype)
+
+    def iter_blocks(self, chunks_per_block=1):
+        """Yield ``(start, array)`` for consecutive blocks of whole chunks along the first axis."""
+        rows = (self.chunks[0] if self.chunks else len(self)) * chunks_per_block
+        for start in range(0, len(self), rows):
+            yield start, self.dataset[start:start + rows]
+
+    def __repr__(self):
+        return '<ChunkedDatasetView %s %s chunks=%s>' % (self.shape, self.dtype, self.chunks)
+
+
+def data_view(obj):
+    """
+    Zero-copy view of the data of a container (anything with ``.data``), an h5py dataset, a
+    DataIO or an array.
+
+    :return: a numpy.memmap for contiguous unfiltered datasets, a ChunkedDatasetView for other
+             datasets, and in-memory data unchanged
+    """
+    data = obj if isinstance(obj, (np.ndarray, h5py.Dataset, DataIO)) else getattr(obj, 'data', obj)
+    while isinstance(data, DataIO):
+        data = data.data
+    if isinstance(data, h5py.Dataset):
+        mapped = memmap_dataset(data)
+        return mapped if mapped is not None else ChunkedDatasetView(data)
+    return data
+
+
+def series_values(series):
+    """Sliceable values of a series: a data_view of its data, decoded to physical units if it is a
+    TempoSeries storing integer counts (see ndx_tempo.counts)."""
+    data = data_view(series)
+    if isinstance(data, (list, tuple)):
+        data = np.asarray(data)
+    if np.dtype(data.dtype).kind in 'iu' and getattr(series, 'channels', None) is not None:
+        return series.decoded()
+    return data
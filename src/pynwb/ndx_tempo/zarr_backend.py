@@ -0,0 +1,170 @@
+"""
+Zarr storage of ndx-tempo files, with parallel writes of TEMPO signals.
+
+All ndx-tempo types round-trip through hdmf-zarr's ``NWBZarrIO`` like through ``NWBHDF5IO``;
+:py:func:`write_zarr` and :py:func:`read_zarr` are thin helpers around it. Unlike an HDF5 file, a
+Zarr array stores every chunk as its own object, so several processes can write the same array
+at once as long as no chunk is written by two of them.
+
+Parallel-write mode: write the file once with the signal data allocated but empty
+(:py:func:`allocate`), then let every worker fill a disjoint set of whole chunks, e.g. one
+channel group each, with :py:func:`parallel_write`::
+
+    series = TempoSeries(name='lockin_signals', rate=2000., channels=region,
+                         data=allocate((num_samples, 64), 'float32', chunks=(20000, 16)))
+    nwbfile.add_acquisition(series)
+    write_zarr(nwbfile, 'session.nwb.zarr')
+    parallel_write('session.nwb.zarr', 'acquisition/lockin_signals/data', demodulate_group,
+                   tasks=column_groups((num_samples, 64), (20000, 16)), workers=4)
+
+``demodulate_group(task)`` runs in a worker process and yields ``(row, column, block)`` tuples;
+every block must start on a chunk boundary and cover whole chunks (or end at the edge of the
+array), which :py:func:`write_block` checks, since two workers writing parts of the same chunk
+would overwrite each other's data.
+
+hdmf-zarr and zarr are optional dependencies (``pip install ndx-tempo[zarr]``).
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from hdmf.data_utils import AbstractDataChunkIterator
+
+
+class EmptyData(AbstractDataChunkIterator):
+    """
+    Data of a known shape and dtype that yields no chunks: the writer allocates the dataset
+    (filled with its fill value) and the values are written into it later.
+    """
+
+    def __init__(self, shape, dtype):
+        self.__shape = tuple(int(size) for size in shape)
+        self.__dtype = np.dtype(dtype)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        raise StopIteration
+
+    def recommended_chunk_shape(self):
+        return None
+
+    def recommended_data_shape(self):
+        return self.__shape
+
+    @property
+    def dtype(self):
+        return self.__dtype
+
+    @property
+    def maxshape(self):
+        return self.__shape
+
+
+def allocate(shape, dtype, chunks, fillvalue=0, **kwargs):
+    """
+    Data for a TempoSeries that allocates a Zarr array of *shape* and *chunks* without writing it,
+    to be filled by parallel_write.
+
+    :param kwargs: passed on to hdmf_zarr.ZarrDataIO, e.g. compressor
+    """
+    from hdmf_zarr import ZarrDataIO
+    return ZarrDataIO(data=EmptyData(shape, dtype), chunks=tuple(chunks), fillvalue=fillvalue, **kwargs)
+
+
+def write_zarr(nwbfile, path):
+    """Write *nwbfile* to the Zarr store *path*."""
+    from hdmf_zarr.nwb import NWBZarrIO
+    with NWBZarrIO(path, mode='w') as io:
+        io.write(nwbfile)
+
+
+def read_zarr(path, mode='r'):
+    """An open NWBZarrIO on the Zarr store *path*; use it as a context manager and call read()."""
+    from hdmf_zarr.nwb import NWBZarrIO
+    return NWBZarrIO(path, mode=mode)
+
+
+def open_array(path, name, mode='r+'):
+    """The zarr array *name* (e.g. 'acquisition/lockin_signals/data') of the store *path*."""
+    import zarr
+    return zarr.open_array(os.path.join(path, name), mode=mode)
+
+
+def column_groups(shape, chunks, columns_per_group=None):
+    """
+    Split the columns of an array of *shape* and *chunks* into groups of whole chunks.
+
+    :param columns_per_group: columns of a group, one chunk of columns by default; rounded up to whole chunks
+    :return: list of (start, stop) column ranges
+    """
+    width = chunks[1]
+    step = -(-int(columns_per_group or width) // width) * width
+    return [(start, min(start + step, shape[1])) for start in range(0, shape[1], step)]
+
+
+def _aligned(start, stop, chunk, size):
+    return start % chunk == 0 and (stop % chunk == 0 or stop == size)
+
+
+def write_block(array, row, column, block):
+    """
+    Write *block* to *array* at (*row*, *column*), which must cover whole chunks of the array.
+
+    For a 1D array *column* must be 0 and *block* 1D; a 1D *block* is one column of a 2D array.
+    """
+    block = np.asarray(block)
+    if len(array.shape) == 1:
+        stop_row = row + len(block)
+        if column != 0 or block.ndim != 1:
+            raise ValueError('a block of a 1D array must be 1D and start at column 0')
+        if not _aligned(row, stop_row, array.chunks[0], array.shape[0]):
+            raise ValueError('block [%d:%d] does not cover whole chunks of shape %s' % (row, stop_row, array.chunks))
+        array[row:stop_row] = block
+        return block.nbytes
+    if block.ndim == 1:
+        block = block[:, np.newaxis]
+    stop_row, stop_column = row + block.shape[0], column + block.shape[1]
+    if not (_aligned(row, stop_row, array.chunks[0], array.shape[0]) and
+            _aligned(column, stop_column, array.chunks[1], array.shape[1])):
+        raise ValueError('block [%d:%d, %d:%d] does not cover whole chunks of shape %s'
+                         % (row, stop_row, column, stop_column, array.chunks))
+    array[row:stop_row, column:stop_column] = block
+    return block.nbytes
+
+
+def _write_task(arguments):
+    # runs in worker processes: return picklable results and never raise
+    path, name, function, task = arguments
+    try:
+        array = open_array(path, name)
+        written = sum(write_block(array, row, column, block) for row, column, block in function(task))
+        return task, written, None
+    except Exception as error:
+        return task, 0, '%s: %s' % (type(error).__name__, error)
+
+
+def parallel_write(path, name, function, tasks, workers=None):
+    """
+    Fill the array *name* of the Zarr store *path* from several processes.
+
+    :param function: picklable (module-level) callable taking a task and yielding
+                     ``(row, column, block)``; blocks of different tasks must not share chunks
+    :param tasks: picklable task descriptions, e.g. column ranges from column_groups
+    :param workers: number of processes; None uses os.cpu_count(), 1 writes in this process
+    :return: number of bytes written
+    """
+    tasks = list(tasks)
+    arguments = [(path, name, function, task) for task in tasks]
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(min(workers, len(tasks))) if workers > 1 and len(tasks) > 1 else None
+    try:
+        results = list(map(_write_task, arguments) if pool is None else pool.map(_write_task, arguments))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    failures = ['%s: %s' % (task, failure) for task, _, failure in results if failure is not None]
+    if failures:
+        raise RuntimeError('%d of %d write tasks failed:\n%s' % (len(failures), len(tasks), '\n'.join(failures)))
+    return sum(written for _, written, _ in results)
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from ndx_tempo.acquisition import AcquisitionBridge, AcquisitionStats, feed_from_socket
+from ndx_tempo.testing import serve_fake_amplifier, synthetic_signals
+
+
+def test_bridge_from_fake_amplifier():
+    data = synthetic_signals(350, 4)
+    blocks = np.array_split(data, 50)
+    written = []
+
+    async def run():
+        server = await serve_fake_amplifier(blocks)
+        host, port = server.sockets[0].getsockname()[:2]
+        try:
+            async with AcquisitionBridge(written.append, num_channels=4, chunk_rows=32) as bridge:
+                await feed_from_socket(bridge, host, port)
+        finally:
+            server.close()
+            await server.wait_closed()
+        return bridge.stats
+
+    stats = asyncio.run(run())
+    assert_array_equal(np.concatenate(written), data)
+    assert all(len(block) % 32 == 0 for block in written[:-1])
+    assert stats.packets_received == 50 and stats.rows_written == 350
+    assert stats.rows_dropped == 0
+
+
+def test_bridge_drops_and_backpressure():
+    def slow_write(block):
+        time.sleep(0.02)
+
+    async def run(drop):
+        async with AcquisitionBridge(slow_write, num_channels=2, chunk_rows=1, maxsize=2, drop=drop) as bridge:
+            for _ in range(20):
+                await bridge.put(np.ones((4, 2)))
+        return bridge.stats
+
+    stats = asyncio.run(run(drop=True))
+    assert stats.rows_dropped > 0
+    assert stats.rows_written + stats.rows_dropped == stats.rows_received == 80
+
+    stats = asyncio.run(run(drop=False))
+    assert stats.rows_dropped == 0 and stats.rows_written == 80
+    assert stats.backpressure_waits > 0 and stats.backpressure_seconds > 0
+
+
+def test_stats_are_updated_on_the_event_loop_thread():
+    threads = set()
+
+    class Stats(AcquisitionStats):
+        def __setattr__(self, name, value):
+            threads.add(threading.get_ident())
+            super().__setattr__(name, value)
+
+    async def run():
+        bridge = AcquisitionBridge(lambda block: time.sleep(0.001), num_channels=2, chunk_rows=4)
+        async with bridge:
+            bridge.stats = Stats()
+            threads.clear()
+            for _ in range(20):
+                await bridge.put(np.ones((3, 2)))
+        return bridge.stats
+
+    stats = asyncio.run(run())
+    assert stats.rows_written == 60 and stats.writes > 1
+    assert threads == {threading.get_ident()}
+
+
+def test_put_raises_when_the_writer_died():
+    def failing_write(block):
+        time.sleep(0.1)  # fail while put is waiting for room
+        raise OSError('disk full')
+
+    async def fill(bridge):
+        for _ in range(20):
+            await bridge.put(np.ones((4, 2)))
+
+    async def run():
+        bridge = AcquisitionBridge(failing_write, num_channels=2, chunk_rows=1, maxsize=1)
+        await bridge.start()
+        with pytest.raises(OSError, match='disk full'):
+            await asyncio.wait_for(fill(bridge), timeout=5)
+        with pytest.raises(OSError, match='disk full'):
+            await bridge.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,40 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+from pynwb import NWBHDF5IO
+
+from ndx_tempo import LaserLine, Measurement, TempoSeries
+from ndx_tempo.append import AppendSession, appendable_data, open_reader, tail
+from ndx_tempo.testing import mock_nwbfile, mock_tempo, synthetic_signals
+
+
+def test_append_session(tmp_path):
+    path = str(tmp_path / 'live.nwb')
+    data = synthetic_signals(1000, 3)
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=3)
+    nwbfile.add_device(tempo)
+    nwbfile.add_acquisition(TempoSeries(name='signals', rate=1000.0, data=appendable_data(3, chunk_rows=128),
+                                        channels=tempo.lockinamp_devices.children[0].create_channel_region()))
+
+    with AppendSession.create(path, nwbfile, flush_interval=None, flush_rows=300) as session:
+        reader = open_reader(path)
+        try:
+            for start in range(0, 600, 100):
+                session.append('signals', data[start:start + 100])
+            assert session.flushes == 2
+            assert_array_equal(tail(reader['/acquisition/signals/data']), data[:600])
+        finally:
+            reader.close()
+
+        with session.reconfigure() as nwb:
+            assert nwb.acquisition['signals'].data.file.libver[0] != 'earliest'
+            nwb.devices['tempo'].laserline_devices.add_laserline(LaserLine(
+                name='laserline_new', power=Measurement(name='power', description='power', unit='watts',
+                                                        data=[2e-3])))
+        session.append('signals', data[600:])
+
+    with NWBHDF5IO(path, 'r') as io:
+        nwb = io.read()
+        assert_array_equal(nwb.acquisition['signals'].data[:], data)
+        assert 'laserline_new' in nwb.devices['tempo'].laserline_devices.laser_lines
+        assert np.asarray(nwb.devices['tempo'].laserline_devices['laserline_new'].power.data)[0] == 2e-3
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+from pynwb import NWBHDF5IO
+
+from ndx_tempo import TEMPO
+from ndx_tempo.testing import mock_nwbfile
+
+CONFIG = {
+    'name': 'tempo_rig',
+    'no_of_modules': 3,
+    'units': {'power': 'mW'},
+    'laserlines': [{'name': 'laser470', 'reference': 'blue', 'analog_modulation_frequency': 1000, 'power': 2.0},
+                   {'name': 'laser560', 'analog_modulation_frequency': 2500,
+                    'power': {'value': 0.003, 'unit': 'watts'}}],
+    'photodetectors': [{'name': 'pd0', 'gain': 1.5, 'bandwidth': {'value': 100, 'unit': 'Hz', 'conversion': 1000}}],
+    'lockinamps': [{'name': 'lockinamp', 'demodulation_filter_order': 4, 'demod_bandwidth': 50,
+                    'channels': {'channel_name': ['a', 'b'], 'offset': [0.0, 0.1], 'gain': [1.0, 2.0]}}],
+}
+
+ROWS = [
+    {'kind': 'tempo', 'name': 'tempo_rig', 'no_of_modules': 3},
+    {'kind': 'laserline', 'name': 'laser470', 'analog_modulation_frequency': 1000, 'power': 0.002},
+    {'kind': 'photodetector', 'name': 'pd0', 'gain': 1.5, 'bandwidth': 1e5},
+    {'kind': 'lockinamp', 'name': 'lockinamp', 'demodulation_filter_order': 4, 'demod_bandwidth': 50},
+    {'kind': 'channel', 'lockinamp': 'lockinamp', 'channel_name': 'a', 'offset': 0.0, 'gain': 1.0},
+    {'kind': 'channel', 'lockinamp': 'lockinamp', 'channel_name': 'b', 'offset': 0.1, 'gain': 2.0},
+]
+
+
+def test_from_config_builds_device_tree():
+    tempo = TEMPO.from_config(CONFIG)
+    laserlines = tempo.laserline_devices.children
+    assert [laserline.name for laserline in laserlines] == ['laser470', 'laser560']
+    assert laserlines[0].power.unit == 'mW'
+    assert laserlines[1].power.unit == 'watts'
+    assert_array_equal(laserlines[0].analog_modulation_frequency.data, ['1000'])
+    photodetector = tempo.photodetector_devices.children[0]
+    assert photodetector.bandwidth.conversion == 1000.0
+    lockinamp = tempo.lockinamp_devices.children[0]
+    assert lockinamp.demodulation_filter_order == 4.0
+    assert_array_equal(lockinamp['offset'].data, [0.0, 0.1])
+    assert lockinamp['offset'].unit == 'volts'
+
+
+def test_to_config_roundtrip(tmp_path):
+    tempo = TEMPO.from_config(CONFIG)
+    nwbfile = mock_nwbfile()
+    nwbfile.add_device(tempo)
+    path = str(tmp_path / 'config.nwb')
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+    with NWBHDF5IO(path, 'r') as io:
+        config = io.read().devices['tempo_rig'].to_config()
+    assert config == tempo.to_config()
+    assert TEMPO.from_config(config).to_config() == config
+
+
+def test_rows_and_yaml_give_the_same_device(tmp_path):
+    from_rows = TEMPO.from_config(ROWS).to_config()
+    path = tmp_path / 'rig.yaml'
+    path.write_text(
+        'name: tempo_rig\nno_of_modules: 3\n'
+        'laserlines:\n  - {name: laser470, analog_modulation_frequency: 1000, power: 0.002}\n'
+        'photodetectors:\n  - {name: pd0, gain: 1.5, bandwidth: 100000.0}\n'
+        'lockinamps:\n  - name: lockinamp\n    demodulation_filter_order: 4\n    demod_bandwidth: 50\n'
+        '    channels: {channel_name: [a, b], offset: [0.0, 0.1], gain: [1.0, 2.0]}\n')
+    assert TEMPO.from_config(str(path)).to_config() == from_rows
+    assert np.isclose(from_rows['laserlines'][0]['power']['value'], 0.002)
+
+
+def test_invalid_config_reports_all_errors():
+    config = {'laserlines': [{'name': 'a'}, {'name': 'a'}, {'power': 'x'}],
+              'photodetectors': ['pd0'],
+              'lockinamps': [{'name': 'l', 'channels': {'channel_name': ['a'], 'offset': [0.0, 1.0]}}],
+              'bogus': 1}
+    with pytest.raises(ValueError) as excinfo:
+        TEMPO.from_config(config)
+    message = str(excinfo.value)
+    for expected in ('unknown keys: bogus', "duplicate name 'a'", 'laserlines[2]: missing name',
+                     "laserlines[2].power: expected a number, got 'x'", "photodetectors[0]: expected a mapping",
+                     'columns have different lengths'):
+        assert expected in message
+
+
+def test_measurement_strings():
+    config = {'name': 'tempo', 'laserlines': [{'name': 'a', 'power': 'x'}]}
+    with pytest.raises(ValueError, match="laserlines.0..power: expected a number, got 'x'"):
+        TEMPO.from_config(config)
+    line = {'name': 'a', 'power': '2e-3', 'analog_modulation_frequency': '1000'}
+    tempo = TEMPO.from_config({'name': 'tempo', 'laserlines': [line]})
+    line = tempo.laserline_devices['a']
+    assert line.power.values[0] == 2e-3
+    assert line.analog_modulation_frequency.data == ['1000']
+
+
+def test_gain_given_as_measurement_is_rejected():
+    config = {'lockinamps': [{'name': 'l', 'channels': {'channel_name': ['a'], 'offset': {'value': [0.0], 'unit': 'mV'},
+                                                        'gain': {'value': [2.0], 'unit': 'dB'}}}]}
+    with pytest.raises(ValueError, match='channels.gain: expected a list of numbers, got a dict'):
+        TEMPO.from_config(config)
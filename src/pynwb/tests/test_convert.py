@@ -0,0 +1,82 @@
+import json
+
+import numpy as np
+from numpy.testing import assert_allclose
+from pynwb import NWBHDF5IO
+
+from ndx_tempo.convert import convert, load_manifest, main
+
+CONFIG = {
+    'name': 'tempo',
+    'laserlines': [{'name': 'laser470', 'analog_modulation_frequency': 1000, 'power': 0.002}],
+    'photodetectors': [{'name': 'pd0', 'gain': 1.0, 'bandwidth': 1e5}],
+    'lockinamps': [{'name': 'lockinamp', 'demodulation_filter_order': 4, 'demod_bandwidth': 50,
+                    'channels': {'channel_name': ['a', 'b', 'c'], 'offset': [0.0, 0.1, 0.0],
+                                 'gain': [1.0, 2.0, 1.0]}}],
+}
+
+
+def _manifest(tmp_path, num_sessions=2):
+    sessions = []
+    for i in range(num_sessions):
+        counts = np.random.RandomState(i).randint(-1000, 1000, size=(5000, 3)).astype('int16')
+        counts.tofile(str(tmp_path / ('session%d.bin' % i)))
+        sessions.append({'output': 'nwb/session%d.nwb' % i, 'signals': 'session%d.bin' % i,
+                         'session_start_time': '2019-06-03T10:15:00-04:00'})
+    manifest = {'defaults': {'rate': 2000.0, 'dtype': 'int16', 'conversion': 1e-3, 'config': CONFIG},
+                'sessions': sessions}
+    path = str(tmp_path / 'manifest.json')
+    with open(path, 'w') as f:
+        json.dump(manifest, f)
+    return path
+
+
+def test_convert_and_skip(tmp_path):
+    path = _manifest(tmp_path)
+    sessions = load_manifest(path)
+    assert sessions[0]['output'] == str(tmp_path / 'nwb' / 'session0.nwb')
+
+    ledger = str(tmp_path / 'ledger.json')
+    results = convert(sessions, ledger=ledger, workers=2, block_rows=1000)
+    assert [result.status for result in results] == ['converted', 'converted']
+    assert results[0].samples == 5000 and results[0].input_bytes == 5000 * 3 * 2
+
+    with NWBHDF5IO(sessions[1]['output'], 'r') as io:
+        nwbfile = io.read()
+        series = nwbfile.acquisition['lockin_signals']
+        assert series.data.dtype == np.int16
+        counts = np.fromfile(str(tmp_path / 'session1.bin'), dtype='int16').reshape(-1, 3)
+        assert_allclose(series.decoded()[:], counts * 1e-3 * np.array([1.0, 2.0, 1.0]) + [0.0, 0.1, 0.0])
+        assert nwbfile.identifier == 'session1'
+
+    results = convert(sessions, ledger=ledger)
+    assert [result.status for result in results] == ['skipped', 'skipped']
+
+    np.zeros((10, 3), dtype='int16').tofile(sessions[0]['signals'])
+    results = convert(sessions, ledger=ledger)
+    assert [result.status for result in results] == ['converted', 'skipped']
+
+
+def test_main_reports_failures(tmp_path, capsys):
+    path = _manifest(tmp_path, num_sessions=1)
+    with open(str(tmp_path / 'session0.bin'), 'ab') as f:
+        f.write(b'\0\0')  # no longer a whole number of rows
+    report = str(tmp_path / 'report.csv')
+    assert main([path, '--workers', '1', '--report', report]) == 1
+    assert 'FAILED' in capsys.readouterr().out
+    with open(report) as f:
+        assert 'failed' in f.read()
+
+
+def test_null_conversion_means_unscaled(tmp_path):
+    path = _manifest(tmp_path, num_sessions=1)
+    signals = np.random.RandomState(0).randn(5000, 3)
+    signals.tofile(str(tmp_path / 'session0.bin'))
+    sessions = load_manifest(path)
+    sessions[0].update(dtype='float64', conversion=None)
+    results = convert(sessions, ledger=str(tmp_path / 'ledger.json'))
+    assert [result.status for result in results] == ['converted'], results[0].error
+    with NWBHDF5IO(sessions[0]['output'], 'r') as io:
+        series = io.read().acquisition['lockin_signals']
+        assert series.conversion == 1.0
+        assert_allclose(series.data[:], signals)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose, assert_array_equal
+from pynwb import NWBHDF5IO
+
+from ndx_tempo.counts import counts_series, decode_counts, encode_counts
+from ndx_tempo.testing import mock_nwbfile, mock_tempo
+
+
+def test_encode_decode():
+    counts = np.random.RandomState(0).randint(-2 ** 15, 2 ** 15, size=(1000, 3)).astype(np.int16)
+    gain, offset, conversion = np.array([1.0, 2.0, 0.5]), np.array([0.0, 0.1, -0.2]), 10.0 / 2 ** 15
+    values = decode_counts(counts, gain, offset, conversion)
+    assert_array_equal(encode_counts(values, gain, offset, conversion), counts)
+    with pytest.raises(ValueError):
+        encode_counts(values + conversion / 3, gain, offset, conversion)
+    with pytest.raises(ValueError):
+        encode_counts(values * 4, gain, offset, conversion)
+
+
+def test_counts_series_roundtrip(tmp_path):
+    path = str(tmp_path / 'counts.nwb')
+    counts = np.random.RandomState(1).randint(-500, 500, size=(4000, 4)).astype(np.int16)
+    conversion = 10.0 / 2 ** 15
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=4)
+    nwbfile.add_device(tempo)
+    lockinamp = tempo.lockinamp_devices.children[0]
+    lockinamp.add_rows(channel_name=['extra'], offset=[0.5], gain=[3.0])
+    nwbfile.add_acquisition(counts_series('counts', counts, lockinamp, conversion, region=[0, 1, 2, 4],
+                                          rate=2000.0))
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+    gain = np.array([1.0, 1.0, 1.0, 3.0])
+    offset = np.array([0.0, 0.0, 0.0, 0.5])
+    with NWBHDF5IO(path, 'r') as io:
+        series = io.read().acquisition['counts']
+        assert series.data.dtype == np.int16
+        decoded = series.decoded()
+        assert decoded.shape == (4000, 4)
+        assert_allclose(decoded[100:200], offset + gain * conversion * counts[100:200])
+        assert_allclose(decoded[5:10, 3], 0.5 + 3.0 * conversion * counts[5:10, 3])
+        assert_allclose(np.asarray(decoded), decode_counts(counts, gain, offset, conversion))
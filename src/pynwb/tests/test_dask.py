@@ -0,0 +1,80 @@
+import pickle
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+from pynwb import H5DataIO, NWBHDF5IO
+
+from ndx_tempo import TempoSeries
+from ndx_tempo.counts import counts_series
+from ndx_tempo.lazy import HDF5Source, aligned_chunks, close_files
+from ndx_tempo.testing import mock_nwbfile, mock_tempo, synthetic_signals
+
+pytest.importorskip('dask.array')
+
+
+def test_aligned_chunks():
+    assert aligned_chunks((100000, 8), 8, chunks=(1000, 8), chunk_bytes=1 << 20) == (16000, 8)
+    assert aligned_chunks((100000, 8), 8, chunks=(30000, 4), chunk_bytes=1 << 20) == (30000, 8)
+    assert aligned_chunks((500, 8), 8, chunk_bytes=1 << 20) == (500, 8)
+
+
+def _write(path, data, counts=None):
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=data.shape[1])
+    nwbfile.add_device(tempo)
+    lockinamp = tempo.lockinamp_devices.children[0]
+    nwbfile.add_acquisition(TempoSeries(name='signals', data=H5DataIO(data, chunks=(1000, data.shape[1])),
+                                        rate=1000.0, starting_time=2.0, channels=lockinamp.create_channel_region()))
+    if counts is not None:
+        nwbfile.add_acquisition(counts_series('counts', counts, lockinamp, conversion=1e-3, rate=1000.0))
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+
+def test_to_dask_reads_whole_hdf5_chunks(tmp_path):
+    from ndx_tempo.lazy import to_dask
+    path = str(tmp_path / 'lazy.nwb')
+    data = synthetic_signals(25000, 4, rate=1000.0)
+    _write(path, data)
+    with NWBHDF5IO(path, 'r') as io:
+        array = to_dask(io.read().acquisition['signals'], chunk_bytes=5000 * 4 * 8)
+        assert array.chunks[0] == (5000,) * 5
+        assert all(size % 1000 == 0 for size in array.chunks[0][:-1])
+        assert_allclose(array[3000:7000].compute(), data[3000:7000])
+        assert_allclose(array.mean(axis=0).compute(scheduler='processes', num_workers=2), data.mean(axis=0))
+    close_files()
+
+
+def test_source_is_picklable(tmp_path):
+    path = str(tmp_path / 'source.nwb')
+    data = synthetic_signals(3000, 2, rate=1000.0)
+    _write(path, data)
+    source = HDF5Source(path, '/acquisition/signals/data', data.shape, data.dtype)
+    copy = pickle.loads(pickle.dumps(source))
+    assert_allclose(copy[100:200, 1], data[100:200, 1])
+    close_files()
+
+
+def test_to_xarray_labels_and_decodes_counts(tmp_path):
+    xr = pytest.importorskip('xarray')
+    from ndx_tempo.lazy import to_xarray
+    path = str(tmp_path / 'labelled.nwb')
+    data = synthetic_signals(4000, 3, rate=1000.0)
+    counts = np.random.RandomState(0).randint(-2000, 2000, size=(4000, 3)).astype('int16')
+    _write(path, data, counts)
+    with NWBHDF5IO(path, 'r') as io:
+        nwb = io.read()
+        signals = to_xarray(nwb.acquisition['signals'])
+        assert isinstance(signals, xr.DataArray)
+        assert signals.dims == ('time', 'channel')
+        assert list(signals.channel.values) == ['channel0', 'channel1', 'channel2']
+        assert signals.offset.attrs['units'] == 'volts'
+        assert_allclose(signals.time.values[:2], [2.0, 2.001])
+        assert_allclose(signals.sel(channel='channel1').values, data[:, 1])
+
+        decoded = to_xarray(nwb.acquisition['counts'])
+        assert decoded.dtype == np.float64
+        assert 'conversion' not in decoded.attrs
+        assert_allclose(decoded.values, nwb.acquisition['counts'].decoded()[:])
+    close_files()
@@ -0,0 +1,65 @@
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+from pynwb import NWBHDF5IO
+
+from ndx_tempo.demodulation import LockInDemodulator, ParallelDemodulator, add_demodulated_series
+from ndx_tempo.testing import mock_nwbfile, mock_tempo
+
+RATE = 20000.0
+
+
+def _modulated(num_samples, frequencies, amplitudes, seed=0):
+    t = np.arange(num_samples) / RATE
+    rng = np.random.RandomState(seed)
+    columns = [amplitude * np.cos(2 * np.pi * frequency * t) + rng.normal(scale=0.01, size=num_samples)
+               for frequency, amplitude in zip(frequencies, amplitudes)]
+    return np.stack(columns, axis=1)
+
+
+def test_streamed_output_identical_to_one_shot():
+    raw = _modulated(30000, [1000.0, 2000.0, 1000.0], [1.0, 0.5, 0.25])
+    demodulator = LockInDemodulator(RATE, [1000.0, 2000.0], bandwidth=20.0, filter_order=4,
+                                    offset=[0.0, 0.1, 0.0], gain=[1.0, 2.0, 1.0])
+    one_shot = demodulator.clone().process(raw)
+    bounds = [0, 1, 777, 4096, 4097, 20000, 30000]
+    streamed = np.concatenate([demodulator.process(raw[start:stop]) for start, stop in zip(bounds, bounds[1:])])
+    assert_array_equal(streamed, one_shot)
+
+
+def test_amplitude_of_modulated_channels():
+    raw = _modulated(40000, [1000.0, 2000.0], [1.0, 0.5])
+    amplitude = np.abs(LockInDemodulator(RATE, [1000.0, 2000.0], bandwidth=20.0, filter_order=4).process(raw))
+    settled = amplitude[-5000:].mean(axis=0)
+    assert_allclose(settled[0, 0], 1.0, atol=0.01)
+    assert_allclose(settled[1, 1], 0.5, atol=0.01)
+    assert settled[0, 1] < 0.01 and settled[1, 0] < 0.01
+
+
+def test_from_device_and_write(tmp_path):
+    tempo = mock_tempo(num_channels=2, num_lines=2, modulation_frequencies=[1000.0, 2000.0], bandwidth=20.0)
+    demodulator = LockInDemodulator.from_device(tempo, RATE)
+    assert_array_equal(demodulator.frequencies, [1000.0, 2000.0])
+    assert demodulator.bandwidth == 20.0 and demodulator.filter_order == 4
+
+    raw = _modulated(20000, [1000.0, 2000.0], [1.0, 0.5])
+    nwbfile = mock_nwbfile()
+    nwbfile.add_device(tempo)
+    add_demodulated_series(nwbfile, tempo, raw, RATE, components=('in_phase', 'amplitude'), block_rows=3000)
+    path = str(tmp_path / 'demodulated.nwb')
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+    with NWBHDF5IO(path, 'r') as io:
+        series = io.read().processing['tempo']['demodulated_amplitude']
+        expected = np.abs(demodulator.process(raw)).reshape(len(raw), -1)
+        assert_allclose(series.data[:], expected)
+        assert_array_equal(series.channels.data[:], [0, 0, 1, 1])
+
+
+def test_parallel_identical_to_serial():
+    raw = _modulated(20000, [1000.0, 2000.0, 3000.0, 1000.0], [1.0, 0.5, 0.25, 2.0])
+    demodulator = LockInDemodulator(RATE, [1000.0, 2000.0, 3000.0], bandwidth=20.0, filter_order=3,
+                                    offset=[0.0, 0.1, 0.2, 0.3], gain=[1.0, 2.0, 1.0, 0.5])
+    serial = demodulator.clone().process(raw)
+    runner = ParallelDemodulator(demodulator, workers=3, window_rows=6000, block_rows=2500)
+    assert len(runner.jobs(raw.shape[1])) == 3
+    assert_array_equal(runner.process(raw), serial)
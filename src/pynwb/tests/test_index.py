@@ -0,0 +1,69 @@
+import os
+import sqlite3
+
+from pynwb import NWBHDF5IO
+
+from ndx_tempo import TEMPO
+from ndx_tempo.index import SCHEMA_VERSION, TempoIndex
+from ndx_tempo.testing import mock_nwbfile, mock_tempo
+
+
+def _write(path, **kwargs):
+    nwbfile = mock_nwbfile()
+    nwbfile.add_device(mock_tempo(**kwargs))
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+
+def test_index_update_and_query(tmp_path):
+    os.makedirs(str(tmp_path / 'a'))
+    _write(str(tmp_path / 'a' / 'one.nwb'), filter_order=4.0, modulation_frequencies=[1000.0, 3000.0])
+    _write(str(tmp_path / 'two.nwb'), filter_order=2.0, modulation_frequencies=[1000.0])
+    (tmp_path / 'broken.nwb').write_bytes(b'not hdf5')
+
+    with TempoIndex(str(tmp_path / 'index.sqlite')) as index:
+        stats = index.update(str(tmp_path))
+        assert stats == {'added': 2, 'updated': 0, 'removed': 0, 'unchanged': 0, 'failed': 1}
+        assert len(index) == 2
+        paths = index.sessions(frequency=1000.0, min_power=5e-4)
+        assert [os.path.basename(path) for path in paths] == ['one.nwb', 'two.nwb']
+        paths = index.sessions(frequency=3000.0, filter_order=4)
+        assert [os.path.basename(path) for path in paths] == ['one.nwb']
+        assert index.sessions(frequency=3000.0, filter_order=2) == []
+        assert index.sessions(min_power=1.0) == []
+
+        assert index.update(str(tmp_path))['unchanged'] == 3
+        os.remove(str(tmp_path / 'two.nwb'))
+        _write(str(tmp_path / 'a' / 'one.nwb'), filter_order=2.0)
+        stats = index.update(str(tmp_path), workers=2)
+        assert stats['removed'] == 1 and stats['updated'] == 1
+        assert [os.path.basename(path) for path in index.sessions(filter_order=2)] == ['one.nwb']
+
+
+def test_index_stores_si_values(tmp_path):
+    config = {'name': 'tempo', 'units': {'power': 'mW'},
+              'laserlines': [{'name': 'laser470', 'power': 2.0,
+                              'analog_modulation_frequency': {'value': 1, 'unit': 'kHz'}}],
+              'photodetectors': [{'name': 'pd0', 'gain': 1.0, 'bandwidth': {'value': 100, 'unit': 'kHz'}}],
+              'lockinamps': [{'name': 'lockinamp', 'demodulation_filter_order': 4,
+                              'demod_bandwidth': {'value': 0.05, 'unit': 'kHz'},
+                              'channels': {'channel_name': ['a'], 'offset': [0.0], 'gain': [1.0]}}]}
+    nwbfile = mock_nwbfile()
+    nwbfile.add_device(TEMPO.from_config(config))
+    with NWBHDF5IO(str(tmp_path / 'session.nwb'), 'w') as io:
+        io.write(nwbfile)
+
+    path = str(tmp_path / 'index.sqlite')
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA user_version = %d' % (SCHEMA_VERSION - 1))
+    connection.execute('CREATE TABLE files (file_id INTEGER PRIMARY KEY, path TEXT)')
+    connection.commit()
+    connection.close()
+    with TempoIndex(path) as index:
+        assert index.update(str(tmp_path))['added'] == 1
+        assert index.sessions(min_power=1.0) == []
+        assert len(index.sessions(min_power=1e-3, max_power=3e-3, frequency=1000.0)) == 1
+        assert len(index.sessions(max_demod_bandwidth=50.0)) == 1
+        assert index.sessions(max_demod_bandwidth=1.0) == []
+        (bandwidth,) = index.connection.execute('SELECT bandwidth FROM photodetectors').fetchone()
+        assert bandwidth == 1e5
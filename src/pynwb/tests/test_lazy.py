@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+
+from pynwb import NWBHDF5IO
+
+from ndx_tempo import SubjectComplete
+from ndx_tempo.testing import mock_nwbfile, mock_tempo
+
+PACKAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SCRIPT = """
+import ndx_tempo
+from ndx_tempo import materialized_types, add_materialize_hook
+
+seen = []
+add_materialize_hook(lambda type_name, seconds: seen.append(type_name))
+assert 'LockInAmplifier' in materialized_types()
+assert 'TEMPO' not in materialized_types()
+assert 'SubjectComplete' not in materialized_types()
+
+tempo_cls = ndx_tempo.TEMPO
+assert tempo_cls is ndx_tempo.TEMPO
+assert seen == ['TEMPO'], seen
+assert ndx_tempo.Subject is ndx_tempo.SubjectComplete
+assert seen == ['TEMPO', 'Surgery', 'SubjectComplete'], seen
+assert all(seconds >= 0 for seconds in materialized_types().values())
+"""
+
+
+def test_types_are_generated_on_first_access():
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([PACKAGE_DIR, os.environ.get('PYTHONPATH', '')]))
+    subprocess.check_call([sys.executable, '-c', SCRIPT], env=env)
+
+
+READ_SCRIPT = """
+import sys
+from pynwb import NWBHDF5IO
+import ndx_tempo
+from ndx_tempo import materialized_types
+
+assert 'TEMPO' not in materialized_types()
+with NWBHDF5IO(sys.argv[1], 'r') as io:
+    nwb = io.read()
+    tempo = nwb.devices['tempo']
+    assert isinstance(tempo, ndx_tempo.TEMPO), type(tempo)
+    assert tempo.to_config()['name'] == 'tempo'
+    assert isinstance(nwb.subject, ndx_tempo.SubjectComplete), type(nwb.subject)
+    assert nwb.subject.ophys_implant_name == 'fiber'
+    assert nwb.subject.implantation_device is nwb.devices['implant']
+"""
+
+
+def test_types_are_generated_when_a_file_is_read(tmp_path):
+    path = str(tmp_path / 'lazy.nwb')
+    nwbfile = mock_nwbfile()
+    nwbfile.add_device(mock_tempo(num_channels=2))
+    nwbfile.subject = SubjectComplete(subject_id='mouse1', ophys_implant_name='fiber',
+                                      implantation_device=nwbfile.create_device(name='implant'))
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([PACKAGE_DIR, os.environ.get('PYTHONPATH', '')]))
+    subprocess.check_call([sys.executable, '-c', READ_SCRIPT, path], env=env)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from hdmf.common.table import VectorData
+
+from ndx_tempo import LockInAmplifier, Measurement
+
+
+def test_channel_lookup_and_add_rows():
+    lockinamp = LockInAmplifier(name='lockinamp', columns=[
+        VectorData(name='channel_name', description='channel_name', data=['channel0', 'channel1', 'channel2']),
+        Measurement(name='offset', description='offset', unit='millivolts', conversion=1e-3, data=[0.0] * 3),
+        VectorData(name='gain', description='gain', data=[1.0] * 3)])
+    assert lockinamp.channel_index('channel2') == 2
+    assert_array_equal(lockinamp.gains, [1.0, 1.0, 1.0])
+
+    lockinamp.add_rows(channel_name=['a', 'b'], offset=[5.0, 7.0], gain=[2.0, 3.0])
+    assert len(lockinamp) == 5
+    assert lockinamp.channel_names[-2:] == ('a', 'b')
+    assert_array_equal(lockinamp.channel_indices(['b', 'channel0']), [4, 0])
+    assert_array_equal(lockinamp.offsets, [0.0, 0.0, 0.0, 5e-3, 7e-3])
+    assert_array_equal(lockinamp.gains, [1.0, 1.0, 1.0, 2.0, 3.0])
+    assert_array_equal(lockinamp.id.data, np.arange(5))
+
+    lockinamp.add_row(channel_name='c', offset=1.0, gain=4.0)
+    assert lockinamp.channel_index('c') == 5
+    assert lockinamp.gains[-1] == 4.0
+    with pytest.raises(KeyError):
+        lockinamp.channel_index('missing')
+    with pytest.raises(ValueError):
+        lockinamp.gains[0] = 2.0
+    with pytest.raises(ValueError):
+        lockinamp.add_rows(channel_name=['d'], offset=[0.0, 1.0], gain=[1.0])
+    assert isinstance(lockinamp['offset'], Measurement)
+
+
+def test_cached_columns_follow_replaced_and_cleared_data():
+    lockinamp = LockInAmplifier(name='lockinamp', columns=[
+        VectorData(name='channel_name', description='channel_name', data=['a', 'b']),
+        Measurement(name='offset', description='offset', unit='volts', data=[0.0, 0.5]),
+        VectorData(name='gain', description='gain', data=[1.0, 1.0])])
+    assert_array_equal(lockinamp.gains, [1.0, 1.0])
+
+    lockinamp['gain'].transform(lambda data: [2 * value for value in data])
+    assert_array_equal(lockinamp.gains, [2.0, 2.0])
+
+    lockinamp['gain'].data[0] = 3.0
+    lockinamp['offset'].data[1] = 0.25
+    lockinamp['channel_name'].data[1] = 'c'
+    lockinamp.clear_cache()
+    assert_array_equal(lockinamp.gains, [3.0, 2.0])
+    assert_array_equal(lockinamp.offsets, [0.0, 0.25])
+    assert lockinamp.channel_index('c') == 1
@@ -0,0 +1,87 @@
+import pickle
+
+import pytest
+from pynwb import NWBHDF5IO
+
+from ndx_tempo import TEMPO, SubjectComplete
+from ndx_tempo.metadata import FileMetadata, SurgeryInfo, read_metadata
+from ndx_tempo.testing import mock_nwbfile, mock_tempo
+
+
+def test_read_metadata(tmp_path):
+    path = str(tmp_path / 'metadata.nwb')
+    nwbfile = mock_nwbfile()
+    nwbfile.add_device(mock_tempo(num_channels=3, num_lines=2, filter_order=2.0, bandwidth=25.0))
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+    metadata = read_metadata(path)
+    assert isinstance(metadata, FileMetadata)
+    assert metadata.identifier == 'session id'
+    (tempo,) = metadata.devices
+    assert tempo.name == 'tempo'
+    assert sorted(line.name for line in tempo.laserlines) == ['laserline0', 'laserline1']
+    frequencies = sorted(line.analog_modulation_frequency.si_value for line in tempo.laserlines)
+    assert frequencies == [1000.0, 2000.0]
+    assert [detector.gain.value for detector in tempo.photodetectors] == [1.0, 1.0, 1.0]
+    (lockinamp,) = tempo.lockinamps
+    assert lockinamp.demodulation_filter_order == 2.0
+    assert lockinamp.demod_bandwidth.value == 25.0
+    assert lockinamp.channel_name == ('channel0', 'channel1', 'channel2')
+    assert lockinamp.offset.value == (0.0, 0.0, 0.0)
+    assert metadata.subject is None
+
+    with pytest.raises(AttributeError):
+        tempo.name = 'other'
+    assert not hasattr(tempo, '__dict__')
+    assert pickle.loads(pickle.dumps(metadata)) == metadata
+
+
+def test_si_values_of_non_si_units(tmp_path):
+    path = str(tmp_path / 'units.nwb')
+    nwbfile = mock_nwbfile()
+    nwbfile.add_device(TEMPO.from_config({
+        'name': 'tempo', 'units': {'power': 'mW'},
+        'laserlines': [{'name': 'laser470', 'power': 2.0, 'analog_modulation_frequency': {'value': 1, 'unit': 'kHz'}}],
+        'photodetectors': [{'name': 'pd0', 'gain': 1.0, 'bandwidth': {'value': 100, 'unit': 'kHz', 'conversion': 2}}],
+    }))
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+    (tempo,) = read_metadata(path).devices
+    (line,) = tempo.laserlines
+    assert line.power.si_value == pytest.approx(2e-3)
+    assert line.analog_modulation_frequency.si_value == pytest.approx(1000.0)
+    assert tempo.photodetectors[0].bandwidth.si_value == pytest.approx(2e5)
+
+
+def test_read_subject_complete(tmp_path):
+    path = str(tmp_path / 'subject.nwb')
+    nwbfile = mock_nwbfile()
+    nwbfile.add_device(mock_tempo(num_channels=3))
+    implant = nwbfile.create_device(name='implant')
+    nwbfile.subject = SubjectComplete(subject_id='mouse1', species='Mus musculus', strain='c57bl6', sex='M',
+                                      surgery_date='2020-01-01', surgery_notes='no complications',
+                                      implantation_device=implant, ophys_implant_name='fiber',
+                                      virus_injection_id='virus', virus_injection_opsin_l_r='R',
+                                      virus_injection_volume=0.5, virus_injection_coordinates='[1.0, 2.0, 3.0]',
+                                      ophys_injection_date='2020-01-02', ophys_injection_volume=0.2,
+                                      sacrificial_date='2020-02-01')
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+    subject = read_metadata(path).subject
+    assert subject.neurodata_type == 'SubjectComplete'
+    assert (subject.subject_id, subject.species, subject.strain, subject.sex) == ('mouse1', 'Mus musculus',
+                                                                                  'c57bl6', 'M')
+    assert subject.sacrificial_date == '2020-02-01'
+    surgery = subject.surgery
+    assert isinstance(surgery, SurgeryInfo)
+    assert (surgery.surgery_date, surgery.surgery_notes) == ('2020-01-01', 'no complications')
+    assert surgery.implantation_device == '/general/devices/implant'
+    assert surgery.ophys_implant_name == 'fiber' and surgery.ephys_implant_name is None
+    assert (surgery.virus_injection_id, surgery.virus_injection_opsin_l_r) == ('virus', 'R')
+    assert surgery.virus_injection_volume == 0.5
+    assert surgery.virus_injection_coordinates == '[1.0, 2.0, 3.0]'
+    assert (surgery.ophys_injection_date, surgery.ophys_injection_volume) == ('2020-01-02', 0.2)
+    assert pickle.loads(pickle.dumps(subject)) == subject
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+from pynwb import NWBHDF5IO
+
+from ndx_tempo import TempoSeries, stream_data
+from ndx_tempo.presets import PRESETS, WritePreset, apply_preset, get_preset, set_default_preset
+from ndx_tempo.testing import mock_nwbfile, mock_tempo, synthetic_signals
+
+
+def test_chunk_rows():
+    balanced = get_preset('balanced')
+    assert balanced.chunk_rows(num_channels=4, itemsize=8, rate=2000.0) == 2000
+    # capped by bytes for many channels at a high rate
+    assert balanced.chunk_rows(num_channels=256, itemsize=8, rate=1e5) == (1 << 20) // (256 * 8)
+    assert get_preset('fast').chunk_rows(num_channels=4, itemsize=8, rate=100.0) == 64
+    with pytest.raises(ValueError):
+        get_preset('smallest')
+
+
+@pytest.mark.parametrize('preset', sorted(PRESETS))
+def test_presets_round_trip(tmp_path, preset):
+    path = str(tmp_path / 'presets.nwb')
+    data = synthetic_signals(5000, 4)
+    counts = np.round(data * 1000).astype(np.int16)
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=4)
+    nwbfile.add_device(tempo)
+    lockinamp = tempo.lockinamp_devices.children[0]
+    nwbfile.add_acquisition(TempoSeries(name='streamed', rate=2000.0, channels=lockinamp.create_channel_region(),
+                                        data=stream_data(iter([data]), preset=preset, rate=2000.0)))
+    nwbfile.add_acquisition(TempoSeries(name='counts', rate=2000.0, channels=lockinamp.create_channel_region(),
+                                        data=counts))
+    assert apply_preset(nwbfile, preset) == 1
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+    settings = PRESETS[preset]
+    with NWBHDF5IO(path, 'r') as io:
+        nwb = io.read()
+        streamed = nwb.acquisition['streamed'].data
+        assert_array_equal(streamed[:], data)
+        assert streamed.compression == settings.compression
+        assert streamed.chunks == (int(2000 * settings.chunk_seconds), 4)
+        stored = nwb.acquisition['counts'].data
+        assert_array_equal(stored[:], counts)
+        assert (stored.scaleoffset is not None) == settings.integer_scaleoffset
+
+
+def test_custom_default_preset_with_a_builtin_name():
+    custom = WritePreset('balanced', compression='lzf', chunk_seconds=0.5, max_chunk_bytes=1 << 20)
+    previous = set_default_preset(custom)
+    try:
+        assert get_preset() is custom
+        assert PRESETS['balanced'].compression == 'gzip'
+        assert stream_data(iter([np.zeros((10, 2))]), rate=1000.0).io_settings['compression'] == 'lzf'
+    finally:
+        set_default_preset(previous)
+    assert get_preset() is PRESETS[previous]
+    with pytest.raises(TypeError):
+        stream_data(iter([np.zeros((10, 2))]), 512, 'lzf')
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+from pynwb import NWBHDF5IO
+
+from ndx_tempo import TempoSeries
+from ndx_tempo.pyramid import Pyramid, _Cascade, add_pyramid, reduce_blocks
+from ndx_tempo.testing import mock_nwbfile, mock_tempo, synthetic_signals
+
+
+def test_reduce_blocks():
+    data = np.arange(25.0).reshape(-1, 1)
+    levels = np.concatenate(list(reduce_blocks(data, 10, block_rows=20)))
+    assert_allclose(levels, [[0, 9, 4.5], [10, 19, 14.5], [20, 24, 22]])
+
+
+def test_pyramid_roundtrip(tmp_path):
+    path = str(tmp_path / 'pyramid.nwb')
+    rate = 1000.0
+    data = synthetic_signals(25000, 3, rate=rate)
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=3)
+    nwbfile.add_device(tempo)
+    series = TempoSeries(name='signals', data=data, rate=rate,
+                         channels=tempo.lockinamp_devices.children[0].create_channel_region())
+    nwbfile.add_acquisition(series)
+    levels = add_pyramid(nwbfile, series, factors=(10, 100), block_rows=3000)
+    assert [level.name for level in levels] == ['signals_x10', 'signals_x100']
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+    with NWBHDF5IO(path, 'r') as io:
+        nwb = io.read()
+        pyramid = Pyramid(nwb, 'signals')
+        assert pyramid.factors == [10, 100]
+        assert pyramid.choose(0.0, 25.0, pixels=200) == 100
+        assert pyramid.choose(0.0, 25.0, pixels=2000) == 10
+        assert pyramid.choose(0.0, 1.0, pixels=500) == 1
+
+        overview = pyramid.read(2.0, 12.0, pixels=100, channels=[0, 2])
+        assert overview.factor == 100
+        assert overview.min.shape == (100, 2)
+        bins = data[2000:12000][:, [0, 2]].reshape(100, 100, 2)
+        assert_allclose(overview.min, bins.min(axis=1))
+        assert_allclose(overview.max, bins.max(axis=1))
+        assert_allclose(overview.mean, bins.mean(axis=1))
+        assert_allclose(overview.times, 2.0 + np.arange(100) * 0.1)
+
+        raw = pyramid.read(1.0, 1.1, pixels=500)
+        assert raw.factor == 1
+        assert_allclose(raw.mean, data[1000:1100])
+
+
+def test_levels_are_cascaded_from_one_read(tmp_path):
+    data = np.random.RandomState(0).normal(size=(10550, 2))
+    reads = []
+
+    class Source(np.ndarray):
+        def __getitem__(self, item):
+            if isinstance(item, slice):
+                reads.append((item.start, item.stop))
+            return np.asarray(super().__getitem__(item))
+
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=2)
+    nwbfile.add_device(tempo)
+    series = TempoSeries(name='signals', data=data.view(Source), rate=1000.0, conversion=1e-3,
+                         channels=tempo.lockinamp_devices.children[0].create_channel_region())
+    nwbfile.add_acquisition(series)
+    add_pyramid(nwbfile, series, factors=(1000, 10, 100), block_rows=2000)
+    with NWBHDF5IO(str(tmp_path / 'cascade.nwb'), 'w') as io:
+        io.write(nwbfile)
+    assert sorted(reads) == [(start, start + 2000) for start in range(0, 10550, 2000)]
+
+    with NWBHDF5IO(str(tmp_path / 'cascade.nwb'), 'r') as io:
+        levels = io.read().processing['tempo_pyramid']
+        for factor in (10, 100, 1000):
+            level = levels['signals_x%d' % factor]
+            assert level.conversion == 1e-3
+            bins = [data[start:start + factor] for start in range(0, len(data), factor)]
+            assert_allclose(level.data[:], [np.concatenate([b.min(axis=0), b.max(axis=0), b.mean(axis=0)])
+                                            for b in bins])
+
+
+def test_queued_rows_stay_bounded():
+    data = np.random.RandomState(0).normal(size=(200000, 4))
+    factors = (10, 100, 1000)
+    expected = [np.concatenate(list(_Cascade(data, factors, 5000).rows(level))) for level in range(3)]
+
+    max_bytes = 3 * 16 << 10
+    cascade = _Cascade(data, factors, 5000, max_queued_bytes=max_bytes)
+    peak = 0
+    levels = []
+    for level in range(3):
+        rows = []
+        for block in cascade.rows(level):
+            rows.append(block)
+            peak = max(peak, cascade.queued_bytes)
+        levels.append(np.concatenate(rows))
+    # without the bound the coarser levels would hold 2200 rows of 12 columns, about 211 kB
+    assert peak <= max_bytes
+    for level, rows in zip(levels, expected):
+        assert_allclose(level, rows)
+
+
+def test_factors_must_divide_each_other():
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=1)
+    nwbfile.add_device(tempo)
+    series = TempoSeries(name='signals', data=np.zeros((100, 1)), rate=1000.0,
+                         channels=tempo.lockinamp_devices.children[0].create_channel_region())
+    with pytest.raises(ValueError):
+        add_pyramid(nwbfile, series, factors=(10, 25))
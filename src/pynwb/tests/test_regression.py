@@ -0,0 +1,82 @@
+import numpy as np
+from numpy.testing import assert_allclose
+from pynwb import NWBHDF5IO
+
+from ndx_tempo import TempoSeries
+from ndx_tempo.regression import ReferenceRegression, laserline_roles, paired_columns
+from ndx_tempo.testing import mock_nwbfile, mock_tempo
+
+ROLES = {'laserline0': 'signal', 'laserline1': 'reference'}
+
+
+def _demodulated(num_samples=20000, num_channels=3, coupling=(0.7, -0.3, 1.2), seed=0):
+    rng = np.random.RandomState(seed)
+    reference = rng.standard_normal((num_samples, num_channels)).cumsum(axis=0) * 0.01
+    signal = 0.05 * rng.standard_normal((num_samples, num_channels))
+    data = np.empty((num_samples, 2 * num_channels))
+    data[:, 1::2] = reference
+    data[:, 0::2] = 1.0 + signal + reference * np.asarray(coupling)
+    return data, 1.0 + signal
+
+
+def test_paired_columns():
+    tempo = mock_tempo(num_channels=3, num_lines=2)
+    assert laserline_roles(tempo, ROLES) == ['signal', 'reference']
+    targets, references = paired_columns(['signal', 'reference', None], 2)
+    assert targets.tolist() == [0, 3]
+    assert references.tolist() == [[1], [4]]
+
+
+def test_streaming_fit_matches_lstsq():
+    data, clean = _demodulated()
+    regression = ReferenceRegression.from_device(mock_tempo(num_channels=3, num_lines=2), roles=ROLES)
+    coefficients = regression.fit(data, block_rows=3000)
+    for target, channel in zip(regression.targets, range(3)):
+        x = np.column_stack([np.ones(len(data)), data[:, 2 * channel + 1]])
+        expected = np.linalg.lstsq(x, data[:, target], rcond=None)[0]
+        assert_allclose(coefficients[channel], expected, rtol=1e-8, atol=1e-10)
+    corrected = np.concatenate(list(regression.iter_corrected(data, block_rows=3000)))
+    assert_allclose(coefficients[:, 1], [0.7, -0.3, 1.2], atol=0.05)
+    assert np.std(corrected - clean) < 0.01
+
+
+def test_sliding_window_follows_drift():
+    data, clean = _demodulated(coupling=(0.5, 0.5, 0.5))
+    half = len(data) // 2
+    data[half:, 0::2] += 0.5 * data[half:, 1::2]  # coupling rises to 1.0 halfway
+    regression = ReferenceRegression(targets=[0, 2, 4], references=[[1], [3], [5]], window_rows=4000)
+    corrected = np.concatenate(list(regression.iter_corrected(data, block_rows=1000)))
+    assert corrected.shape == (len(data), 3)
+    edges = np.r_[:half - 3000, half + 3000:len(data)]
+    assert np.std(corrected[edges] - clean[edges]) < 0.02
+
+    # a window covering the whole recording gives the global fit
+    regression = ReferenceRegression(targets=[0], references=[[1]], window_rows=10 * len(data))
+    windowed = np.concatenate(list(regression.iter_corrected(data, block_rows=1000)))
+    regression = ReferenceRegression(targets=[0], references=[[1]])
+    regression.fit(data)
+    assert_allclose(windowed, np.concatenate(list(regression.iter_corrected(data))))
+
+
+def test_corrected_series_roundtrip(tmp_path):
+    path = str(tmp_path / 'regression.nwb')
+    data, _ = _demodulated(num_samples=5000)
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=3, num_lines=2)
+    nwbfile.add_device(tempo)
+    lockinamp = tempo.lockinamp_devices.children[0]
+    source = TempoSeries(name='demodulated', data=data, rate=1000.0,
+                         channels=lockinamp.create_channel_region(region=[0, 0, 1, 1, 2, 2]))
+    processing = nwbfile.create_processing_module(name='tempo', description='tempo')
+    processing.add(source)
+    regression = ReferenceRegression.from_device(tempo, roles=ROLES)
+    processing.add(regression.corrected_series(source, name='corrected', block_rows=1000))
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+    with NWBHDF5IO(path, 'r') as io:
+        corrected = io.read().processing['tempo']['corrected']
+        assert corrected.source_series.name == 'demodulated'
+        assert list(corrected.source_columns[:]) == [0, 2, 4]
+        assert list(corrected.channels.data[:]) == [0, 1, 2]
+        assert_allclose(corrected.data[:], np.concatenate(list(regression.iter_corrected(data))))
@@ -0,0 +1,70 @@
+import os
+
+import h5py
+import pytest
+from pynwb import NWBHDF5IO
+
+from ndx_tempo import TEMPO, TempoSeries, metadata
+from ndx_tempo.config import tempo_from_config
+from ndx_tempo.metadata import read_metadata
+from ndx_tempo.rig import RigStore, clear_cache, config_hash, load_rig, rig_path
+from ndx_tempo.testing import mock_nwbfile, synthetic_signals
+
+CONFIG = {
+    'name': 'tempo_rig',
+    'units': {'power': 'mW'},
+    'laserlines': [{'name': 'laser470', 'analog_modulation_frequency': 1000, 'power': 2.0}],
+    'photodetectors': [{'name': 'pd0', 'gain': 1.5, 'bandwidth': 1e5}],
+    'lockinamps': [{'name': 'lockinamp', 'demodulation_filter_order': 4, 'demod_bandwidth': 50,
+                    'channels': {'channel_name': ['a', 'b'], 'offset': [0.0, 0.1], 'gain': [1.0, 2.0]}}],
+}
+
+
+def test_config_hash():
+    assert config_hash(CONFIG) == config_hash(TEMPO.from_config(CONFIG))
+    changed = dict(CONFIG, laserlines=[dict(CONFIG['laserlines'][0], power=3.0)])
+    assert config_hash(changed) != config_hash(CONFIG)
+    with pytest.raises(TypeError):
+        config_hash(tempo_from_config(CONFIG, sections=('lockinamps',)))
+
+
+def _write_session(store, path):
+    tempo = store.session_device(CONFIG)
+    assert tempo.laserline_devices is None
+    nwbfile = mock_nwbfile()
+    nwbfile.add_device(tempo)
+    nwbfile.add_acquisition(TempoSeries(name='signals', rate=1000.0, data=synthetic_signals(100, 2),
+                                        channels=tempo.lockinamp_devices.children[0].create_channel_region()))
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+    store.link(path, tempo)
+
+
+def test_sessions_link_to_shared_rig(tmp_path):
+    store = RigStore(str(tmp_path / 'rigs'))
+    os.makedirs(str(tmp_path / 'sessions'))
+    paths = [str(tmp_path / 'sessions' / ('session%d.nwb' % i)) for i in range(2)]
+    for path in paths:
+        _write_session(store, path)
+    assert len(os.listdir(str(tmp_path / 'rigs'))) == 1
+    rig = rig_path(paths[0], 'tempo_rig')
+    assert rig == store.add(CONFIG)
+
+    with h5py.File(paths[0], 'r') as f:
+        link = f['general/devices/tempo_rig'].get('laserline_devices', getlink=True)
+        assert isinstance(link, h5py.ExternalLink)
+        assert not os.path.isabs(link.filename)
+
+    with NWBHDF5IO(paths[1], 'r') as io:
+        tempo = io.read().devices['tempo_rig']
+        assert tempo.to_config() == TEMPO.from_config(CONFIG).to_config()
+
+    metadata._linked_devices.clear()
+    for path in paths:
+        (tempo,) = read_metadata(path).devices
+        assert [line.name for line in tempo.laserlines] == ['laser470']
+        assert [detector.name for detector in tempo.photodetectors] == ['pd0']
+    assert len(metadata._linked_devices) == 2
+
+    assert load_rig(rig) is load_rig(rig)
+    clear_cache()
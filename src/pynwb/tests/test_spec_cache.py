@@ -0,0 +1,56 @@
+import os
+import shutil
+import subprocess
+import sys
+
+from ndx_tempo import tempo
+from ndx_tempo._spec_cache import (CACHE_DIR_ENV, CachedSpecReader, cache_key, load_cached_documents,
+                                   store_documents)
+
+PACKAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _copy_spec(tmp_path):
+    spec_dir = tmp_path / 'spec'
+    shutil.copytree(os.path.dirname(tempo.ns_path), str(spec_dir))
+    return str(spec_dir / os.path.basename(tempo.ns_path))
+
+
+def test_cache_roundtrip(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / 'cache'))
+    ns_path = _copy_spec(tmp_path)
+    assert load_cached_documents(ns_path) is None
+
+    reader = CachedSpecReader(os.path.dirname(ns_path))
+    namespaces = reader.read_namespace(ns_path)
+    reader.read_spec(namespaces[0]['schema'][-1]['source'])
+    assert reader.parsed
+    store_documents(ns_path, reader.documents)
+
+    documents = load_cached_documents(ns_path)
+    assert documents == reader.documents
+    warm_reader = CachedSpecReader(os.path.dirname(ns_path), documents)
+    assert warm_reader.read_namespace(ns_path) == namespaces
+    assert not warm_reader.parsed
+
+
+def test_cache_invalidated_by_spec_change(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / 'cache'))
+    ns_path = _copy_spec(tmp_path)
+    store_documents(ns_path, {'ndx-tempo.namespace.yaml': []})
+    key = cache_key(ns_path)
+
+    with open(ns_path.replace('.namespace.yaml', '.extensions.yaml'), 'a') as f:
+        f.write('\n')
+    assert cache_key(ns_path) != key
+    assert load_cached_documents(ns_path) is None
+
+
+def test_warm_cache_import_in_subprocesses(tmp_path):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([PACKAGE_DIR, os.environ.get('PYTHONPATH', '')]),
+               **{CACHE_DIR_ENV: str(tmp_path / 'cache')})
+    env.pop('NDX_TEMPO_NO_CACHE', None)
+    code = 'import ndx_tempo; ndx_tempo.TEMPO; ndx_tempo.SubjectComplete'
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', code], env=env, check=True)
+    assert os.listdir(str(tmp_path / 'cache'))
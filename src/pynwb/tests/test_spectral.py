@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+from pynwb import NWBHDF5IO
+
+from ndx_tempo import TempoSeries
+from ndx_tempo.spectral import SpectralParameters, cross_spectra, dpss, spectra
+from ndx_tempo.testing import mock_nwbfile, mock_tempo
+
+
+def test_dpss_tapers_are_orthonormal():
+    tapers = dpss(256, 3.0)
+    assert tapers.shape == (5, 256)
+    assert_allclose(tapers @ tapers.T, np.eye(5), atol=1e-8)
+    assert tapers[0].sum() > 0
+    windows = pytest.importorskip('scipy.signal.windows')
+    assert_allclose(tapers, windows.dpss(256, 3.0, 5), atol=1e-10)
+
+
+def test_welch_matches_direct_computation():
+    rng = np.random.RandomState(0)
+    data = rng.normal(size=(5000, 2))
+    parameters = SpectralParameters(nperseg=256, noverlap=128)
+    frequencies, csd = cross_spectra(data, 1000.0, parameters, block_segments=7)
+
+    window = np.hanning(256)
+    starts = range(0, 5000 - 256 + 1, 128)
+    segments = np.stack([data[start:start + 256] for start in starts])
+    segments = segments - segments.mean(axis=1, keepdims=True)
+    fft = np.fft.rfft(segments * window[:, np.newaxis], axis=1)
+    expected = (np.abs(fft[..., 0]) ** 2).mean(axis=0) / (1000.0 * (window ** 2).sum())
+    expected[1:-1] *= 2
+    assert_allclose(frequencies, np.fft.rfftfreq(256, 1e-3))
+    assert_allclose(csd[:, 0, 0].real, expected)
+
+
+def test_multitaper_white_noise_level_and_peak():
+    rate = 1000.0
+    rng = np.random.RandomState(1)
+    t = np.arange(20000) / rate
+    data = rng.normal(size=(20000, 1)) + np.sin(2 * np.pi * 125.0 * t)[:, np.newaxis]
+    frequencies, csd = cross_spectra(data, rate, SpectralParameters(method='multitaper', nperseg=512, bandwidth=2))
+    power = csd[:, 0, 0].real
+    assert frequencies[np.argmax(power)] == 125.0
+    # white noise of unit variance has a one-sided density of 2 / rate
+    assert_allclose(np.median(power[(frequencies > 200) & (frequencies < 450)]), 2 / rate, rtol=0.1)
+
+
+def test_spectra_cached_in_file(tmp_path):
+    path = str(tmp_path / 'spectra.nwb')
+    rate = 1000.0
+    rng = np.random.RandomState(2)
+    common = rng.normal(size=8000)
+    data = np.column_stack([common, common + 0.1 * rng.normal(size=8000), rng.normal(size=8000)])
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=3)
+    nwbfile.add_device(tempo)
+    nwbfile.add_acquisition(TempoSeries(name='signals', data=data, rate=rate,
+                                        channels=tempo.lockinamp_devices.children[0].create_channel_region()))
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+    parameters = SpectralParameters(nperseg=256)
+    with NWBHDF5IO(path, 'a') as io:
+        nwb = io.read()
+        result = spectra(nwb, 'signals', parameters)
+        assert not result.cached
+        assert result.power.shape == (129, 3)
+        assert result.pairs.tolist() == [[0, 1], [0, 2], [1, 2]]
+        assert result.coherence[:, 0].mean() > 0.9
+        assert result.coherence[:, 2].mean() < 0.2
+        io.write(nwb)
+
+    with NWBHDF5IO(path, 'r') as io:
+        nwb = io.read()
+        cached = spectra(nwb, 'signals', parameters)
+        assert cached.cached
+        assert_allclose(cached.power, result.power)
+        assert_allclose(cached.coherence, result.coherence)
+        assert_allclose(cached.frequencies, result.frequencies)
+        other = spectra(nwb, 'signals', SpectralParameters(nperseg=128), store=False)
+        assert not other.cached
+        assert other.power.shape == (65, 3)
+
+
+def test_key_changes_when_the_source_is_rewritten():
+    tempo = mock_tempo(num_channels=1)
+    data = np.zeros((1000, 1))
+    first, second = (TempoSeries(name='signals', data=data, rate=1000.0,
+                                 channels=tempo.lockinamp_devices.children[0].create_channel_region())
+                     for _ in range(2))
+    parameters = SpectralParameters(nperseg=128)
+    assert parameters.key(first) == parameters.key(first)
+    assert parameters.key(first) != parameters.key(second)
@@ -0,0 +1,43 @@
+import h5py
+import numpy as np
+from numpy.testing import assert_array_equal
+from pynwb import NWBHDF5IO
+
+from ndx_tempo import TempoSeries, stream_data
+from ndx_tempo.streaming import BlockIterator
+from ndx_tempo.testing import mock_nwbfile, mock_tempo, synthetic_signals
+
+
+def test_block_iterator_rechunks():
+    data = synthetic_signals(1000, 3)
+    blocks = [data[:10], data[10:400], data[400:1000]]
+    iterator = BlockIterator(blocks, chunk_rows=128)
+    chunks = list(iterator)
+    assert [len(chunk.data) for chunk in chunks] == [128] * 7 + [104]
+    assert iterator.maxshape == (None, 3)
+    assert_array_equal(np.concatenate([chunk.data for chunk in chunks]), data)
+
+
+def test_streamed_tempo_series_roundtrip(tmp_path):
+    path = str(tmp_path / 'tempo_series.nwb')
+    data = synthetic_signals(5000, 4)
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=4)
+    nwbfile.add_device(tempo)
+    lockinamp = tempo.lockinamp_devices.children[0]
+    nwbfile.add_acquisition(TempoSeries(name='signals', rate=20000.0,
+                                        channels=lockinamp.create_channel_region(),
+                                        data=stream_data((data[i:i + 700] for i in range(0, 5000, 700)),
+                                                         chunk_rows=512, compression='gzip')))
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+    with h5py.File(path, 'r') as f:
+        dset = f['acquisition/signals/data']
+        assert dset.chunks == (512, 4)
+        assert dset.compression == 'gzip'
+    with NWBHDF5IO(path, 'r') as io:
+        series = io.read().acquisition['signals']
+        assert_array_equal(series.data[:], data)
+        assert series.channels.table.name == 'lockinamp'
+        assert_array_equal(series.channels.data[:], [0, 1, 2, 3])
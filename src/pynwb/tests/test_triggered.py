@@ -0,0 +1,71 @@
+import numpy as np
+from numpy.testing import assert_allclose
+from pynwb import H5DataIO, NWBHDF5IO
+
+from ndx_tempo import TempoSeries
+from ndx_tempo.testing import mock_nwbfile, mock_tempo
+from ndx_tempo.triggered import TriggeredStatistics, plan_reads, sample_indices, triggered_average
+
+
+def test_plan_reads_merges_chunk_aligned_windows():
+    reads = plan_reads([500, 10, 120, -5, 990, 130], length=20, num_rows=1000, chunk=100)
+    assert [(read.start, read.stop) for read in reads] == [(0, 200), (500, 600)]
+    assert [read.trials.tolist() for read in reads] == [[1, 2, 5], [0]]
+    reads = plan_reads([10, 120], length=20, num_rows=1000, chunk=100, max_read_rows=150)
+    assert [(read.start, read.stop) for read in reads] == [(0, 100), (100, 200)]
+
+
+def test_statistics_match_batch_computation():
+    rng = np.random.RandomState(0)
+    windows = rng.normal(size=(57, 30, 2))
+    statistics = TriggeredStatistics((30, 2), num_bootstrap=500)
+    for start in range(0, 57, 10):
+        statistics.update(windows[start:start + 10])
+    assert statistics.count == 57
+    assert_allclose(statistics.mean, windows.mean(axis=0))
+    assert_allclose(statistics.sem, windows.std(axis=0, ddof=1) / np.sqrt(57))
+    lower, upper = statistics.interval(0.95)
+    assert np.all(lower < statistics.mean) and np.all(statistics.mean < upper)
+    # the bootstrap interval is close to the normal one
+    assert_allclose((upper - lower).mean(), 2 * 1.96 * statistics.sem.mean(), rtol=0.15)
+
+
+def test_triggered_average_from_trials_table(tmp_path):
+    path = str(tmp_path / 'triggered.nwb')
+    rate = 1000.0
+    rng = np.random.RandomState(1)
+    data = 0.1 * rng.normal(size=(60000, 3))
+    # at least 100 ms apart, so the 50 ms responses do not overlap
+    events = np.sort(rng.choice(np.arange(1, 590), size=200, replace=False)) * 100 / rate
+    response = np.exp(-np.arange(50) / 10.0)
+    for event in events:
+        index = int(round(event * rate))
+        data[index:index + 50, 1] += response
+
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=3)
+    nwbfile.add_device(tempo)
+    nwbfile.add_acquisition(TempoSeries(name='signals', data=H5DataIO(data, chunks=(1000, 3)), rate=rate,
+                                        channels=tempo.lockinamp_devices.children[0].create_channel_region()))
+    for event in events:
+        nwbfile.add_trial(start_time=event, stop_time=event + 0.5)
+    nwbfile.add_trial(start_time=59.99, stop_time=60.0)  # window runs past the end of the recording
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+    with NWBHDF5IO(path, 'r') as io:
+        nwb = io.read()
+        series = nwb.acquisition['signals']
+        assert_allclose(sample_indices(series, events), np.round(events * rate))
+        average = triggered_average(series, nwb.trials, window=(-0.02, 0.08), channels=[0, 1])
+        assert average.count == 200
+        assert average.trials.tolist() == list(range(200))
+        assert average.mean.shape == (100, 2)
+        assert_allclose(average.times[[0, 20]], [-0.02, 0.0])
+
+        starts = np.round(events * rate).astype(int) - 20
+        windows = np.stack([data[start:start + 100][:, [0, 1]] for start in starts])
+        assert_allclose(average.mean, windows.mean(axis=0))
+        assert_allclose(average.sem, windows.std(axis=0, ddof=1) / np.sqrt(200))
+        assert np.all(average.lower <= average.mean) and np.all(average.mean <= average.upper)
+        assert_allclose(average.mean[20:70, 1], response, atol=0.05)
@@ -0,0 +1,58 @@
+import warnings
+
+import pytest
+from hdmf.backends.hdf5 import H5DataIO
+from numpy.testing import assert_allclose, assert_array_equal
+
+from ndx_tempo import Measurement, PhotoDetector
+from ndx_tempo.units import UnitError, UnitWarning, conversion_factor, parse_unit
+
+
+def test_parse_unit():
+    assert parse_unit('uW').compatible(parse_unit('watts'))
+    assert parse_unit('millivolts').scale == pytest.approx(1e-3)
+    assert parse_unit('m/s^2').dimension == parse_unit('m s**-2').dimension
+    assert parse_unit('').dimensionless
+    assert conversion_factor('kHz', 'Hz') == 1e3
+    with pytest.raises(UnitError):
+        conversion_factor('uW', 'Hz')
+    with pytest.raises(UnitError):
+        parse_unit('furlongs')
+
+
+def test_measurement_conversion():
+    offset = Measurement(name='offset', description='offset', unit='mV', conversion=2.0, data=[1.0, 2.5])
+    assert_array_equal(offset.values, [2.0, 5.0])
+    assert_allclose(offset.si_values, [2e-3, 5e-3])
+    assert_allclose(offset.to('uV'), [2e3, 5e3])
+    assert offset.values is offset.values
+    assert offset.to('uV') is offset.to('uV')
+    with pytest.raises(ValueError):
+        offset.values[0] = 1.0
+    with pytest.raises(UnitError):
+        offset.to('Hz')
+
+    offset.data.append(4.0)
+    assert_array_equal(offset.values, [2.0, 5.0, 8.0])
+    offset.append(1.0)
+    assert_array_equal(offset.values, [2.0, 5.0, 8.0, 2.0])
+    offset.data[0] = 3.0
+    assert offset.values[0] == 2.0
+    offset.clear_cache()
+    assert_array_equal(offset.values, [6.0, 5.0, 8.0, 2.0])
+    offset.transform(lambda data: [value * 10 for value in data])
+    assert_array_equal(offset.values, [60.0, 50.0, 80.0, 20.0])
+    offset.set_data_io(H5DataIO, dict(compression='gzip'))
+    assert_array_equal(offset.values, [60.0, 50.0, 80.0, 20.0])
+
+
+def test_dimension_warnings():
+    with pytest.warns(UnitWarning):
+        Measurement(name='power', description='power', unit='Hz', data=[1.0])
+    with pytest.warns(UnitWarning):
+        PhotoDetector(name='photodetector', bandwidth=Measurement(name='bandwidth', description='bandwidth', unit='uW',
+                                                                  data=[50.0]))
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', UnitWarning)
+        PhotoDetector(name='photodetector', bandwidth=Measurement(name='bandwidth', description='bandwidth', unit='kHz',
+                                                                  data=[50.0]))
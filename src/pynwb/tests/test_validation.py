@@ -0,0 +1,57 @@
+import h5py
+import numpy as np
+from hdmf.validate.errors import DtypeError, MissingError, ShapeError
+from pynwb import NWBHDF5IO, validate
+
+from ndx_tempo.testing import mock_nwbfile, mock_tempo
+from ndx_tempo.validation import type_rules, validate_file, validate_files
+
+DEVICES = '/general/devices/tempo'
+
+
+def _write(path):
+    nwbfile = mock_nwbfile()
+    nwbfile.add_device(mock_tempo(num_channels=3))
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+
+def _replace(group, name, data):
+    attrs = dict(group[name].attrs)
+    del group[name]
+    dataset = group.create_dataset(name, data=data)
+    dataset.attrs.update(attrs)
+
+
+def test_type_rules_follow_spec():
+    rules = type_rules('LaserLine')
+    power = {rule.name: rule for rule in rules.datasets}['power']
+    assert power.shape == ((1,),) and power.kinds == ('f',) and not power.required
+    assert 'unit' in {rule.name for rule in type_rules('Measurement').attributes if rule.required}
+
+
+def test_validate_file(tmp_path):
+    path = str(tmp_path / 'valid.nwb')
+    _write(path)
+    assert validate_file(path) == []
+    with NWBHDF5IO(path, 'r') as io:
+        assert validate(io) == []
+
+    broken = str(tmp_path / 'broken.nwb')
+    _write(broken)
+    with h5py.File(broken, 'a') as f:
+        _replace(f[DEVICES + '/laserline_devices/laserline0'], 'power', np.array([1e-3, 2e-3]))
+        _replace(f[DEVICES + '/lockinamp_devices/lockinamp'], 'gain',
+                 np.array([b'a', b'b', b'c'], dtype=h5py.special_dtype(vlen=bytes)))
+        del f[DEVICES + '/lockinamp_devices/lockinamp/offset'].attrs['unit']
+    errors = validate_file(broken)
+    assert sorted(type(error).__name__ for error in errors) == ['DtypeError', 'MissingError', 'ShapeError']
+    by_type = {type(error): error for error in errors}
+    assert by_type[ShapeError].name == 'LaserLine/power'
+    assert by_type[DtypeError].name == 'LockInAmplifier/gain'
+    assert by_type[MissingError].name == 'Measurement/unit'
+
+    results = validate_files([path, broken, str(tmp_path / 'missing.nwb')], workers=2)
+    assert results[path] == []
+    assert len(results[broken]) == 3
+    assert len(results[str(tmp_path / 'missing.nwb')]) == 1
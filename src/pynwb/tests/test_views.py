@@ -0,0 +1,37 @@
+import numpy as np
+from hdmf.backends.hdf5 import H5DataIO
+from numpy.testing import assert_array_equal
+from pynwb import NWBHDF5IO
+
+from ndx_tempo import TempoSeries
+from ndx_tempo.testing import mock_nwbfile, mock_tempo, synthetic_signals
+from ndx_tempo.views import ChunkedDatasetView, data_view
+
+
+def test_contiguous_and_chunked_views(tmp_path):
+    path = str(tmp_path / 'views.nwb')
+    data = synthetic_signals(3000, 4)
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=4)
+    nwbfile.add_device(tempo)
+    lockinamp = tempo.lockinamp_devices.children[0]
+    nwbfile.add_acquisition(TempoSeries(name='contiguous', data=data, rate=1000.0,
+                                        channels=lockinamp.create_channel_region()))
+    nwbfile.add_acquisition(TempoSeries(name='chunked', rate=1000.0, channels=lockinamp.create_channel_region(),
+                                        data=H5DataIO(data, chunks=(500, 4), compression='gzip')))
+    with NWBHDF5IO(path, 'w') as io:
+        io.write(nwbfile)
+
+    with NWBHDF5IO(path, 'r') as io:
+        nwb = io.read()
+        contiguous = nwb.acquisition['contiguous'].data_view()
+        assert isinstance(contiguous, np.memmap)
+        assert_array_equal(contiguous[100:200], data[100:200])
+
+        chunked = data_view(nwb.acquisition['chunked'])
+        assert isinstance(chunked, ChunkedDatasetView)
+        assert chunked.shape == data.shape
+        assert_array_equal(chunked[2500:2600, 1], data[2500:2600, 1])
+        blocks = list(chunked.iter_blocks(chunks_per_block=2))
+        assert [start for start, _ in blocks] == [0, 1000, 2000]
+        assert_array_equal(np.concatenate([block for _, block in blocks]), data)
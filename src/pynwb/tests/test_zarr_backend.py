@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+from hdmf.common.table import DynamicTable, VectorData
+from numpy.testing import assert_allclose, assert_array_equal
+
+from ndx_tempo import Measurement, SubjectComplete, Surgery, TempoSeries
+from ndx_tempo.testing import mock_nwbfile, mock_tempo, synthetic_signals
+from ndx_tempo.zarr_backend import (allocate, column_groups, open_array, parallel_write, read_zarr, write_block,
+                                    write_zarr)
+
+pytest.importorskip('hdmf_zarr')
+
+SHAPE = (5000, 8)
+CHUNKS = (1000, 2)
+
+
+def _subject(implant):
+    return SubjectComplete(surgery_date='2020-01-01', implantation_device=implant, ophys_implant_name='fiber',
+                           virus_injection_id='virus', virus_injection_opsin_l_r='R',
+                           virus_injection_coordinates='[1.0, 2.0, 3.0]', ophys_injection_date='2020-01-02',
+                           ophys_injection_flr_protein_data=DynamicTable(
+                               name='ophys_injection_flr_protein_data', description='injected proteins', columns=[
+                                   VectorData(name='protein_name', description='protein name', data=['ace2n', 'mruby']),
+                                   Measurement(name='protein_concentration', description='concentration',
+                                               unit='ml', data=[2e12, 5e12])]),
+                           sacrificial_date='2020-02-01', strain='c57bl6')
+
+
+def test_all_types_roundtrip(tmp_path):
+    path = str(tmp_path / 'session.nwb.zarr')
+    data = synthetic_signals(3000, 4, rate=1000.0)
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=4, num_lines=2)
+    nwbfile.add_device(tempo)
+    nwbfile.subject = _subject(nwbfile.create_device(name='implant'))
+    nwbfile.add_acquisition(TempoSeries(name='signals', data=data, rate=1000.0,
+                                        channels=tempo.lockinamp_devices.children[0].create_channel_region()))
+    write_zarr(nwbfile, path)
+
+    with read_zarr(path) as io:
+        nwb = io.read()
+        device = nwb.devices['tempo']
+        assert [line.name for line in device.laserline_devices.children] == ['laserline0', 'laserline1']
+        assert_allclose(device.laserline_devices.children[1].analog_modulation_frequency.values, [2000.0])
+        assert len(device.photodetector_devices.children) == 4
+        lockinamp = device.lockinamp_devices.children[0]
+        assert lockinamp.channel_names == ('channel0', 'channel1', 'channel2', 'channel3')
+        assert lockinamp['offset'].unit == 'volts'
+        series = nwb.acquisition['signals']
+        assert_allclose(series.data[:], data)
+        assert series.channels.table is lockinamp
+        subject = nwb.subject
+        assert isinstance(subject, Surgery)
+        assert subject.strain == 'c57bl6'
+        assert subject.implantation_device is nwb.devices['implant']
+        assert subject.virus_injection_opsin_l_r == 'R'
+        assert_array_equal(subject.ophys_injection_flr_protein_data['protein_concentration'].data[:], [2e12, 5e12])
+
+
+def fill_group(task):
+    start, stop = task
+    for row in range(0, SHAPE[0], CHUNKS[0]):
+        rows = np.arange(row, min(row + CHUNKS[0], SHAPE[0]))[:, np.newaxis]
+        yield row, start, rows * 100.0 + np.arange(start, stop)
+
+
+def test_parallel_write_of_disjoint_chunks(tmp_path):
+    path = str(tmp_path / 'parallel.nwb.zarr')
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=8)
+    nwbfile.add_device(tempo)
+    nwbfile.add_acquisition(TempoSeries(name='signals', data=allocate(SHAPE, 'float64', CHUNKS), rate=1000.0,
+                                        channels=tempo.lockinamp_devices.children[0].create_channel_region()))
+    write_zarr(nwbfile, path)
+
+    groups = column_groups(SHAPE, CHUNKS, columns_per_group=3)
+    assert groups == [(0, 4), (4, 8)]
+    written = parallel_write(path, 'acquisition/signals/data', fill_group, groups, workers=2)
+    assert written == SHAPE[0] * SHAPE[1] * 8
+
+    expected = np.arange(SHAPE[0])[:, np.newaxis] * 100.0 + np.arange(SHAPE[1])
+    with read_zarr(path) as io:
+        assert_allclose(io.read().acquisition['signals'].data[:], expected)
+
+
+def test_write_block_rejects_partial_chunks(tmp_path):
+    path = str(tmp_path / 'partial.nwb.zarr')
+    nwbfile = mock_nwbfile()
+    tempo = mock_tempo(num_channels=8)
+    nwbfile.add_device(tempo)
+    nwbfile.add_acquisition(TempoSeries(name='signals', data=allocate(SHAPE, 'float64', CHUNKS), rate=1000.0,
+                                        channels=tempo.lockinamp_devices.children[0].create_channel_region()))
+    write_zarr(nwbfile, path)
+    array = open_array(path, 'acquisition/signals/data')
+    write_block(array, 4000, 6, np.ones((1000, 2)))
+    with pytest.raises(ValueError):
+        write_block(array, 500, 0, np.ones((1000, 2)))
+    with pytest.raises(RuntimeError):
+        parallel_write(path, 'acquisition/signals/data', fill_group, [(1, 3)], workers=1)
+
+
+def test_write_block_to_1d_array(tmp_path):
+    zarr = pytest.importorskip('zarr')
+    array = zarr.open_array(str(tmp_path / 'timestamps'), mode='w', shape=(2500,), chunks=(1000,), dtype='f8')
+    assert write_block(array, 2000, 0, np.arange(500.0)) == 500 * 8
+    assert_array_equal(array[2000:], np.arange(500.0))
+    with pytest.raises(ValueError):
+        write_block(array, 500, 0, np.ones(1000))
+    with pytest.raises(ValueError):
+        write_block(array, 0, 1, np.ones(1000))
@@ -21,6 +21,8 @@ def main():
     ns_builder.include_type('NWBDataInterface', namespace='core')
     ns_builder.include_type('NWBContainer', namespace='core')
     ns_builder.include_type('Device', namespace='core')
+    ns_builder.include_type('TimeSeries', namespace='core')
+    ns_builder.include_type('DynamicTableRegion', namespace='hdmf-common')
 
     measurement = NWBDatasetSpec('Flexible vectordataset with a custom unit/conversion/resolution'
                                  ' field similar to timeseries.data',
@@ -308,11 +310,11 @@ def main():
                                                     dtype='text',
                                                     required=False)
                                                 ],
-                                    datasets=[NWBDatasetSpec(
+                                    groups=[NWBGroupSpec(
                                                     name='ophys_injection_flr_protein_data',
                                                     doc='fluorescence protein name and concentration table',
                                                     neurodata_type_inc='DynamicTable')
-                                              ],
+                                            ],
                                     quantity='?')
                                     ],
                            quantity='?')
@@ -333,7 +335,34 @@ def main():
                                        required=False)],
                            )
 
-    new_data_types = [measurement, tempo_device, surgery, subject]
+    # Typedef for signals acquired with a TEMPO device
+    tempo_series = NWBGroupSpec(neurodata_type_def='TempoSeries',
+                                neurodata_type_inc='TimeSeries',
+                                doc='signals acquired with a TEMPO device, one column of data per '
+                                    'LockInAmplifier channel')
+
+    tempo_series.add_dataset(
+        name='channels',
+        neurodata_type_inc='DynamicTableRegion',
+        doc='DynamicTableRegion pointer to the LockInAmplifier channel rows that correspond to the '
+            'columns of data'
+    )
+    tempo_series.add_dataset(
+        name='source_columns',
+        dtype='int',
+        dims=('no_of_columns',),
+        shape=(None,),
+        doc='for derived signals, the column of source_series each column of data was computed from',
+        quantity='?'
+    )
+    tempo_series.add_link(
+        name='source_series',
+        target_type='TimeSeries',
+        doc='for derived signals, the series they were computed from',
+        quantity='?'
+    )
+
+    new_data_types = [measurement, tempo_device, surgery, subject, tempo_series]
     export_spec(ns_builder, new_data_types)
 
 